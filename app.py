@@ -1,12 +1,84 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
+from tkinter import ttk, messagebox, simpledialog, filedialog
 import psycopg2
 from psycopg2 import sql
 from datetime import datetime
-import pandas as pd
 from tkcalendar import DateEntry
-import sys
-import traceback
+import logging
+import threading
+import queue
+
+from db import ConnectionPool, DEFAULT_DB_CONFIG
+from schema import SchemaCatalog, TABLES
+from lookups import LookupCache, COLUMN_LOOKUPS, lookup_label
+from pairing import PAIR_COLUMNS
+from reports import (ReportService, REPORTS, KINSHIP_REPORTS, HEALTH_REPORTS, EXHIBITION_REPORTS,
+                     sort_key)
+import medal_stats
+from report_views import ViewRefresher, REPORT_VIEWS
+import search
+from filters import compile_filter, compile_filters, column_kind, filter_hint, FilterError
+from importer import BulkImporter, IMPORT_TABLES
+import exporter
+from diagnostics import PROFILER, setup_logging
+from changes import ChangeListener
+from resultset import ColumnarResult
+import migrate
+
+
+log = logging.getLogger(__name__)
+
+
+#исключение для задач, отмененных до начала выполнения
+class TaskCancelled(Exception):
+    pass
+
+
+#выбор собаки с поиском по мере ввода (префикс владельца или id)
+class DogPicker(ttk.Combobox):
+    def __init__(self, parent, app, gender=None, delay=300):
+        super().__init__(parent)
+        self.app = app
+        self.gender = gender
+        self.delay = delay
+        self.after_id = None
+        self.by_label = {}
+        self.bind('<KeyRelease>', self.on_key)
+        self.search()
+
+    #запрос откладывается, пока пользователь печатает
+    def on_key(self, event):
+        if event.keysym in ('Up', 'Down', 'Return', 'Escape', 'Tab'):
+            return
+        if self.after_id:
+            self.after_cancel(self.after_id)
+        self.after_id = self.after(self.delay, self.search)
+
+    def search(self):
+        self.after_id = None
+        term = self.get()
+        if term in self.by_label:
+            return
+
+        def on_found(rows):
+            #пока шел запрос, текст мог измениться
+            if not self.winfo_exists() or self.get() != term:
+                return
+            labels = [lookup_label(id_, owner) for id_, owner in rows]
+            self.by_label.update(zip(labels, (id_ for id_, _ in rows)))
+            self['values'] = labels
+
+        self.app.run_async(lambda: self.app.lookups.search_dogs(term, self.gender),
+                           on_found, message="Поиск собак...")
+
+    #id выбранной собаки; допускается ввод номера вручную
+    def get_id(self):
+        val = self.get().strip()
+        if val in self.by_label:
+            return self.by_label[val]
+        if val.isdigit():
+            return int(val)
+        return None
 
 
 class DogBreedingApp:
@@ -16,51 +88,187 @@ class DogBreedingApp:
         self.root.geometry("1400x700")
 
         #подключение к бд
-        self.db_config = {
-            'host': 'localhost',
-            'database': 'Pantuhina',
-            'user': 'postgres',
-            'password': 'postgres',
-            'port': '5432'
-        }
+        self.db_config = dict(DEFAULT_DB_CONFIG)
 
         self.current_table = None
         self.current_filter = {}
         self.sort_column = None
         self.sort_reverse = False
+        self.current_search = None
+
+        #постраничный просмотр (keyset-пагинация)
+        self.page_size = 200
+        self.max_loaded_pages = 5
+        self.page_state = None
+        #результат не больше local_result_limit строк загружается целиком и затем
+        #сортируется и фильтруется без запросов к серверу (до изменения таблицы)
+        self.local_result_limit = self.page_size * self.max_loaded_pages
+        self.result_cache = None
+
+        #сколько лучших пар выводить в отчете по вязке
+        self.breeding_top_k = 50
+        #источник отчетов по умолчанию и период пересчета сохраненных отчетов (с, 0 - не пересчитывать)
+        self.report_source = 'live'
+        self.report_refresh_interval = 600
+
+        #фоновое выполнение запросов
+        self.task_queue = queue.Queue()
+        self.result_queue = queue.Queue()
+        self.active_tasks = {}
+        self.cancelled_tasks = set()
+        self.task_counter = 0
+        #номер задачи, выполняемой в текущем рабочем потоке
+        self.task_local = threading.local()
+        #выполняющиеся задачи: номер -> id рабочего потока (отмена только их запросов)
+        self.task_threads = {}
+        #пачки изменений с других рабочих мест (от ChangeListener)
+        self.change_queue = queue.Queue()
 
         self.setup_ui()
         self.connect_db()
         self.load_table_list()
-
-    def execute_sql(self, query, params=None, fetch=True):
+        self.start_worker()
+        self.load_schema()
+
+    #prepared - запрос повторяется с разными параметрами, выполняется как подготовленный
+    def execute_sql(self, query, params=None, fetch=True, prepared=False):
+        columns, rows = self.run_statement(query, params, fetch, prepared)
+        return rows if fetch else True
+
+    #запрос с именами колонок результата
+    def fetch_with_columns(self, query, params=None, prepared=False):
+        return self.run_statement(query, params, prepared=prepared)
+
+    #выполнение запроса на соединении из пула
+    def run_statement(self, query, params=None, fetch=True, prepared=False):
+        if self.is_task_cancelled():
+            raise TaskCancelled()
         try:
-            if params:
-                self.cursor.execute(query, params)
-            else:
-                self.cursor.execute(query)
-
-            if fetch:
-                return self.cursor.fetchall()
-            else:
-                self.conn.commit()
-                return True
+            return self.db.execute(query, params or None, fetch, prepared=prepared)
 
         except Exception as e:
-            self.conn.rollback()  #откатить транзакцию при ошибке
             error_msg = str(e)
             if len(error_msg) > 200:
                 error_msg = error_msg[:200] + "..."
 
             #подробная информация об ошибке
-            error_details = traceback.format_exc()
-            print(f"SQL Error: {error_msg}")
-            print(f"Query: {query}")
-            print(f"Params: {params}")
-            print(f"Details: {error_details}")
+            log.error("Ошибка SQL: %s\nQuery: %s\nParams: %s", error_msg, query, params,
+                      exc_info=True)
 
             raise e
 
+    #задача текущего потока отменена пользователем
+    def is_task_cancelled(self):
+        return getattr(self.task_local, 'task_id', None) in self.cancelled_tasks
+
+    #запуск рабочего потока для запросов к бд
+    def start_worker(self):
+        #по рабочему потоку на соединение пула, чтобы запросы шли параллельно
+        self.workers = []
+        for _ in range(self.db.options['maxconn']):
+            worker = threading.Thread(target=self.worker_loop, daemon=True)
+            worker.start()
+            self.workers.append(worker)
+        self.root.after(50, self.poll_results)
+
+    #рабочий поток: берет задачи из общей очереди
+    def worker_loop(self):
+        while True:
+            task_id, func, message = self.task_queue.get()
+            if task_id in self.cancelled_tasks:
+                self.result_queue.put((task_id, 'error', TaskCancelled()))
+                continue
+            self.task_local.task_id = task_id
+            self.task_threads[task_id] = threading.get_ident()
+            try:
+                #запросы задачи попадают в профиль под ее описанием
+                with PROFILER.feature(message.rstrip('.')):
+                    result = func()
+                self.result_queue.put((task_id, 'ok', result))
+            except Exception as e:
+                self.result_queue.put((task_id, 'error', e))
+            finally:
+                self.task_threads.pop(task_id, None)
+                self.task_local.task_id = None
+
+    #промежуточный результат задачи из рабочего потока (передается в on_progress)
+    def post_progress(self, data):
+        if self.is_task_cancelled():
+            raise TaskCancelled()
+        self.result_queue.put((self.task_local.task_id, 'progress', data))
+
+    #выполнить func в фоне, результат передать в on_success в главном потоке
+    def run_async(self, func, on_success=None, on_error=None,
+                  message="Выполнение запроса...", on_progress=None):
+        self.task_counter += 1
+        task_id = self.task_counter
+        self.active_tasks[task_id] = (on_success, on_error, on_progress)
+        self.task_queue.put((task_id, func, message))
+
+        self.status_bar.config(text=message)
+        self.progress.start(10)
+        self.cancel_button.config(state='normal')
+        return task_id
+
+    #опрос очереди результатов из главного потока
+    def poll_results(self):
+        while not self.change_queue.empty():
+            try:
+                self.apply_changes(self.change_queue.get_nowait())
+            except Exception as e:
+                log.exception("Ошибка применения изменений: %s", e)
+
+        try:
+            while True:
+                task_id, kind, result = self.result_queue.get_nowait()
+                if kind == 'progress':
+                    callbacks = self.active_tasks.get(task_id)
+                    if callbacks and callbacks[2] and task_id not in self.cancelled_tasks:
+                        try:
+                            callbacks[2](result)
+                        except Exception as e:
+                            log.exception("Ошибка в обработчике результата: %s", e)
+                    continue
+
+                self.cancelled_tasks.discard(task_id)
+                on_success, on_error, _ = self.active_tasks.pop(task_id, (None, None, None))
+                try:
+                    if kind == 'ok':
+                        if on_success:
+                            on_success(result)
+                    elif self.is_cancel_error(result):
+                        self.status_bar.config(text="Операция отменена")
+                    elif on_error:
+                        on_error(result)
+                    else:
+                        messagebox.showerror("Ошибка", f"Ошибка: {str(result)[:200]}")
+                except Exception as e:
+                    log.exception("Ошибка в обработчике результата: %s", e)
+        except queue.Empty:
+            pass
+
+        if not self.active_tasks:
+            self.progress.stop()
+            self.cancel_button.config(state='disabled')
+        self.root.after(50, self.poll_results)
+
+    #ошибка из-за отмены запроса
+    def is_cancel_error(self, error):
+        return isinstance(error, (TaskCancelled, psycopg2.extensions.QueryCanceledError))
+
+    #отмена текущего запроса на сервере и задач в очереди
+    def cancel_tasks(self):
+        if not self.active_tasks:
+            return
+        self.cancelled_tasks.update(self.active_tasks)
+        #запросы фоновых потоков (пересчет отчетов, сводки медалей) не трогаем
+        threads = [self.task_threads.get(task_id) for task_id in list(self.active_tasks)]
+        try:
+            self.db.cancel_threads([thread for thread in threads if thread is not None])
+        except Exception as e:
+            log.error("Ошибка отмены запроса: %s", e)
+        self.status_bar.config(text="Отмена...")
+
     #настройка граф.интерфейса
     def setup_ui(self):
         #панель навигации
@@ -78,6 +286,10 @@ class DogBreedingApp:
                    command=self.add_record).pack(fill=tk.X, pady=2)
         ttk.Button(nav_frame, text="Удалить запись",
                    command=self.delete_record).pack(fill=tk.X, pady=2)
+        ttk.Button(nav_frame, text="Импорт из файла...",
+                   command=self.import_records).pack(fill=tk.X, pady=2)
+        ttk.Button(nav_frame, text="Экспорт таблицы...",
+                   command=self.export_table).pack(fill=tk.X, pady=2)
         ttk.Button(nav_frame, text="Обновить",
                    command=self.refresh_data).pack(fill=tk.X, pady=2)
 
@@ -94,6 +306,9 @@ class DogBreedingApp:
         #кнопка поиска
         ttk.Button(search_frame, text="🔍", width=3,
                    command=self.apply_search).pack(side=tk.RIGHT, padx=(2, 0))
+        self.search_all_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(nav_frame, text="Во всех таблицах",
+                        variable=self.search_all_var).pack(anchor=tk.W)
 
         ttk.Button(nav_frame, text="Фильтр...",
                    command=self.open_filter_dialog).pack(fill=tk.X, pady=5)
@@ -114,6 +329,28 @@ class DogBreedingApp:
             ttk.Button(nav_frame, text=report_name,
                        command=command).pack(fill=tk.X, pady=2)
 
+        #медицинская аналитика по истории болезней
+        health_button = ttk.Menubutton(nav_frame, text="Медицинская аналитика")
+        health_menu = tk.Menu(health_button, tearoff=False)
+        for report_type in HEALTH_REPORTS:
+            health_menu.add_command(label=REPORTS[report_type].title,
+                                    command=lambda t=report_type: self.show_report_dialog(t))
+        health_button['menu'] = health_menu
+        health_button.pack(fill=tk.X, pady=2)
+
+        #рейтинг и статистика по результатам выставок
+        exhibition_button = ttk.Menubutton(nav_frame, text="Аналитика выставок")
+        exhibition_menu = tk.Menu(exhibition_button, tearoff=False)
+        for report_type in EXHIBITION_REPORTS:
+            exhibition_menu.add_command(label=REPORTS[report_type].title,
+                                        command=lambda t=report_type: self.show_report_dialog(t))
+        exhibition_button['menu'] = exhibition_menu
+        exhibition_button.pack(fill=tk.X, pady=2)
+
+        ttk.Separator(nav_frame, orient='horizontal').pack(fill=tk.X, pady=10)
+        ttk.Button(nav_frame, text="Диагностика запросов",
+                   command=self.show_diagnostics).pack(fill=tk.X, pady=2)
+
         #основная область
         main_frame = ttk.Frame(self.root)
         main_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True, padx=5, pady=5)
@@ -122,132 +359,560 @@ class DogBreedingApp:
         self.tree = ttk.Treeview(main_frame)
         self.tree.pack(fill=tk.BOTH, expand=True)
 
-        #полоса прокрутки
-        scrollbar = ttk.Scrollbar(self.tree, orient="vertical",
-                                  command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-
-        #бар со статусом
-        self.status_bar = ttk.Label(self.root, text="Готово", relief=tk.SUNKEN)
-        self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+        #полоса прокрутки (подгрузка страниц при прокрутке)
+        self.tree_scrollbar = ttk.Scrollbar(self.tree, orient="vertical",
+                                            command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.on_tree_scroll)
+        self.tree_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        #бар со статусом, индикатор выполнения и отмена
+        status_frame = ttk.Frame(self.root)
+        status_frame.pack(side=tk.BOTTOM, fill=tk.X)
+        self.status_bar = ttk.Label(status_frame, text="Готово", relief=tk.SUNKEN)
+        self.status_bar.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.cancel_button = ttk.Button(status_frame, text="Отмена", state='disabled',
+                                        command=self.cancel_tasks)
+        self.cancel_button.pack(side=tk.RIGHT)
+        self.progress = ttk.Progressbar(status_frame, mode='indeterminate', length=150)
+        self.progress.pack(side=tk.RIGHT, padx=5)
 
     #подключение к бд
     def connect_db(self):
+        self.db = ConnectionPool(self.db_config)
+        self.schema = SchemaCatalog(self.db)
+        self.lookups = LookupCache(self.db)
+        #отчеты и родословная для проверки родства
+        self.reports = ReportService(self.db)
         try:
-            self.conn = psycopg2.connect(**self.db_config)
-            self.cursor = self.conn.cursor()
+            self.db.open()
             self.status_bar.config(text="Подключено к БД")
-            print("Успешное подключение к БД")
+            log.info("Успешное подключение к БД")
         except Exception as e:
+            #приложение продолжает работу, пул переподключится при следующем запросе
             error_msg = f"Не удалось подключиться к БД: {e}"
             messagebox.showerror("Ошибка подключения", error_msg)
-            print(error_msg)
-            sys.exit(1)
+            self.status_bar.config(text="Нет подключения к БД")
+            log.error(error_msg)
+
+        #изменения, сделанные другими операторами (слушатель сам переподключается)
+        self.change_listener = ChangeListener(self.db.connect_params, self.change_queue.put,
+                                              ignored_pids=self.db.backend_pids)
+        self.change_listener.start()
+
+        #пересчет сохраненных отчетов; пересчитанные результаты сбрасываются из кэша отчетов
+        if self.report_refresh_interval:
+            self.view_refresher = ViewRefresher(self.db, self.report_refresh_interval,
+                                                on_refreshed=self.views_refreshed)
+            self.view_refresher.start()
+
+    #пересчитанные по расписанию представления (вызывается в потоке пересчета)
+    def views_refreshed(self, views):
+        for view in views:
+            self.reports.table_changed(view)
 
     #загрузка таблиц бд
     def load_table_list(self):
         self.table_listbox.delete(0, tk.END)
-        tables = [
-            'Breeds', 'Dogs', 'Parents', 'Exhibitions',
-            'Medicine_book', 'Medicine_history'
-        ]
-        for table in tables:
+        for table in TABLES:
             self.table_listbox.insert(tk.END, table)
 
+    #изменения с других рабочих мест: сброс кэшей и обновление открытой таблицы
+    def apply_changes(self, batch):
+        if batch is None:
+            #уведомления за время обрыва связи потеряны - сбрасываем все
+            for table in TABLES:
+                self.table_changed(table)
+            if self.current_table:
+                self.load_table_data()
+            return
+
+        for table in batch:
+            self.table_changed(table)
+
+        state = self.page_state
+        changes = batch.get(state['table'].lower()) if state else None
+        if changes is None:
+            return
+        if changes.reload or state['loading']:
+            self.load_table_data()
+            return
+
+        keys = list(changes.changed_keys())
+        conditions = " AND ".join(state['conditions']) or "TRUE"
+
+        #измененные строки вместе с признаком видимости и новое число записей - одной задачей
+        def load():
+            rows = []
+            if keys:
+                rows = self.execute_sql(
+                    f"SELECT {state['key_column']} AS page_key, *, {conditions} AS visible "
+                    f"FROM {state['table']} WHERE {state['key_column']} = ANY(%s)",
+                    list(state['params']) + [keys], prepared=True
+                )
+            count_query = f"SELECT COUNT(*) FROM {state['table']}"
+            if state['conditions']:
+                count_query += " WHERE " + conditions
+            total = self.execute_sql(count_query, state['params'], prepared=True)[0][0]
+            return total, rows
+
+        def on_loaded(result):
+            if self.page_state is not state:
+                return
+            total, rows = result
+            #удаленные и измененные строки убираем, измененные ставим заново по новой сортировке;
+            #вставленная строка уже может быть в окне, если страница загрузилась до уведомления
+            removed = changes.deleted | changes.updated | changes.inserted
+            for item, (_, key) in list(state['item_cursors'].items()):
+                if key in removed:
+                    self.tree.delete(item)
+                    self.forget_tree_item(item)
+            for row in rows:
+                self.place_new_row(state, row, select=False)
+            state['total'] = total
+            self.update_page_status()
+
+        def on_error(e):
+            log.error("Ошибка в apply_changes: %s", e)
+
+        self.run_async(load, on_loaded, on_error, message="Обновление изменений...")
+
+    #сброс кэшей, зависящих от изменившейся таблицы
+    def table_changed(self, table):
+        self.lookups.invalidate_table(table)
+        #загруженный целиком результат устарел - следующая загрузка пойдет на сервер
+        cache = self.result_cache
+        if cache is not None and cache.table.lower() == table.lower():
+            self.result_cache = None
+        #родословная и сохраненные результаты отчетов
+        self.reports.table_changed(table)
+
+    #миграции схемы и загрузка метаданных таблиц при запуске
+    def load_schema(self):
+        def prepare():
+            applied = migrate.migrate(self.db)
+            self.schema.load()
+            return applied
+
+        def on_ready(applied):
+            if applied:
+                self.status_bar.config(text=f"Применено миграций: {len(applied)}")
+
+        def on_error(e):
+            messagebox.showerror("Ошибка", f"Не удалось обновить схему БД: {str(e)[:200]}")
+            log.error("Ошибка миграции или загрузки схемы БД: %s", e)
+
+        self.run_async(prepare, on_ready, on_error, message="Обновление структуры БД...")
+
     #выбор таблицы
     def on_table_select(self, event):
         selection = self.table_listbox.curselection()
         if selection:
             self.current_table = self.table_listbox.get(selection[0])
+            self.current_search = None
             self.load_table_data()
 
+    #первичный ключ таблицы (ctid для таблиц без ключа)
+    def get_primary_key(self, table):
+        return self.schema.primary_key(table) or 'ctid'
+
+    #условия WHERE из текущих фильтров и поиска
+    def build_where_conditions(self):
+        #типизированные условия по колонкам (см. filters.py)
+        conditions, query_params = compile_filters(self.schema, self.current_table,
+                                                   self.current_filter)
+
+        #поиск по текстовым полям (через триграммные индексы)
+        if self.current_search:
+            text_columns, search_text = self.current_search
+            search_condition, search_params = search.table_condition(text_columns, search_text)
+            conditions.append(search_condition)
+            query_params.extend(search_params)
+
+        return conditions, query_params
+
+    #условие keyset-пагинации: строки строго после курсора (значение сортировки, ключ)
+    def build_keyset_condition(self, state, cursor):
+        sort_col, key_col = state['sort_column'], state['key_column']
+        op = '<' if state['reverse'] else '>'
+        last_sort, last_key = cursor
+
+        if not sort_col or sort_col == key_col:
+            return f"{key_col} {op} %s", [last_key]
+        if last_sort is None:
+            #NULL-значения идут в конце, внутри них порядок по ключу
+            return f"({sort_col} IS NULL AND {key_col} {op} %s)", [last_key]
+        return (f"({sort_col} {op} %s OR ({sort_col} = %s AND {key_col} {op} %s)"
+                f" OR {sort_col} IS NULL)", [last_sort, last_sort, last_key])
+
+    #загрузка одной страницы, начиная после курсора (в рабочем потоке);
+    #если известен курсор следующей страницы (until), берутся все строки до него включительно:
+    #после локальных вставок и удалений в странице может быть больше или меньше page_size строк
+    def fetch_page(self, state, cursor, until=None, limit=None):
+        conditions = list(state['conditions'])
+        query_params = list(state['params'])
+        if cursor is not None:
+            keyset_condition, keyset_params = self.build_keyset_condition(state, cursor)
+            conditions.append(keyset_condition)
+            query_params.extend(keyset_params)
+        if until is not None:
+            keyset_condition, keyset_params = self.build_keyset_condition(state, until)
+            conditions.append(f"NOT ({keyset_condition})")
+            query_params.extend(keyset_params)
+
+        query_parts = [f"SELECT {state['key_column']} AS page_key, * FROM {state['table']}"]
+        if conditions:
+            query_parts.append("WHERE " + " AND ".join(conditions))
+
+        order = "DESC" if state['reverse'] else "ASC"
+        order_by = [f"{state['key_column']} {order}"]
+        if state['sort_column'] and state['sort_column'] != state['key_column']:
+            order_by.insert(0, f"{state['sort_column']} {order} NULLS LAST")
+        query_parts.append("ORDER BY " + ", ".join(order_by))
+        if until is None:
+            query_parts.append("LIMIT %s")
+            query_params.append(limit or self.page_size)
+
+        query = " ".join(query_parts)
+        log.debug("Страница %s: %s %s", state['table'], query, query_params)
+
+        columns, rows = self.fetch_with_columns(query, query_params, prepared=True)
+        return columns[1:], rows
+
+    #курсор для продолжения после строки
+    def page_cursor(self, state, row):
+        sort_value = None
+        if state['sort_column'] in state['columns']:
+            sort_value = row[1 + state['columns'].index(state['sort_column'])]
+        return sort_value, row[0]
+
+    #идет ли строка с курсором a раньше строки с курсором b (NULL-значения в конце)
+    def cursor_precedes(self, state, a, b):
+        a_sort, a_key = a
+        b_sort, b_key = b
+        sort_col = state['sort_column']
+        if sort_col and sort_col != state['key_column'] and a_sort != b_sort:
+            if a_sort is None or b_sort is None:
+                return b_sort is None
+            return a_sort > b_sort if state['reverse'] else a_sort < b_sort
+        return a_key > b_key if state['reverse'] else a_key < b_key
+
     #treeview таблиц
-    def load_table_data(self, custom_query=None, params=None):
+    def load_table_data(self):
         #очистка таблицы
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        self.tree.delete(*self.tree.get_children())
+        self.page_state = None
 
-        if not self.current_table and not custom_query:
+        if not self.current_table:
             return
-        try:
-            if custom_query:
-                if isinstance(custom_query, tuple):
-                    query, query_params = custom_query
-                else:
-                    query = custom_query
-                    query_params = params or ()
+
+        conditions, query_params = self.build_where_conditions()
+        state = {
+            'table': self.current_table,
+            'key_column': None,
+            'sort_column': self.sort_column,
+            'reverse': self.sort_reverse,
+            'conditions': conditions,
+            'params': query_params,
+            'columns': [],
+            #page_cursors[i] - курсор, после которого начинается страница i
+            'page_cursors': [None],
+            #загруженное окно: список (номер страницы, элементы treeview)
+            'window': [],
+            'last_page': None,
+            'loading': True,
+            #курсор строки (значение сортировки, ключ) для каждого элемента treeview
+            'item_cursors': {},
+        }
+        self.page_state = state
+
+        #результат уже на клиенте: сортировка и фильтры без запроса
+        cache = self.result_cache
+        if cache is not None and cache.covers(state['table'], self.current_filter,
+                                              self.current_search):
+            self.show_local_result(state, cache)
+            return
+
+        filters, current_search = dict(self.current_filter), self.current_search
+
+        def load():
+            state['key_column'] = self.get_primary_key(state['table'])
+
+            #общее число записей с учетом фильтров
+            count_query = f"SELECT COUNT(*) FROM {state['table']}"
+            if conditions:
+                count_query += " WHERE " + " AND ".join(conditions)
+            total = self.execute_sql(count_query, query_params, prepared=True)[0][0]
+
+            if total > self.local_result_limit:
+                columns, rows = self.fetch_page(state, None)
+                return total, columns, rows, None
+
+            #небольшой результат - целиком, в колонки для локальной сортировки
+            columns, rows = self.fetch_page(state, None, limit=self.local_result_limit + 1)
+            if len(rows) > self.local_result_limit:
+                #таблица выросла после подсчета - обычный постраничный просмотр
+                return total, columns, rows[:self.page_size], None
+            catalog = [self.schema.column(state['table'], name) for name in columns]
+            #каталог отстал от таблицы или ключ - ctid (таблица без первичного ключа):
+            #без локальной сортировки, постраничный просмотр
+            if None in catalog or self.schema.column(state['table'], state['key_column']) is None:
+                return total, columns, rows[:self.page_size], None
+            result = ColumnarResult(state['table'], state['key_column'], catalog, rows,
+                                    filters, current_search)
+            return len(rows), columns, rows, result
+
+        def on_loaded(result):
+            #пользователь уже выбрал другую таблицу или сортировку
+            if self.page_state is not state:
+                return
+            state['total'], columns, rows, columnar = result
+            state['columns'] = columns
+            state['loading'] = False
+            self.setup_tree_columns(columns)
+
+            if columnar is None:
+                self.add_page(state, 0, rows, at_end=True)
             else:
-                query_parts = [f"SELECT * FROM {self.current_table}"]
-
-                if self.current_filter:
-                    conditions = []
-                    query_params = []
-                    for column, value in self.current_filter.items():
-                        if value:
-                            #для разных типов данных разные операторы
-                            if value.upper() in ['TRUE', 'FALSE']:
-                                conditions.append(f"{column} = %s")
-                                query_params.append(value.upper() == 'TRUE')
-                            elif column.endswith('_id') or column.startswith('id_'):
-                                #для id
-                                try:
-                                    int_value = int(value)
-                                    conditions.append(f"{column} = %s")
-                                    query_params.append(int_value)
-                                except ValueError:
-                                    conditions.append(f"{column}::text ILIKE %s")
-                                    query_params.append(f"%{value}%")
-                            elif value in ['M', 'F']:
-                                #для пола
-                                conditions.append(f"{column} = %s")
-                                query_params.append(value)
-                            elif value in ['Gold', 'Silver', 'Bronze']:
-                                #для медалей
-                                conditions.append(f"{column} = %s")
-                                query_params.append(value)
-                            else:
-                                #для текстовых полей
-                                conditions.append(f"{column}::text ILIKE %s")
-                                query_params.append(f"%{value}%")
-
-                    if conditions:
-                        query_parts.append("WHERE " + " AND ".join(conditions))
-
-                #сортировка
-                if self.sort_column:
-                    order = "DESC" if self.sort_reverse else "ASC"
-                    query_parts.append(f"ORDER BY {self.sort_column} {order}")
-
-                query = " ".join(query_parts)
-                query_params = query_params if 'query_params' in locals() else ()
-
-            print(f"Executing query: {query}")
-            print(f"With params: {query_params}")
-
-            #выполнение запроса
-            rows = self.execute_sql(query, query_params)
-            columns = [desc[0] for desc in self.cursor.description]
-
-            #настройка колонок
-            self.tree["columns"] = columns
-            self.tree["show"] = "headings"
-
-            for col in columns:
-                self.tree.heading(col, text=col,
-                                  command=lambda c=col: self.sort_by_column(c))
-                self.tree.column(col, width=100, minwidth=50)
-
-            #заполнение данными
-            for row in rows:
-                self.tree.insert("", tk.END, values=row)
-            self.status_bar.config(
-                text=f"Таблица: {self.current_table}. Записей: {len(rows)}"
-            )
-        except Exception as e:
+                self.result_cache = columnar
+                self.add_all_rows(state, rows)
+            self.update_page_status()
+
+        def on_error(e):
+            state['loading'] = False
             error_msg = f"Ошибка загрузки данных: {str(e)[:100]}..."
             messagebox.showerror("Ошибка загрузки", error_msg)
-            print(f"Ошибка в load_table_data: {e}")
+            log.error("Ошибка в load_table_data: %s", e)
+
+        self.run_async(load, on_loaded, on_error,
+                       message=f"Загрузка таблицы {self.current_table}...")
+
+    #колонки treeview, заголовок - сортировка по колонке
+    def setup_tree_columns(self, columns):
+        self.tree["columns"] = columns
+        self.tree["show"] = "headings"
+
+        for col in columns:
+            self.tree.heading(col, text=col,
+                              command=lambda c=col: self.sort_by_column(c))
+            self.tree.column(col, width=100, minwidth=50)
+
+    #весь результат в окно treeview страницами (не больше local_result_limit строк)
+    def add_all_rows(self, state, rows):
+        page_count = (len(rows) + self.page_size - 1) // self.page_size
+        state['last_page'] = max(page_count - 1, 0)
+        if not rows:
+            self.add_page(state, 0, rows, at_end=True)
+        for page_index in range(page_count):
+            start = page_index * self.page_size
+            self.add_page(state, page_index, rows[start:start + self.page_size], at_end=True)
+
+    #фильтры, поиск и сортировка над загруженным результатом
+    def show_local_result(self, state, cache):
+        indices = cache.order(cache.select(self.current_filter, self.current_search),
+                              state['sort_column'], state['reverse'])
+        rows = cache.rows(indices)
+        state['key_column'] = cache.key_column
+        state['columns'] = list(cache.names)
+        state['total'] = len(rows)
+        state['loading'] = False
+        self.setup_tree_columns(state['columns'])
+        self.add_all_rows(state, rows)
+        self.update_page_status()
+
+    #вставка страницы в окно treeview
+    def add_page(self, state, page_index, rows, at_end):
+        #неполной может быть только страница без верхней границы
+        if len(rows) < self.page_size and page_index + 1 == len(state['page_cursors']):
+            state['last_page'] = page_index
+        if not rows:
+            return
+
+        if page_index + 1 == len(state['page_cursors']) and state['last_page'] != page_index:
+            state['page_cursors'].append(self.page_cursor(state, rows[-1]))
+
+        #позиция верхней видимой строки до изменения окна
+        first, _ = self.tree.yview()
+        top_index = float(first) * len(self.tree.get_children())
+
+        position = tk.END if at_end else 0
+        items = []
+        for i, row in enumerate(rows):
+            index = position if at_end else i
+            item = self.tree.insert("", index, values=row[1:])
+            state['item_cursors'][item] = self.page_cursor(state, row)
+            items.append(item)
+
+        if at_end:
+            state['window'].append((page_index, items))
+        else:
+            state['window'].insert(0, (page_index, items))
+            top_index += len(items)
+
+        #держим в treeview не больше max_loaded_pages страниц
+        overflow = len(state['window']) > self.max_loaded_pages
+        if overflow:
+            if at_end:
+                _, dropped = state['window'].pop(0)
+                top_index -= len(dropped)
+            else:
+                _, dropped = state['window'].pop()
+            self.tree.delete(*dropped)
+            for item in dropped:
+                del state['item_cursors'][item]
+
+        #сохраняем видимую позицию после сдвига окна
+        if overflow or not at_end:
+            total = len(self.tree.get_children())
+            if total:
+                self.tree.yview_moveto(max(top_index, 0) / total)
+
+    #подгрузка соседней страницы в фоне
+    def load_page(self, page_index, at_end):
+        state = self.page_state
+        state['loading'] = True
+        cursor = state['page_cursors'][page_index]
+        until = None
+        if page_index + 1 < len(state['page_cursors']):
+            until = state['page_cursors'][page_index + 1]
+
+        def on_loaded(result):
+            state['loading'] = False
+            if self.page_state is not state:
+                return
+            _, rows = result
+            self.add_page(state, page_index, rows, at_end=at_end)
+            self.update_page_status()
+
+        def on_error(e):
+            state['loading'] = False
+            log.error("Ошибка в load_page: %s", e)
+
+        self.run_async(lambda: self.fetch_page(state, cursor, until), on_loaded, on_error,
+                       message="Загрузка записей...")
+
+    #подгрузка следующей страницы
+    def load_next_page(self):
+        state = self.page_state
+        if not state or state['loading'] or not state['window']:
+            return
+        next_index = state['window'][-1][0] + 1
+        if state['last_page'] is not None and next_index > state['last_page']:
+            return
+        self.load_page(next_index, at_end=True)
+
+    #подгрузка предыдущей страницы
+    def load_prev_page(self):
+        state = self.page_state
+        if not state or state['loading'] or not state['window']:
+            return
+        prev_index = state['window'][0][0] - 1
+        if prev_index < 0:
+            return
+        self.load_page(prev_index, at_end=False)
+
+    #прокрутка treeview: подгружаем страницы у краев окна
+    def on_tree_scroll(self, first, last):
+        self.tree_scrollbar.set(first, last)
+        state = self.page_state
+        if not state or state['loading']:
+            return
+        if float(last) >= 0.98:
+            self.root.after_idle(self.load_next_page)
+        elif float(first) <= 0.02 and state['window'] and state['window'][0][0] > 0:
+            self.root.after_idle(self.load_prev_page)
+
+    #удаление строки из загруженного окна страниц
+    def forget_tree_item(self, item):
+        if not self.page_state:
+            return
+        for _, items in self.page_state['window']:
+            if item in items:
+                items.remove(item)
+                self.page_state['item_cursors'].pop(item, None)
+                self.page_state['total'] -= 1
+                break
+
+    #открытая таблица, в окно которой можно поместить новые строки table
+    def view_state(self, table):
+        state = self.page_state
+        if state and state['table'].lower() == table.lower():
+            return state
+        return None
+
+    #INSERT ... RETURNING в форме строки страницы (ключ, колонки таблицы) и признак visible -
+    #проходит ли строка фильтры и поиск открытой таблицы (state может быть None)
+    def build_insert(self, state, table, values):
+        insert = sql.SQL("INSERT INTO {} ({}) VALUES ({}) RETURNING {} AS page_key, *").format(
+            sql.SQL(table),
+            sql.SQL(', ').join(map(sql.Identifier, values.keys())),
+            sql.SQL(', ').join(sql.Placeholder() * len(values)),
+            sql.SQL(self.get_primary_key(table))
+        )
+        params = list(values.values())
+        visible = "TRUE"
+        if state and state['conditions']:
+            visible = " AND ".join(state['conditions'])
+            params.extend(state['params'])
+        query = sql.SQL("WITH inserted AS ({}) SELECT *, {} AS visible FROM inserted").format(
+            insert, sql.SQL(visible)
+        )
+        return query, params
+
+    #вставленная строка на своем месте в текущей сортировке без перезагрузки таблицы;
+    #страница j содержит строки после page_cursors[j] до page_cursors[j + 1] включительно,
+    #строки вне загруженного окна появятся при подгрузке соседних страниц
+    def place_new_row(self, state, row, select=True):
+        row, visible = row[:-1], row[-1]
+        if self.page_state is not state or not visible:
+            return
+        if state['loading']:
+            #подгружаемая страница может уже содержать строку
+            self.load_table_data()
+            return
+        state['total'] += 1
+        if not state['window']:
+            state['window'].append((0, []))
+
+        cursor = self.page_cursor(state, row)
+        cursors = state['page_cursors']
+        first_page = state['window'][0][0]
+        if first_page > 0 and not self.cursor_precedes(state, cursors[first_page], cursor):
+            self.update_page_status()
+            return
+
+        offset = 0
+        for page_index, items in state['window']:
+            next_index = page_index + 1
+            if next_index == len(cursors) or not self.cursor_precedes(state, cursors[next_index],
+                                                                       cursor):
+                break
+            offset += len(items)
+        else:
+            self.update_page_status()
+            return
+
+        position = sum(1 for item in items
+                       if self.cursor_precedes(state, state['item_cursors'][item], cursor))
+        item = self.tree.insert("", offset + position, values=row[1:])
+        items.insert(position, item)
+        state['item_cursors'][item] = cursor
+        if select:
+            self.tree.selection_set(item)
+            self.tree.see(item)
+        self.update_page_status()
+
+    #статус: всего записей и загруженный диапазон
+    def update_page_status(self):
+        state = self.page_state
+        if not state['window']:
+            self.status_bar.config(text=f"Таблица: {state['table']}. Записей: 0")
+            return
+        first_row = state['window'][0][0] * self.page_size + 1
+        last_row = first_row + len(self.tree.get_children()) - 1
+        self.status_bar.config(
+            text=f"Таблица: {state['table']}. Записей: {state['total']} "
+                 f"(загружены {first_row}–{last_row})"
+        )
 
     #сортировка столбцов
     def sort_by_column(self, column):
@@ -265,45 +930,53 @@ class DogBreedingApp:
             messagebox.showwarning("Предупреждение", "Выберите таблицу")
             return
 
-        #создание формы ввода
-        dialog = tk.Toplevel(self.root)
-        dialog.title(f"Добавить запись в {self.current_table}")
-        dialog.geometry("500x600")
+        table = self.current_table
 
-        #для отношения 1:М (собаки и выставки)
-        if self.current_table == "Dogs":
-            self.create_dog_exhibition_form(dialog)
-        else:
-            self.create_general_form(dialog, {})
+        def on_loaded(result):
+            columns, foreign_keys, lookups = result
+            #создание формы ввода
+            dialog = tk.Toplevel(self.root)
+            dialog.title(f"Добавить запись в {table}")
+            dialog.geometry("500x600")
+
+            #для отношения 1:М (собаки и выставки)
+            if table == "Dogs":
+                self.create_dog_exhibition_form(dialog, columns, lookups)
+            else:
+                self.create_general_form(dialog, {}, columns, foreign_keys, lookups)
+
+        def on_error(e):
+            messagebox.showerror("Ошибка", f"Не удалось получить структуру таблицы: {e}")
+
+        self.run_async(lambda: self.load_form_data(table), on_loaded, on_error,
+                       message="Загрузка формы...")
+
+    #структура таблицы и справочники для формы ввода (в рабочем потоке)
+    def load_form_data(self, table):
+        #первичный ключ из последовательности заполняет сервер
+        primary_key = self.schema.primary_key(table)
+        columns = [col for col in self.schema.columns(table)
+                   if not (col.name == primary_key and self.schema.is_generated(table, col.name))]
+
+        #справочники только для внешних ключей, берутся из кэша
+        foreign_keys = self.schema.foreign_keys(table)
+        lookups = {col: self.lookups.for_column(col)
+                   for col in COLUMN_LOOKUPS if col in foreign_keys}
+        return columns, foreign_keys, lookups
 
     #форма ввода данных собак и выставки
-    def create_dog_exhibition_form(self, parent):
+    def create_dog_exhibition_form(self, parent, columns, lookups):
         notebook = ttk.Notebook(parent)
         notebook.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
         #вкладка "собака"
         dog_frame = ttk.Frame(notebook)
         notebook.add(dog_frame, text="Данные собаки")
-        try:
-            self.cursor.execute(f"""
-                SELECT column_name, data_type, is_nullable
-                FROM information_schema.columns 
-                WHERE table_name = 'dogs' 
-                ORDER BY ordinal_position
-            """)
-
-            columns = self.cursor.fetchall()
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось получить структуру таблицы: {e}")
-            parent.destroy()
-            return
 
         entries = {}
         row_idx = 0
 
-        for col_name, data_type, is_nullable in columns:
-            if col_name == 'id_dog' and 'serial' in data_type:
-                continue
+        for col_name, data_type, is_nullable, default in columns:
             ttk.Label(dog_frame, text=f"{col_name}:").grid(
                 row=row_idx, column=0, sticky=tk.W, pady=5, padx=5
             )
@@ -320,12 +993,10 @@ class DogBreedingApp:
             elif col_name == 'alive':
                 entry = ttk.Combobox(dog_frame, values=['TRUE', 'FALSE'], state='readonly')
                 entry.set('TRUE')
-            elif col_name == 'id_breed':
-                # Загружаем список пород для выбора
-                self.cursor.execute("SELECT id_breed, name FROM Breeds ORDER BY name")
-                breeds = self.cursor.fetchall()
-                breed_dict = {f"{name} (ID: {id_})": id_ for id_, name in breeds}
-                entry = ttk.Combobox(dog_frame, values=list(breed_dict.keys()), state='readonly')
+            elif col_name == 'id_breed' and col_name in lookups:
+                #список пород для выбора
+                breed_lookup = lookups['id_breed']
+                entry = ttk.Combobox(dog_frame, values=breed_lookup.labels, state='readonly')
             else:
                 entry = ttk.Entry(dog_frame)
 
@@ -367,104 +1038,94 @@ class DogBreedingApp:
 
         #кнопки сохранения
         def save_all():
-            try:
-                #сохранение собаки
-                dog_values = {}
-                for col_name, widget in entries.items():
+            #сохранение собаки
+            dog_values = {}
+            for col_name, widget in entries.items():
+                val = widget.get()
+
+                #обработка специальных полей
+                if col_name == 'id_breed' and isinstance(widget, ttk.Combobox):
+                    if val in breed_lookup.by_label:
+                        dog_values[col_name] = breed_lookup.by_label[val]
+                elif val:
+                    #преобразование булевых значений
+                    if val.upper() in ['TRUE', 'FALSE']:
+                        dog_values[col_name] = val.upper() == 'TRUE'
+                    else:
+                        dog_values[col_name] = val
+
+            #проверка обязательных полей
+            required_fields = ['id_breed', 'owner', 'assesment', 'gender']
+            for field in required_fields:
+                if field not in dog_values or dog_values[field] == '':
+                    messagebox.showerror("Ошибка", f"Поле '{field}' обязательно для заполнения")
+                    return
+
+            #данные выставки
+            exp_filled = False
+            for field, (widget, required) in exp_entries.items():
+                if required and widget.get():
+                    exp_filled = True
+                    break
+            exp_values = {}
+            if exp_filled:
+                for field, (widget, required) in exp_entries.items():
                     val = widget.get()
+                    if val or (required and val == ''):
+                        exp_values[field] = val
 
-                    #обработка специальных полей
-                    if col_name == 'id_breed' and isinstance(widget, ttk.Combobox):
-                        selected = val
-                        if selected:
-                            for key, breed_id in breed_dict.items():
-                                if key == selected:
-                                    dog_values[col_name] = breed_id
-                                    break
-                    elif val:
-                        #преобразование булевых значений
-                        if val.upper() in ['TRUE', 'FALSE']:
-                            dog_values[col_name] = val.upper() == 'TRUE'
-                        else:
-                            dog_values[col_name] = val
-
-                #проверка обязательных полей
-                required_fields = ['id_breed', 'owner', 'assesment', 'gender']
-                for field in required_fields:
-                    if field not in dog_values or dog_values[field] == '':
-                        messagebox.showerror("Ошибка", f"Поле '{field}' обязательно для заполнения")
-                        return
-                dog_query = sql.SQL("INSERT INTO Dogs ({}) VALUES ({}) RETURNING id_dog").format(
-                    sql.SQL(', ').join(map(sql.Identifier, dog_values.keys())),
-                    sql.SQL(', ').join(sql.Placeholder() * len(dog_values))
-                )
+            state = self.view_state('Dogs')
 
-                print(f"Dogs query: {dog_query.as_string(self.conn)}")
-                print(f"Dogs values: {list(dog_values.values())}")
+            def save():
+                #собака и выставка в одной транзакции на одном соединении
+                with self.db.connection() as conn, conn.cursor() as cursor:
+                    dog_query, dog_params = self.build_insert(state, 'Dogs', dog_values)
 
-                self.cursor.execute(dog_query, list(dog_values.values()))
-                result = self.cursor.fetchone()
-                dog_id = result[0] if result else None
+                    log.debug("Dogs: %s %s", dog_query.as_string(conn), dog_params)
 
-                print(f"New dog ID: {dog_id}")
+                    cursor.execute(dog_query, dog_params)
+                    dog_row = cursor.fetchone()
+                    columns = [desc[0] for desc in cursor.description]
+                    dog_id = dog_row[columns.index('id_dog')] if dog_row else None
 
-                #сохранение выставки
-                exp_filled = False
-                for field, (widget, required) in exp_entries.items():
-                    if required and widget.get():
-                        exp_filled = True
-                        break
-                if dog_id and exp_filled:
-                    exp_values = {}
-                    for field, (widget, required) in exp_entries.items():
-                        val = widget.get()
-                        if val or (required and val == ''):
-                            exp_values[field] = val
-                    if exp_values:
+                    log.debug("New dog ID: %s", dog_id)
+
+                    #сохранение выставки
+                    if dog_id and exp_values:
                         exp_values['id_dog'] = dog_id
                         exp_query = sql.SQL("INSERT INTO Exhibitions ({}) VALUES ({})").format(
                             sql.SQL(', ').join(map(sql.Identifier, exp_values.keys())),
                             sql.SQL(', ').join(sql.Placeholder() * len(exp_values))
                         )
-                        print(f"Exhibitions query: {exp_query.as_string(self.conn)}")
-                        print(f"Exhibitions values: {list(exp_values.values())}")
-                        self.cursor.execute(exp_query, list(exp_values.values()))
-                self.conn.commit()
+                        log.debug("Exhibitions: %s %s", exp_query.as_string(conn),
+                                  list(exp_values.values()))
+                        cursor.execute(exp_query, list(exp_values.values()))
+                return dog_row, bool(dog_id and exp_values)
+
+            #кэши сбрасываются в главном потоке: их читают загрузка таблицы и сортировка
+            def on_saved(result):
+                dog_row, exhibition_saved = result
+                self.table_changed('Dogs')
+                if exhibition_saved:
+                    self.table_changed('Exhibitions')
                 messagebox.showinfo("Успех", "Данные сохранены")
                 parent.destroy()
-                self.refresh_data()
+                if state and dog_row:
+                    self.place_new_row(state, dog_row)
 
-            except Exception as e:
-                self.conn.rollback()
+            def on_error(e):
                 error_msg = f"Ошибка сохранения: {str(e)[:200]}..."
                 messagebox.showerror("Ошибка", error_msg)
-                print(f"Ошибка в save_all: {e}")
-                traceback.print_exc()
+                log.error("Ошибка в save_all: %s", e, exc_info=e)
+
+            self.run_async(save, on_saved, on_error, message="Сохранение...")
 
         ttk.Button(parent, text="Сохранить все", command=save_all).pack(pady=10)
 
     #общие формы таблиц
-    def create_general_form(self, parent, default_values):
-        #получение структуры таблицы
-        try:
-            self.cursor.execute(f"""
-                SELECT column_name, data_type, is_nullable
-                FROM information_schema.columns 
-                WHERE table_name = %s 
-                ORDER BY ordinal_position
-            """, (self.current_table.lower(),))
-
-            columns = self.cursor.fetchall()
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось получить структуру таблицы: {e}")
-            parent.destroy()
-            return
-
+    def create_general_form(self, parent, default_values, columns, foreign_keys, lookups):
         entries = {}
-        for i, (col_name, data_type, is_nullable) in enumerate(columns):
-            if 'serial' in data_type or col_name in ['id_dog', 'id_exhibition', 'id_record', 'id_illness']:
-                continue
-
+        for i, (col_name, data_type, is_nullable, default) in enumerate(columns):
             ttk.Label(parent, text=f"{col_name}:").grid(
                 row=i, column=0, sticky=tk.W, pady=5, padx=5
             )
@@ -483,102 +1144,86 @@ class DogBreedingApp:
                                      values=['', 'Gold', 'Silver', 'Bronze'],
                                      state='readonly')
                 entry.set('')
-            elif col_name == 'id_breed':
-                #загружаем список пород для выбора
-                self.cursor.execute("SELECT id_breed, name FROM Breeds ORDER BY name")
-                breeds = self.cursor.fetchall()
-                breed_dict = {f"{name} (ID: {id_})": id_ for id_, name in breeds}
-                entry = ttk.Combobox(parent, values=list(breed_dict.keys()), state='readonly')
-            elif col_name in ['id_mother', 'id_father', 'id_dog']:
-                #загружаем список собак для выбора
-                self.cursor.execute("SELECT id_dog, owner FROM Dogs WHERE alive = TRUE ORDER BY owner")
-                dogs = self.cursor.fetchall()
-                dog_dict = {f"{owner} (ID: {id_})": id_ for id_, owner in dogs}
-                entry = ttk.Combobox(parent, values=[''] + list(dog_dict.keys()), state='readonly')
+            elif col_name == 'id_breed' and col_name in lookups:
+                #список пород для выбора
+                entry = ttk.Combobox(parent, values=lookups[col_name].labels, state='readonly')
+            elif col_name in ['id_mother', 'id_father', 'id_dog'] and col_name in foreign_keys:
+                #поиск собаки по мере ввода, мать и отец - с фильтром по полу
+                gender = {'id_mother': 'F', 'id_father': 'M'}.get(col_name)
+                entry = DogPicker(parent, self, gender=gender)
                 entry.set('')
-            elif col_name == 'id_illness':
-                #загружаем список болезней для выбора
-                self.cursor.execute("SELECT id_illness, name FROM Medicine_book ORDER BY name")
-                illnesses = self.cursor.fetchall()
-                illness_dict = {f"{name} (ID: {id_})": id_ for id_, name in illnesses}
-                entry = ttk.Combobox(parent, values=list(illness_dict.keys()), state='readonly')
+            elif col_name == 'id_illness' and col_name in lookups:
+                #список болезней для выбора
+                entry = ttk.Combobox(parent, values=lookups[col_name].labels, state='readonly')
             else:
                 entry = ttk.Entry(parent)
 
             entry.grid(row=i, column=1, sticky=tk.EW, pady=5, padx=5)
-            entries[col_name] = (
-            entry, data_type, col_name in ['id_breed', 'id_mother', 'id_father', 'id_dog', 'id_illness'])
+            entries[col_name] = (entry, data_type, lookups.get(col_name))
 
         parent.columnconfigure(1, weight=1)
 
         def save_record():
-            try:
-                values = {}
-                special_dicts = {}
+            table = self.current_table
+            values = {}
+
+            for col_name, (widget, data_type, lookup) in entries.items():
+                val = widget.get()
+
+                if val:
+                    #собака из поиска
+                    if isinstance(widget, DogPicker):
+                        dog_id = widget.get_id()
+                        if dog_id is None:
+                            messagebox.showerror("Ошибка", f"Выберите собаку в поле '{col_name}'")
+                            return
+                        values[col_name] = dog_id
 
-                for col_name, (widget, data_type, is_special) in entries.items():
-                    val = widget.get()
+                    #выбор из справочника: id по подписи без обращения к бд
+                    elif lookup is not None and isinstance(widget, ttk.Combobox):
+                        if val in lookup.by_label:
+                            values[col_name] = lookup.by_label[val]
 
-                    if val:
-                        #обработка специальных полей с выпадающими списками
-                        if is_special and isinstance(widget, ttk.Combobox):
-                            if col_name == 'id_breed':
-                                self.cursor.execute("SELECT id_breed, name FROM Breeds ORDER BY name")
-                                items = self.cursor.fetchall()
-                                item_dict = {f"{name} (ID: {id_})": id_ for id_, name in items}
-                            elif col_name in ['id_mother', 'id_father', 'id_dog']:
-                                self.cursor.execute("SELECT id_dog, owner FROM Dogs WHERE alive = TRUE ORDER BY owner")
-                                items = self.cursor.fetchall()
-                                item_dict = {f"{owner} (ID: {id_})": id_ for id_, owner in items}
-                            elif col_name == 'id_illness':
-                                self.cursor.execute("SELECT id_illness, name FROM Medicine_book ORDER BY name")
-                                items = self.cursor.fetchall()
-                                item_dict = {f"{name} (ID: {id_})": id_ for id_, name in items}
-                            else:
-                                item_dict = {}
-
-                            #извлекаем ключ из строки
-                            for key, item_id in item_dict.items():
-                                if key == val:
-                                    values[col_name] = item_id
-                                    break
-
-                        #преобразование булевых значений
-                        elif val.upper() in ['TRUE', 'FALSE']:
-                            values[col_name] = val.upper() == 'TRUE'
-                        elif 'int' in data_type or 'numeric' in data_type:
+                    #преобразование булевых значений
+                    elif val.upper() in ['TRUE', 'FALSE']:
+                        values[col_name] = val.upper() == 'TRUE'
+                    elif 'int' in data_type or 'numeric' in data_type:
+                        try:
+                            values[col_name] = int(val)
+                        except ValueError:
                             try:
-                                values[col_name] = int(val)
+                                values[col_name] = float(val)
                             except ValueError:
-                                try:
-                                    values[col_name] = float(val)
-                                except ValueError:
-                                    values[col_name] = val
-                        else:
-                            values[col_name] = val
-
-                if values:
-                    query = sql.SQL("INSERT INTO {} ({}) VALUES ({})").format(
-                        sql.Identifier(self.current_table),
-                        sql.SQL(', ').join(map(sql.Identifier, values.keys())),
-                        sql.SQL(', ').join(sql.Placeholder() * len(values))
-                    )
-
-                    print(f"Insert query: {query.as_string(self.conn)}")
-                    print(f"Values: {list(values.values())}")
-
-                    self.cursor.execute(query, list(values.values()))
-                    self.conn.commit()
-                    messagebox.showinfo("Успех", "Запись добавлена")
-                    parent.destroy()
-                    self.refresh_data()
+                                values[col_name] = val
+                    else:
+                        values[col_name] = val
 
-            except Exception as e:
-                self.conn.rollback()
+            if not values:
+                return
+
+            state = self.view_state(table)
+
+            def save():
+                query, params = self.build_insert(state, table, values)
+
+                log.debug("Insert: %s %s", query, params)
+
+                _, rows = self.fetch_with_columns(query, params)
+                return rows[0] if rows else None
+
+            def on_saved(row):
+                self.table_changed(table)
+                messagebox.showinfo("Успех", "Запись добавлена")
+                parent.destroy()
+                if state and row:
+                    self.place_new_row(state, row)
+
+            def on_error(e):
                 error_msg = f"Ошибка: {str(e)[:200]}..."
                 messagebox.showerror("Ошибка", error_msg)
-                print(f"Ошибка в save_record: {e}")
-                traceback.print_exc()
+                log.error("Ошибка в save_record: %s", e, exc_info=e)
+
+            self.run_async(save, on_saved, on_error, message="Сохранение...")
 
         ttk.Button(parent, text="Сохранить", command=save_record).pack(pady=10)
 
@@ -591,85 +1236,187 @@ class DogBreedingApp:
             messagebox.showwarning("Предупреждение", "Выберите запись для удаления")
             return
         if messagebox.askyesno("Подтверждение", "Удалить выбранную запись?"):
-            try:
-                #получение первичного ключа
-                item = self.tree.item(selection[0])
-                record_id = item['values'][0]
-                #получаем имя первичного ключа
-                self.cursor.execute(f"""
-                    SELECT column_name 
-                    FROM information_schema.key_column_usage 
-                    WHERE table_name = %s 
-                    AND constraint_name LIKE '%_pkey'
-                """, (self.current_table.lower(),))
-
-                pk_result = self.cursor.fetchone()
-                pk_column = pk_result[0] if pk_result else 'id'
-
-                query = f"DELETE FROM {self.current_table} WHERE {pk_column} = %s"
-                self.cursor.execute(query, (record_id,))
-                self.conn.commit()
-
-                self.tree.delete(selection[0])
+            table = self.current_table
+            item = selection[0]
+            #ключ строки, сохраненный при загрузке страницы (таблица могла перезагрузиться)
+            cursor = self.page_state['item_cursors'].get(item) if self.page_state else None
+            if cursor is None:
+                messagebox.showerror("Ошибка", "Запись не найдена, обновите таблицу")
+                return
+            _, record_id = cursor
+
+            def delete():
+                pk_column = self.get_primary_key(table)
+                query = f"DELETE FROM {table} WHERE {pk_column} = %s"
+                self.execute_sql(query, (record_id,), fetch=False)
+                #таблицы строк, удаленных ON DELETE CASCADE (собаки породы, их выставки и т.д.)
+                return self.schema.cascade_tables(table)
+
+            def on_deleted(cascaded_tables):
+                self.table_changed(table)
+                for cascaded in cascaded_tables:
+                    self.table_changed(cascaded)
+                if self.tree.exists(item):
+                    self.tree.delete(item)
+                self.forget_tree_item(item)
                 self.status_bar.config(text="Запись удалена")
 
-            except Exception as e:
-                self.conn.rollback()
+            def on_error(e):
                 error_msg = f"Ошибка удаления: {str(e)[:100]}..."
                 messagebox.showerror("Ошибка", error_msg)
-                print(f"Ошибка в delete_record: {e}")
+                log.error("Ошибка в delete_record: %s", e)
+
+            self.run_async(delete, on_deleted, on_error, message="Удаление записи...")
+
+    #массовая загрузка записей текущей таблицы из CSV или Excel
+    def import_records(self):
+        table = self.current_table
+        if table not in IMPORT_TABLES:
+            messagebox.showwarning("Импорт",
+                                   f"Выберите одну из таблиц: {', '.join(IMPORT_TABLES)}")
+            return
+        path = filedialog.askopenfilename(
+            title=f"Импорт в {table}",
+            filetypes=[("CSV и Excel", "*.csv *.xlsx *.xls"), ("Все файлы", "*.*")]
+        )
+        if not path:
+            return
+
+        def load():
+            return BulkImporter(self.db, self.schema).import_file(table, path)
+
+        def on_loaded(result):
+            loaded, rejected = result
+            if loaded:
+                self.table_changed(table)
+            self.status_bar.config(text=f"Импортировано записей: {loaded}, отклонено: {len(rejected)}")
+            if table == self.current_table:
+                self.load_table_data()
+            if len(rejected):
+                #отклоненные строки можно выгрузить кнопкой экспорта в окне отчета
+                rows = rejected.astype(object).where(rejected.notna(), None).values.tolist()
+                self.show_report_results(f"Отклоненные строки: {table}", list(rejected.columns),
+                                         rows, note=f"Загружено строк: {loaded}")
+            else:
+                messagebox.showinfo("Импорт", f"Загружено строк: {loaded}")
+
+        def on_error(e):
+            messagebox.showerror("Ошибка импорта", f"Файл не загружен: {str(e)[:200]}")
+            log.error("Ошибка в import_records: %s", e)
+
+        self.run_async(load, on_loaded, on_error, message=f"Импорт в {table}...")
+
+    #выгрузка текущей таблицы с фильтрами, поиском и сортировкой
+    def export_table(self):
+        state = self.page_state
+        if not state or not state['key_column']:
+            return
+        query = f"SELECT * FROM {state['table']}"
+        if state['conditions']:
+            query += " WHERE " + " AND ".join(state['conditions'])
+        order = "DESC" if state['reverse'] else "ASC"
+        order_by = [f"{state['key_column']} {order}"]
+        if state['sort_column'] and state['sort_column'] != state['key_column']:
+            order_by.insert(0, f"{state['sort_column']} {order} NULLS LAST")
+        query += " ORDER BY " + ", ".join(order_by)
+        self.export_to_file(state['table'], query=query, params=state['params'])
+
+    #выгрузка в файл в фоне: запрос - через COPY на сервере, иначе готовые строки
+    def export_to_file(self, title, query=None, params=None, columns=None, rows=None):
+        default_name = f"{title.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        path = filedialog.asksaveasfilename(title="Экспорт", initialfile=default_name,
+                                            defaultextension=".csv",
+                                            filetypes=exporter.EXPORT_FILETYPES)
+        if not path:
+            return
+
+        def on_progress(written):
+            row_count, byte_count = written
+            self.status_bar.config(
+                text=f"Экспорт: {row_count} строк, {byte_count / 1024 / 1024:.1f} МБ"
+            )
+
+        def report_progress(row_count, byte_count):
+            self.post_progress((row_count, byte_count))
+
+        def export():
+            if query is not None:
+                return exporter.export_query(self.db, query, params or None, path, report_progress)
+            return exporter.export_rows(columns, rows, path, report_progress)
+
+        def on_exported(count):
+            self.status_bar.config(text=f"Экспортировано строк: {count}")
+            messagebox.showinfo("Экспорт", f"Данные сохранены в {path}")
+
+        def on_error(e):
+            messagebox.showerror("Ошибка экспорта", str(e))
+
+        self.run_async(export, on_exported, on_error, message="Экспорт...",
+                       on_progress=on_progress)
 
     #использование поиска
     def apply_search(self):
-        search_text = self.search_var.get()
-        if search_text and self.current_table:
-            try:
-                #поиск по всем текстовым полям
-                self.cursor.execute(f"""
-                    SELECT column_name 
-                    FROM information_schema.columns 
-                    WHERE table_name = %s 
-                    AND data_type IN ('text', 'character varying', 'char')
-                """, (self.current_table.lower(),))
-
-                text_columns = [row[0] for row in self.cursor.fetchall()]
-
-                if text_columns:
-                    conditions = [f"{col}::text ILIKE %s" for col in text_columns]
-                    query = f"""
-                        SELECT * FROM {self.current_table} 
-                        WHERE {' OR '.join(conditions)}
-                    """
-                    params = [f"%{search_text}%"] * len(text_columns)
-
-                    self.load_table_data(custom_query=(query, params))
-            except Exception as e:
+        search_text = self.search_var.get().strip()
+        if search_text and (self.search_all_var.get() or not self.current_table):
+            self.search_all_tables(search_text)
+        elif search_text and self.current_table:
+            table = self.current_table
+
+            #поиск по всем текстовым полям
+            def load_text_columns():
+                return search.searchable_columns(self.schema, table)
+
+            def on_loaded(text_columns):
+                if text_columns and table == self.current_table:
+                    self.current_search = (text_columns, search_text)
+                    self.load_table_data()
+
+            def on_error(e):
                 messagebox.showerror("Ошибка поиска", f"Ошибка: {e}")
+
+            self.run_async(load_text_columns, on_loaded, on_error, message="Поиск...")
         else:
+            self.current_search = None
             self.load_table_data()
 
+    #поиск по владельцам, адресам, породам, выставкам и болезням одним запросом
+    def search_all_tables(self, search_text):
+        def on_found(rows):
+            counts = {}
+            for row in rows:
+                counts[row[0]] = counts.get(row[0], 0) + 1
+            note = ", ".join(f"{table}: {count}" for table, count in counts.items())
+            self.show_report_results(f"Поиск: {search_text}", search.SEARCH_COLUMNS, rows,
+                                     note=note or None)
+
+        def on_error(e):
+            messagebox.showerror("Ошибка поиска", f"Ошибка: {e}")
+
+        self.run_async(lambda: search.search_all(self.db, search_text), on_found, on_error,
+                       message="Поиск по всем таблицам...")
+
     #диалог фильтра
     def open_filter_dialog(self):
         if not self.current_table:
             return
 
-        dialog = tk.Toplevel(self.root)
-        dialog.title(f"Фильтр: {self.current_table}")
-        dialog.geometry("500x400")
+        table = self.current_table
 
-        try:
-            self.cursor.execute(f"""
-                SELECT column_name, data_type 
-                FROM information_schema.columns 
-                WHERE table_name = %s
-                ORDER BY ordinal_position
-            """, (self.current_table.lower(),))
-
-            columns = self.cursor.fetchall()
-        except Exception as e:
+        def load_columns():
+            return self.schema.columns(table)
+
+        def on_error(e):
             messagebox.showerror("Ошибка", f"Не удалось получить структуру таблицы: {e}")
-            dialog.destroy()
-            return
+
+        self.run_async(load_columns, lambda columns: self.create_filter_dialog(table, columns),
+                       on_error, message="Загрузка структуры таблицы...")
+
+    #окно фильтра по колонкам таблицы
+    def create_filter_dialog(self, table, columns):
+        dialog = tk.Toplevel(self.root)
+        dialog.title(f"Фильтр: {table}")
+        dialog.geometry("650x400")
+
         canvas = tk.Canvas(dialog)
         scrollbar = ttk.Scrollbar(dialog, orient="vertical", command=canvas.yview)
         scrollable_frame = ttk.Frame(canvas)
@@ -683,7 +1430,8 @@ class DogBreedingApp:
         canvas.configure(yscrollcommand=scrollbar.set)
 
         filter_widgets = {}
-        for i, (col_name, data_type) in enumerate(columns):
+        for i, column in enumerate(columns):
+            col_name, data_type = column.name, column.data_type
             ttk.Label(scrollable_frame, text=f"{col_name}:").grid(
                 row=i, column=0, sticky=tk.W, pady=5, padx=5
             )
@@ -699,18 +1447,21 @@ class DogBreedingApp:
                 widget = ttk.Combobox(scrollable_frame, values=values.get(col_name, ['']),
                                       state='readonly')
                 widget.set('')
-            elif 'int' in data_type or 'numeric' in data_type or 'serial' in data_type:
-                #для числовых полей используем Entry
-                widget = ttk.Entry(scrollable_frame)
-            elif 'date' in data_type:
-                #для дат используем DateEntry
-                widget = DateEntry(scrollable_frame, date_pattern='yyyy-mm-dd')
             else:
-                #для текстовых полей
+                #числа, даты и текст - выражение фильтра (диапазоны, списки, префиксы)
                 widget = ttk.Entry(scrollable_frame)
+                ttk.Label(scrollable_frame, text=filter_hint(column), foreground='gray').grid(
+                    row=i, column=2, sticky=tk.W, padx=5
+                )
 
+            #текущий фильтр колонки
+            current = self.current_filter.get(col_name, '')
+            if isinstance(widget, ttk.Combobox):
+                widget.set(current.lstrip('='))
+            else:
+                widget.insert(0, current)
             widget.grid(row=i, column=1, sticky=tk.EW, pady=5, padx=5)
-            filter_widgets[col_name] = (widget, data_type)
+            filter_widgets[col_name] = (widget, column)
 
         scrollable_frame.columnconfigure(1, weight=1)
 
@@ -720,41 +1471,20 @@ class DogBreedingApp:
 
         def apply_filters():
             filters = {}
-            for col_name, (widget, data_type) in filter_widgets.items():
-                value = None
-
-                if isinstance(widget, ttk.Combobox):
-                    value = widget.get()
-                elif isinstance(widget, DateEntry):
-                    value = widget.get_date().strftime('%Y-%m-%d') if widget.get_date() else ''
-                elif isinstance(widget, ttk.Entry):
-                    value = widget.get()
-
-                if value and value != '':
-                    #преобразуем значение в зависимости от типа данных
-                    if data_type == 'date' and isinstance(value, str):
-                        try:
-                            datetime.strptime(value, '%Y-%m-%d')
-                            filters[col_name] = value
-                        except ValueError:
-                            messagebox.showwarning("Предупреждение",
-                                                   f"Некорректная дата в поле {col_name}. Используйте формат ГГГГ-ММ-ДД")
-                            return
-                    elif 'bool' in data_type:
-                        filters[col_name] = value
-                    elif col_name in ['gender', 'medal']:
-                        filters[col_name] = value
-                    elif ('int' in data_type or 'numeric' in data_type or 'serial' in data_type) and value:
-                        #проверяем, что это число
-                        try:
-                            float(value)  #проверяем, можно ли преобразовать в число
-                            filters[col_name] = value
-                        except ValueError:
-                            messagebox.showwarning("Предупреждение",
-                                                   f"Некорректное число в поле {col_name}")
-                            return
-                    else:
-                        filters[col_name] = value
+            for col_name, (widget, column) in filter_widgets.items():
+                value = widget.get().strip()
+                if not value:
+                    continue
+                #значение из списка - точное совпадение, а не подстрока
+                if isinstance(widget, ttk.Combobox) and column_kind(column) == 'text':
+                    value = '=' + value
+                #проверяем выражение до загрузки таблицы
+                try:
+                    compile_filter(column, value)
+                except FilterError as e:
+                    messagebox.showwarning("Предупреждение", str(e))
+                    return
+                filters[col_name] = value
 
             self.current_filter = filters
             self.load_table_data()
@@ -762,12 +1492,10 @@ class DogBreedingApp:
             messagebox.showinfo("Фильтр", f"Применено {len(filters)} фильтров")
 
         def clear_filters():
-            for col_name, (widget, data_type) in filter_widgets.items():
+            for col_name, (widget, column) in filter_widgets.items():
                 if isinstance(widget, ttk.Combobox):
                     widget.set('')
-                elif isinstance(widget, DateEntry):
-                    widget.set_date(None)
-                elif isinstance(widget, ttk.Entry):
+                else:
                     widget.delete(0, tk.END)
 
         ttk.Button(button_frame, text="Применить фильтры",
@@ -785,106 +1513,42 @@ class DogBreedingApp:
         self.current_filter = {}
         self.sort_column = None
         self.sort_reverse = False
+        self.current_search = None
         self.search_var.set("")
         self.load_table_data()
         messagebox.showinfo("Фильтры", "Все фильтры сброшены")
 
     #обновление данных таблицы
     def refresh_data(self):
-        if self.current_table:
-            self.load_table_data()
+        self.result_cache = None
+
+        def on_checked(changed):
+            if changed:
+                self.status_bar.config(text="Структура БД обновлена")
+            if self.current_table:
+                self.load_table_data()
+
+        #заодно проверяем, не изменилась ли схема
+        self.run_async(self.schema.refresh_if_changed, on_checked,
+                       message="Проверка структуры БД...")
 
     #отчет пар для вязки
     def generate_breeding_report(self):
-        base_query = """
-        SELECT 
-            m.id_dog as id_кобеля,
-            f.id_dog as id_суки,
-            m.owner as владелец_кобеля,
-            f.owner as владелец_суки,
-            bm.name as порода_кобеля,
-            bf.name as порода_суки,
-            m.assesment as оценка_кобеля,
-            f.assesment as оценка_суки,
-            (m.assesment + f.assesment) as сумма_оценок
-        FROM Dogs m
-        JOIN Dogs f ON m.id_breed = f.id_breed 
-            AND m.gender = 'M' 
-            AND f.gender = 'F'
-            AND m.id_dog != f.id_dog
-        JOIN Breeds bm ON m.id_breed = bm.id_breed
-        JOIN Breeds bf ON f.id_breed = bf.id_breed
-        WHERE m.alive = TRUE AND f.alive = TRUE
-            AND m.assesment >= 4 AND f.assesment >= 4
-        """
-
-        self.show_report_dialog(
-            title="Пары для вязки",
-            description="Критерии отбора:\n• Оценка родителей ≥ 4\n• Отсутствие родственных связей\n• Все оценки на выставках ≥ 4",
-            base_query=base_query,
-            report_type="breeding"
-        )
+        #пары подбирает BreedingPairEngine по породам, без полного соединения Dogs x Dogs
+        self.show_report_dialog("breeding")
 
     #отчет пар для элитной вязки
     def generate_elite_breeding_report(self):
-        base_query = """
-        SELECT 
-            m.id_dog as id_кобеля,
-            f.id_dog as id_суки,
-            m.owner as владелец_кобеля,
-            f.owner as владелец_суки,
-            bm.name as порода_кобеля,
-            bf.name as порода_суки,
-            m.assesment as оценка_кобеля,
-            f.assesment as оценка_суки,
-            (SELECT COUNT(*) FROM Exhibitions WHERE id_dog = m.id_dog AND medal IS NOT NULL) as медали_кобеля,
-            (SELECT COUNT(*) FROM Exhibitions WHERE id_dog = f.id_dog AND medal IS NOT NULL) as медали_суки,
-            (m.assesment + f.assesment) as сумма_оценок
-        FROM Dogs m
-        JOIN Dogs f ON m.id_breed = f.id_breed 
-            AND m.gender = 'M' 
-            AND f.gender = 'F'
-            AND m.id_dog != f.id_dog
-        JOIN Breeds bm ON m.id_breed = bm.id_breed
-        JOIN Breeds bf ON f.id_breed = bf.id_breed
-        WHERE m.alive = TRUE AND f.alive = TRUE
-            AND m.assesment >= 4 AND f.assesment >= 4
-            AND EXISTS (SELECT 1 FROM Exhibitions WHERE id_dog = m.id_dog AND medal IS NOT NULL)
-            AND EXISTS (SELECT 1 FROM Exhibitions WHERE id_dog = f.id_dog AND medal IS NOT NULL)
-        """
-
-        self.show_report_dialog(
-            title="Пары для элитной вязки",
-            description="Критерии отбора:\n• Оценка родителей ≥ 4\n• Наличие минимум 1 медали у каждого родителя\n• Обязательно наличие щенков",
-            base_query=base_query,
-            report_type="elite"
-        )
+        self.show_report_dialog("elite")
 
     #отчет слежубных собак
     def generate_service_dogs_report(self):
-        base_query = """
-        SELECT 
-            d.id_dog as id_собаки,
-            d.owner as владелец,
-            d.assesment as оценка,
-            d.psyche_test as тест_психики,
-            b.name as порода,
-            b.characteristic as характеристика
-        FROM Dogs d
-        JOIN Breeds b ON d.id_breed = b.id_breed
-        WHERE d.alive = TRUE
-            AND d.psyche_test = 5
-        """
-
-        self.show_report_dialog(
-            title="Собаки для служебного использования",
-            description="Критерии отбора:\n• Тест психики = 5\n• Живые собаки",
-            base_query=base_query,
-            report_type="service"
-        )
+        self.show_report_dialog("service")
 
     #окно с выбором сортировки отчета
-    def show_report_dialog(self, title, description, base_query, report_type):
+    def show_report_dialog(self, report_type):
+        title = REPORTS[report_type].title
+        description = self.reports.description(report_type)
         dialog = tk.Toplevel(self.root)
         dialog.title(f"Отчет: {title}")
         dialog.geometry("600x300")
@@ -904,30 +1568,7 @@ class DogBreedingApp:
 
         ttk.Label(sort_frame, text="Сортировка:",
                   font=('Arial', 10)).grid(row=0, column=0, sticky=tk.W, pady=5)
-        sort_options = []
-        if report_type == "breeding":
-            sort_options = [
-                ("По сумме оценок", "сумма_оценок"),
-                ("По оценке кобеля", "оценка_кобеля"),
-                ("По оценке суки", "оценка_суки"),
-                ("По породе кобеля", "порода_кобеля"),
-                ("По породе суки", "порода_суки")
-            ]
-        elif report_type == "elite":
-            sort_options = [
-                ("По сумме оценок", "сумма_оценок"),
-                ("По оценке кобеля", "оценка_кобеля"),
-                ("По оценке суки", "оценка_суки"),
-                ("По медалям кобеля", "медали_кобеля"),
-                ("По медалям суки", "медали_суки")
-            ]
-        elif report_type == "service":
-            sort_options = [
-                ("По оценке собаки", "оценка"),
-                ("По тесту психики", "тест_психики"),
-                ("По породе", "порода"),
-                ("По владельцу", "владелец")
-            ]
+        sort_options = REPORTS[report_type].sort_options
 
         sort_var = tk.StringVar()
         sort_combo = ttk.Combobox(sort_frame, textvariable=sort_var,
@@ -944,35 +1585,119 @@ class DogBreedingApp:
                                    state='readonly', width=30)
         order_combo.grid(row=1, column=1, sticky=tk.EW, padx=5)
 
+        #число лучших пар (на породу или всего) для отчета по вязке
+        top_k_var = tk.IntVar(value=self.breeding_top_k)
+        scope_var = tk.StringVar(value="На каждую породу")
+        if report_type == "breeding":
+            dialog.geometry("600x360")
+            ttk.Label(sort_frame, text="Лучших пар (K):").grid(row=2, column=0, sticky=tk.W, pady=5)
+            ttk.Spinbox(sort_frame, from_=1, to=100000, textvariable=top_k_var,
+                        width=30).grid(row=2, column=1, sticky=tk.EW, padx=5)
+            ttk.Label(sort_frame, text="Отбор:").grid(row=3, column=0, sticky=tk.W, pady=5)
+            ttk.Combobox(sort_frame, textvariable=scope_var,
+                         values=["На каждую породу", "Всего"],
+                         state='readonly', width=30).grid(row=3, column=1, sticky=tk.EW, padx=5)
+
+        #живой расчет или сохраненный результат, пересчитываемый по расписанию
+        source_labels = {'live': "Живой расчет", 'view': "Сохраненный (по расписанию)"}
+        source_var = tk.StringVar(value=source_labels['live'])
+        if report_type in REPORT_VIEWS:
+            source_var.set(source_labels[self.report_source])
+            ttk.Label(sort_frame, text="Данные:").grid(row=4, column=0, sticky=tk.W, pady=5)
+            ttk.Combobox(sort_frame, textvariable=source_var,
+                         values=list(source_labels.values()),
+                         state='readonly', width=30).grid(row=4, column=1, sticky=tk.EW, padx=5)
+            dialog.geometry("600x400" if report_type in ("breeding", "elite") else "600x340")
+
         sort_frame.columnconfigure(1, weight=1)
 
-        def generate_report():
-            try:
-                #SQL выражение для сортировки
-                selected_text = sort_var.get()
-                selected_field = None
-                for text, field in sort_options:
-                    if text == selected_text:
-                        selected_field = field
-                        break
-
-                if not selected_field:
-                    selected_field = sort_options[0][1]
-                order = "DESC" if order_var.get() == "По убыванию" else "ASC"
-
-                #формируем финальный запрос с сортировкой
-                final_query = base_query + f" ORDER BY {selected_field} {order}"
-                rows = self.execute_sql(final_query)
-                columns = [desc[0] for desc in self.cursor.description]
+        #актуальность сводки медалей и ее ручной пересчет
+        medal_note = {'text': None}
+        if report_type == "elite":
+            stats_frame = ttk.Frame(dialog)
+            stats_frame.pack(fill=tk.X, padx=20)
+            stats_label = ttk.Label(stats_frame, text="Сводка медалей: проверка...")
+            stats_label.pack(side=tk.LEFT)
+
+            def show_medal_status(result):
+                if not stats_label.winfo_exists():
+                    return
+                refreshed_at, stale = result
+                when = refreshed_at.strftime('%Y-%m-%d %H:%M') if refreshed_at else "никогда"
+                text = f"Сводка медалей обновлена: {when}"
+                if stale:
+                    text += " (устарела)"
+                medal_note['text'] = text
+                stats_label.config(text=text, foreground='red' if stale else '')
+
+            def check_medal_status():
+                self.run_async(lambda: medal_stats.status(self.db), show_medal_status,
+                               message="Проверка сводки медалей...")
+
+            def refresh_medal_stats():
+                stats_label.config(text="Сводка медалей: пересчет...")
+                self.run_async(lambda: medal_stats.refresh(self.db),
+                               lambda result: check_medal_status(),
+                               message="Пересчет сводки медалей...")
+
+            ttk.Button(stats_frame, text="Обновить сводку",
+                       command=refresh_medal_stats).pack(side=tk.RIGHT)
+            check_medal_status()
 
+        def generate_report():
+            #SQL выражение для сортировки
+            selected_text = sort_var.get()
+            selected_field = None
+            for text, field in sort_options:
+                if text == selected_text:
+                    selected_field = field
+                    break
+
+            if not selected_field:
+                selected_field = sort_options[0][1]
+            order = "DESC" if order_var.get() == "По убыванию" else "ASC"
+            source = next(key for key, label in source_labels.items()
+                          if label == source_var.get())
+            if report_type in REPORT_VIEWS:
+                self.report_source = source
+
+            if report_type == "breeding":
+                try:
+                    top_k = top_k_var.get()
+                except tk.TclError:
+                    messagebox.showwarning("Предупреждение", "Некорректное число пар")
+                    return
                 dialog.destroy()
-                self.show_report_results(title, columns, rows, report_type)
-
-            except Exception as e:
+                self.stream_breeding_report(title, selected_field, order == "DESC",
+                                            top_k, scope_var.get() == "На каждую породу", source)
+                return
+
+            def on_generated(result):
+                columns, rows, as_of = result
+                if dialog.winfo_exists():
+                    dialog.destroy()
+                #отчет без досчета в приложении выгружается прямо запросом
+                export_query = None
+                if report_type not in KINSHIP_REPORTS:
+                    export_query = self.reports.report_query(report_type, selected_field,
+                                                             order == "DESC", source)
+                note = medal_note['text'] if source == 'live' else self.as_of_note(as_of)
+                self.show_report_results(title, columns, rows, report_type, note=note,
+                                         export_query=export_query)
+
+            def on_error(e):
                 error_msg = f"Ошибка генерации отчета: {str(e)[:100]}..."
                 messagebox.showerror("Ошибка", error_msg)
-                print(f"Ошибка в generate_report: {e}")
-                print(f"Query: {final_query if 'final_query' in locals() else base_query}")
+                log.error("Ошибка в generate_report: %s", e)
+
+            def run_report():
+                columns, rows = self.reports.run(report_type, selected_field, order == "DESC",
+                                                 source=source)
+                as_of = self.reports.as_of(report_type) if source == 'view' else None
+                return columns, rows, as_of
+
+            self.run_async(run_report, on_generated, on_error,
+                           message=f"Формирование отчета: {title}...")
 
         def cancel():
             dialog.destroy()
@@ -985,8 +1710,43 @@ class DogBreedingApp:
         ttk.Button(button_frame, text="Отмена",
                    command=cancel, width=10).pack(side=tk.RIGHT, padx=5)
 
-    #отображение результатов отчета
-    def show_report_results(self, title, columns, data, report_type=None):
+    #подпись времени пересчета сохраненного отчета
+    def as_of_note(self, as_of):
+        if as_of is None:
+            return "Сохраненный результат еще не пересчитывался"
+        return f"Данные на {as_of.strftime('%Y-%m-%d %H:%M')} (сохраненный результат)"
+
+    #отчет по вязке: пары выводятся по мере подбора, в конце сортируются
+    def stream_breeding_report(self, title, sort_field, descending, top_k, per_breed,
+                               source='live'):
+        self.breeding_top_k = top_k
+        add_rows, set_note = self.show_report_results(title, PAIR_COLUMNS, [], "breeding")
+
+        def run_report():
+            _, rows = self.reports.run("breeding", sort_field, descending, top_k, per_breed,
+                                       on_chunk=self.post_progress, source=source)
+            as_of = self.reports.as_of("breeding") if source == 'view' else None
+            return rows, as_of
+
+        def on_generated(result):
+            rows, as_of = result
+            add_rows(rows, replace=True)
+            if source == 'view':
+                set_note(self.as_of_note(as_of))
+            self.status_bar.config(text=f"Отчет сформирован: {len(rows)} пар")
+
+        def on_error(e):
+            error_msg = f"Ошибка генерации отчета: {str(e)[:100]}..."
+            messagebox.showerror("Ошибка", error_msg)
+            log.error("Ошибка в stream_breeding_report: %s", e)
+
+        self.run_async(run_report, on_generated, on_error,
+                       message=f"Формирование отчета: {title}...", on_progress=add_rows)
+
+    #отображение результатов отчета; возвращает функции добавления строк и смены подписи
+    def show_report_results(self, title, columns, data, report_type=None, note=None,
+                            export_query=None):
+        data = list(data)
         report_window = tk.Toplevel(self.root)
         report_window.title(f"Результаты: {title}")
         report_window.geometry("1200x700")
@@ -995,9 +1755,12 @@ class DogBreedingApp:
 
         ttk.Label(header_frame, text=title,
                   font=('Arial', 14, 'bold')).pack()
+        note_label = ttk.Label(header_frame, text=note or "", font=('Arial', 9))
+        note_label.pack()
 
-        ttk.Label(header_frame, text=f"Найдено записей: {len(data)}",
-                  font=('Arial', 10)).pack(pady=5)
+        found_label = ttk.Label(header_frame, text=f"Найдено записей: {len(data)}",
+                                font=('Arial', 10))
+        found_label.pack(pady=5)
         tree_frame = ttk.Frame(report_window)
         tree_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
 
@@ -1015,13 +1778,41 @@ class DogBreedingApp:
         tree_frame.grid_columnconfigure(0, weight=1)
         tree["columns"] = columns
 
+        #элементы treeview в порядке строк data
+        items = []
+        #сортировка щелчком по заголовку: строки уже на клиенте, запрос не повторяется
+        sort_state = {'column': None, 'descending': False}
+
+        def sort_by(col):
+            if sort_state['column'] == col:
+                sort_state['descending'] = not sort_state['descending']
+            else:
+                sort_state['column'] = col
+                sort_state['descending'] = False
+            apply_sort()
+
+        def apply_sort():
+            col = sort_state['column']
+            if col is None:
+                return
+            index = columns.index(col)
+            order = sorted(range(len(data)), key=lambda i: sort_key(data[i][index]),
+                           reverse=sort_state['descending'])
+            data[:] = [data[i] for i in order]
+            items[:] = [items[i] for i in order]
+            for position, item in enumerate(items):
+                tree.move(item, "", position)
+            for c in columns:
+                arrow = (" ▼" if sort_state['descending'] else " ▲") if c == col else ""
+                tree.heading(c, text=c + arrow)
+
         for col in columns:
-            tree.heading(col, text=col, anchor=tk.W)
+            tree.heading(col, text=col, anchor=tk.W, command=lambda c=col: sort_by(c))
             tree.column(col, width=120, minwidth=80, anchor=tk.W)
 
         #заполнение данными
         for row in data:
-            tree.insert("", tk.END, values=row)
+            items.append(tree.insert("", tk.END, values=row))
 
         #статистика и кнопки экспорта
         bottom_frame = ttk.Frame(report_window)
@@ -1029,38 +1820,158 @@ class DogBreedingApp:
 
         #статистика
         stats_text = f"Всего записей: {len(data)}"
-        ttk.Label(bottom_frame, text=stats_text).pack(side=tk.LEFT)
+        stats_label = ttk.Label(bottom_frame, text=stats_text)
+        stats_label.pack(side=tk.LEFT)
 
         #кнопки
         button_frame = ttk.Frame(bottom_frame)
         button_frame.pack(side=tk.RIGHT)
 
-        #экспорт в csv
+        #экспорт в csv (после сортировки в окне - в показанном порядке)
         def export_to_csv():
-            try:
-                df = pd.DataFrame(data, columns=columns)
-                filename = f"{title.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-                df.to_csv(filename, index=False, encoding='utf-8-sig')
-                messagebox.showinfo("Экспорт", f"Данные сохранены в {filename}")
-            except Exception as e:
-                messagebox.showerror("Ошибка экспорта", str(e))
+            if export_query and sort_state['column'] is None:
+                self.export_to_file(title, query=export_query)
+            else:
+                self.export_to_file(title, columns=columns, rows=list(data))
 
         ttk.Button(button_frame, text="📥 Экспорт в CSV",
                    command=export_to_csv).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Закрыть",
                    command=report_window.destroy).pack(side=tk.LEFT, padx=5)
 
+        #добавление строк по мере формирования отчета (replace - заменить все)
+        def add_rows(rows, replace=False):
+            if not report_window.winfo_exists():
+                return
+            if replace:
+                data.clear()
+                items.clear()
+                tree.delete(*tree.get_children())
+            data.extend(rows)
+            for row in rows:
+                items.append(tree.insert("", tk.END, values=row))
+            if replace:
+                apply_sort()
+            found_label.config(text=f"Найдено записей: {len(data)}")
+            stats_label.config(text=f"Всего записей: {len(data)}")
+
+        def set_note(text):
+            if report_window.winfo_exists():
+                note_label.config(text=text)
+
+        return add_rows, set_note
+
+    #окно профиля запросов: статистика по формам запросов и медленные запросы с планами
+    def show_diagnostics(self):
+        window = tk.Toplevel(self.root)
+        window.title("Диагностика запросов")
+        window.geometry("1200x700")
+
+        notebook = ttk.Notebook(window)
+        notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        #формы запросов
+        shapes_frame = ttk.Frame(notebook)
+        notebook.add(shapes_frame, text="Запросы")
+        shape_columns = ['count', 'errors', 'total_ms', 'avg_ms', 'p50_ms', 'p95_ms',
+                         'max_ms', 'rows', 'features', 'shape']
+        shapes_tree = ttk.Treeview(shapes_frame, columns=shape_columns, show='headings')
+        for col in shape_columns:
+            shapes_tree.heading(col, text=col, anchor=tk.W)
+            width = 600 if col == 'shape' else (200 if col == 'features' else 70)
+            shapes_tree.column(col, width=width, minwidth=50, anchor=tk.W)
+        shapes_scroll = ttk.Scrollbar(shapes_frame, orient="vertical", command=shapes_tree.yview)
+        shapes_tree.configure(yscrollcommand=shapes_scroll.set)
+        statements_label = ttk.Label(shapes_frame)
+        statements_label.pack(side=tk.BOTTOM, fill=tk.X, pady=(5, 0))
+        shapes_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        shapes_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+
+        #медленные запросы и их планы
+        slow_frame = ttk.Frame(notebook)
+        notebook.add(slow_frame, text=f"Медленные (≥ {PROFILER.slow_query_ms} мс)")
+        slow_columns = ['at', 'elapsed_ms', 'feature', 'query']
+        slow_tree = ttk.Treeview(slow_frame, columns=slow_columns, show='headings', height=10)
+        for col in slow_columns:
+            slow_tree.heading(col, text=col, anchor=tk.W)
+            slow_tree.column(col, width=700 if col == 'query' else 140, anchor=tk.W)
+        slow_tree.pack(fill=tk.X)
+        plan_text = tk.Text(slow_frame, wrap=tk.NONE, font=('Courier', 9))
+        plan_text.pack(fill=tk.BOTH, expand=True, pady=(5, 0))
+        slow_items = {}
+
+        def show_plan(event):
+            selection = slow_tree.selection()
+            plan_text.delete(1.0, tk.END)
+            if selection:
+                entry = slow_items[selection[0]]
+                plan_text.insert(1.0, entry['query'] + "\n\n" +
+                                 (entry['plan'] or "План не снимался (запрос изменяет данные "
+                                                   "или план этой формы уже снят недавно)"))
+
+        slow_tree.bind('<<TreeviewSelect>>', show_plan)
+
+        def refresh():
+            statements = self.db.statements.stats()
+            statements_label.config(
+                text=f"Подготовленные операторы: использовано повторно {statements['hits']}, "
+                     f"подготовлено {statements['misses']} "
+                     f"(сейчас {statements['statements']} на {statements['connections']} соед.)"
+            )
+            shapes_tree.delete(*shapes_tree.get_children())
+            for stats in PROFILER.summary():
+                values = [stats[col] for col in shape_columns]
+                values[shape_columns.index('features')] = ", ".join(stats['features'])
+                shapes_tree.insert("", tk.END, values=values)
+            slow_tree.delete(*slow_tree.get_children())
+            slow_items.clear()
+            for entry in reversed(PROFILER.slow_queries()):
+                item = slow_tree.insert("", tk.END, values=[entry[col] for col in slow_columns])
+                slow_items[item] = entry
+
+        def reset():
+            PROFILER.reset()
+            refresh()
+
+        def export():
+            path = filedialog.asksaveasfilename(
+                title="Экспорт профиля", defaultextension=".json",
+                initialfile=f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+                filetypes=[("JSON", "*.json")]
+            )
+            if not path:
+                return
+            try:
+                PROFILER.export(path)
+                messagebox.showinfo("Экспорт", f"Профиль сохранен в {path}")
+            except Exception as e:
+                messagebox.showerror("Ошибка экспорта", str(e))
+
+        button_frame = ttk.Frame(window)
+        button_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
+        ttk.Button(button_frame, text="Обновить", command=refresh).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Сбросить", command=reset).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Экспорт в JSON", command=export).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Закрыть",
+                   command=window.destroy).pack(side=tk.RIGHT, padx=5)
+        refresh()
+
     def __del__(self):
-        #закрытие подключения к бд при завершении работы
-        if hasattr(self, 'conn'):
-            self.cursor.close()
-            self.conn.close()
+        #закрытие подключений к бд при завершении работы
+        if hasattr(self, 'change_listener'):
+            self.change_listener.stop()
+        if hasattr(self, 'view_refresher'):
+            self.view_refresher.stop()
+        if hasattr(self, 'db'):
+            self.db.close()
 
 
 def main():
+    listener = setup_logging()
     root = tk.Tk()
     app = DogBreedingApp(root)
     root.mainloop()
+    listener.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1 @@
+#замеры производительности: generate - синтетические данные, run - сценарии
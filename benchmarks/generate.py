@@ -0,0 +1,196 @@
+import argparse
+import csv
+import io
+import random
+import time
+from datetime import date, timedelta
+
+from db import ConnectionPool, add_connection_arguments, config_from_args
+from diagnostics import setup_logging
+import medal_stats
+import migrate
+
+
+#синтетические данные питомника для схемы BD1.sql (запуск: python -m benchmarks.generate)
+
+#таблицы в порядке очистки (зависимые раньше)
+GENERATED_TABLES = ['Medicine_history', 'Exhibitions', 'Parents', 'Dogs', 'Medicine_book', 'Breeds']
+
+OWNERS = ['Иванов', 'Петрова', 'Сидоров', 'Кузнецова', 'Смирнов', 'Попова', 'Васильев',
+          'Новикова', 'Морозов', 'Волкова', 'Соколов', 'Лебедева', 'Козлов', 'Егорова']
+STREETS = ['Ленина', 'Мира', 'Садовая', 'Лесная', 'Советская', 'Школьная', 'Полевая']
+COLORS = ['черный', 'белый', 'рыжий', 'палевый', 'тигровый', 'подпалый', 'серый']
+EXHIBITION_NAMES = ['Кубок России', 'Евразия', 'Золотой ошейник', 'Осенний вернисаж',
+                    'Весенний салют', 'Чемпион чемпионов']
+MEDALS = ['Gold', 'Silver', 'Bronze']
+FIRST_EXHIBITION = date(2010, 1, 1)
+
+
+#запись строк в таблицу через COPY
+def copy_rows(cursor, table, columns, rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                       buffer)
+
+
+#генератор данных заданного объема
+class KennelGenerator:
+    def __init__(self, breeds=20, dogs=10000, depth=5, exhibitions_per_dog=3,
+                 illnesses=200, history_per_dog=1, seed=1):
+        #id_breed - numeric(3), id_illness - numeric(4)
+        self.breeds = min(breeds, 999)
+        self.dogs = dogs
+        self.depth = depth
+        self.exhibitions_per_dog = exhibitions_per_dog
+        self.illnesses = min(illnesses, 9999)
+        self.history_per_dog = history_per_dog
+        self.random = random.Random(seed)
+
+    def breed_rows(self):
+        for id_breed in range(1, self.breeds + 1):
+            height_min = self.random.randint(15, 60)
+            height_max = self.random.randint(height_min + 5, 119)
+            yield (id_breed, f"Порода {id_breed}", f"Характеристика породы {id_breed}",
+                   height_max, height_min, self.random.choice(COLORS))
+
+    def illness_rows(self):
+        for id_illness in range(1, self.illnesses + 1):
+            yield id_illness, f"Болезнь {id_illness}", f"Лечение {id_illness}"
+
+    #собаки по поколениям: родители берутся из предыдущего поколения той же породы
+    def dog_rows(self, with_psyche_test):
+        generations = self.depth + 1
+        per_generation = max(self.dogs // generations, 1)
+        #id породы -> пол -> id собак предыдущего поколения
+        previous = {}
+        dogs, parents = [], []
+        id_dog = 0
+        for generation in range(generations):
+            count = per_generation if generation < generations - 1 else self.dogs - id_dog
+            current = {}
+            for _ in range(count):
+                id_dog += 1
+                id_breed = self.random.randint(1, self.breeds)
+                gender = self.random.choice('MF')
+                #живы в основном последние поколения
+                alive = generation >= generations - 2 or self.random.random() < 0.1
+                row = [id_dog, id_breed,
+                       f"{self.random.choice(OWNERS)} {self.random.randint(1, 9999)}",
+                       f"ул. {self.random.choice(STREETS)}, {self.random.randint(1, 200)}",
+                       alive, round(self.random.uniform(0.5, 10), 1), gender]
+                if with_psyche_test:
+                    row.append(self.random.randint(1, 5))
+                dogs.append(row)
+                current.setdefault(id_breed, {'M': [], 'F': []})[gender].append(id_dog)
+
+                candidates = previous.get(id_breed)
+                if candidates and candidates['M'] and candidates['F']:
+                    parents.append((id_dog, self.random.choice(candidates['F']),
+                                    self.random.choice(candidates['M'])))
+            previous = current
+        return dogs, parents
+
+    def exhibition_rows(self):
+        for id_dog in range(1, self.dogs + 1):
+            for _ in range(self.random.randint(0, 2 * self.exhibitions_per_dog)):
+                day = FIRST_EXHIBITION + timedelta(days=self.random.randint(0, 5000))
+                medal = self.random.choice(MEDALS) if self.random.random() < 0.3 else None
+                yield (id_dog, day.isoformat(), self.random.randint(1, 12), medal,
+                       self.random.choice(EXHIBITION_NAMES))
+
+    def history_rows(self):
+        for id_dog in range(1, self.dogs + 1):
+            for _ in range(self.random.randint(0, 2 * self.history_per_dog)):
+                start = FIRST_EXHIBITION + timedelta(days=self.random.randint(0, 5000))
+                end = start + timedelta(days=self.random.randint(3, 60))
+                yield (id_dog, self.random.randint(1, self.illnesses),
+                       start.isoformat(), end.isoformat())
+
+    #очистка таблиц и загрузка данных в одной транзакции; возвращает число строк по таблицам
+    def load(self, db):
+        migrate.migrate(db)
+        with db.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {', '.join(GENERATED_TABLES)} RESTART IDENTITY CASCADE")
+
+            cursor.execute("""
+                SELECT 1 FROM information_schema.columns
+                WHERE table_schema = current_schema() AND table_name = 'dogs'
+                    AND column_name = 'psyche_test'
+            """)
+            with_psyche_test = cursor.fetchone() is not None
+
+            breeds = list(self.breed_rows())
+            copy_rows(cursor, 'Breeds',
+                      ['id_breed', 'name', 'characteristic', 'height_max', 'height_min', 'color'],
+                      breeds)
+            illnesses = list(self.illness_rows())
+            copy_rows(cursor, 'Medicine_book', ['id_illness', 'name', 'method'], illnesses)
+
+            dogs, parents = self.dog_rows(with_psyche_test)
+            dog_columns = ['id_dog', 'id_breed', 'owner', 'adress', 'alive', 'assesment', 'gender']
+            if with_psyche_test:
+                dog_columns.append('psyche_test')
+            copy_rows(cursor, 'Dogs', dog_columns, dogs)
+            cursor.execute("SELECT setval(pg_get_serial_sequence('dogs', 'id_dog'), %s)",
+                           (max(len(dogs), 1),))
+            copy_rows(cursor, 'Parents', ['id_dog', 'id_mother', 'id_father'], parents)
+
+            exhibitions = list(self.exhibition_rows())
+            copy_rows(cursor, 'Exhibitions',
+                      ['id_dog', 'date_exhibition', 'mark', 'medal', 'name'], exhibitions)
+            history = list(self.history_rows())
+            copy_rows(cursor, 'Medicine_history',
+                      ['id_dog', 'id_illness', 'start_date', 'end_date'], history)
+
+            counts = {'Breeds': len(breeds), 'Medicine_book': len(illnesses), 'Dogs': len(dogs),
+                      'Parents': len(parents), 'Exhibitions': len(exhibitions),
+                      'Medicine_history': len(history)}
+
+            #статистика планировщика для новых данных
+            cursor.execute(f"ANALYZE {', '.join(GENERATED_TABLES)}")
+
+        medal_stats.refresh(db)
+        return counts
+
+
+def add_volume_arguments(parser):
+    parser.add_argument('--breeds', type=int, default=20)
+    parser.add_argument('--dogs', type=int, default=10000)
+    parser.add_argument('--depth', type=int, default=5, help="поколений в родословной")
+    parser.add_argument('--exhibitions-per-dog', type=int, default=3)
+    parser.add_argument('--illnesses', type=int, default=200)
+    parser.add_argument('--history-per-dog', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=1)
+
+
+def generator_from_args(args):
+    return KennelGenerator(args.breeds, args.dogs, args.depth, args.exhibitions_per_dog,
+                           args.illnesses, args.history_per_dog, args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Заполнение базы синтетическими данными (все таблицы очищаются!)"
+    )
+    add_volume_arguments(parser)
+    add_connection_arguments(parser)
+    args = parser.parse_args()
+    listener = setup_logging()
+
+    db = ConnectionPool(config_from_args(args))
+    db.open()
+    try:
+        started = time.perf_counter()
+        counts = generator_from_args(args).load(db)
+        for table, count in counts.items():
+            print(f"{table}: {count}")
+        print(f"Готово за {time.perf_counter() - started:.1f} с")
+    finally:
+        db.close()
+        listener.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime
+
+from db import ConnectionPool, add_connection_arguments, config_from_args
+from diagnostics import setup_logging, PROFILER
+from schema import SchemaCatalog, TABLES
+from reports import ReportService
+from exhibition_stats import dog_stats, ranking
+import search
+from benchmarks.generate import add_volume_arguments, generator_from_args
+
+
+#замеры типовых операций приложения (запуск: python -m benchmarks.run -o results.json)
+
+PAGE_SIZE = 200
+INSERT_ROWS = 1000
+
+
+#первая страница таблицы, как при выборе таблицы в приложении: COUNT(*) и keyset-страница
+def load_first_page(db, schema, table, conditions=(), params=()):
+    key = schema.primary_key(table) or 'ctid'
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    db.execute(f"SELECT COUNT(*) FROM {table}{where}", list(params) or None, prepared=True)
+    _, rows = db.execute(f"SELECT {key} AS page_key, * FROM {table}{where} "
+                         f"ORDER BY {key} ASC LIMIT %s", list(params) + [PAGE_SIZE],
+                         prepared=True)
+    return len(rows)
+
+
+#вставка собак по одной записи с коммитом, как из формы; вставленные строки затем удаляются
+#(одно удаление входит в замер, но мало по сравнению с count транзакций)
+def insert_dogs(db, count=INSERT_ROWS):
+    _, rows = db.execute("SELECT id_breed FROM Breeds LIMIT 1")
+    id_breed = rows[0][0]
+    inserted = []
+    try:
+        for i in range(count):
+            with db.connection() as conn, conn.cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO Dogs (id_breed, owner, adress, alive, assesment, gender) "
+                    "VALUES (%s, %s, %s, TRUE, %s, %s) RETURNING id_dog",
+                    (id_breed, f"Тест {i}", "ул. Тестовая", 5, 'MF'[i % 2])
+                )
+                inserted.append(cursor.fetchone()[0])
+    finally:
+        if inserted:
+            db.execute("DELETE FROM Dogs WHERE id_dog = ANY(%s)", (inserted,), fetch=False)
+    return count
+
+
+#сценарии: имя -> функция(db, schema, reports), возвращающая число строк
+def build_scenarios():
+    def table_load(db, schema, reports):
+        return sum(load_first_page(db, schema, table) for table in TABLES)
+
+    def filtered_load(db, schema, reports):
+        return load_first_page(db, schema, 'Dogs',
+                               ["id_breed = %s", "gender = %s", "alive = %s"], [1, 'F', True])
+
+    def table_search(db, schema, reports):
+        condition, params = search.table_condition(search.searchable_columns(schema, 'Dogs'),
+                                                   'ова')
+        return load_first_page(db, schema, 'Dogs', [condition], params)
+
+    def global_search(db, schema, reports):
+        return len(search.search_all(db, 'Порода 1'))
+
+    def report(report_type, cached=False):
+        def run(db, schema, reports):
+            #родословная и результат строятся заново: иначе замер включал бы только первый прогон
+            if not cached:
+                reports.reset_pedigree()
+                reports.clear_results()
+            _, rows = reports.run(report_type)
+            return len(rows)
+        return run
+
+    #расчет рейтинга по уже загруженному набору выставок (без COPY)
+    def exhibition_ranking_compute(db, schema, reports):
+        frame = reports.analytics.get_frame()
+        return len(ranking(dog_stats(frame)))
+
+    def insert_throughput(db, schema, reports):
+        return insert_dogs(db)
+
+    return {
+        'table_load': table_load,
+        'filtered_load': filtered_load,
+        'table_search': table_search,
+        'global_search': global_search,
+        'report_breeding': report('breeding'),
+        'report_elite': report('elite'),
+        'report_service': report('service'),
+        #повторный запуск отчета с неизменившимися таблицами (кэш результатов)
+        'report_elite_cached': report('elite', cached=True),
+        'report_health_episodes': report('health_episodes'),
+        'report_breed_incidence': report('breed_incidence'),
+        #загрузка выставок в DataFrame и расчет рейтинга
+        'report_exhibition_ranking': report('exhibition_ranking'),
+        'exhibition_ranking_compute': exhibition_ranking_compute,
+        'insert_throughput': insert_throughput,
+    }
+
+
+#прогон сценария repeat раз: время каждого прогона и число строк
+def measure(func, repeat, *args):
+    timings = []
+    rows = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = func(*args)
+        timings.append(time.perf_counter() - started)
+    return {
+        'rows': rows,
+        'runs': [round(t, 6) for t in timings],
+        'min': round(min(timings), 6),
+        'median': round(statistics.median(timings), 6),
+        'max': round(max(timings), 6),
+    }
+
+
+#коммит, на котором выполнялся замер (если запуск из git-репозитория)
+def current_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    scenarios = build_scenarios()
+    parser = argparse.ArgumentParser(description="Замеры производительности на локальной базе")
+    parser.add_argument('-o', '--output', required=True, help="файл результатов (JSON)")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', nargs='+', choices=sorted(scenarios),
+                        help="выполнить только указанные сценарии")
+    parser.add_argument('--generate', action='store_true',
+                        help="перед замерами заполнить базу синтетическими данными")
+    add_volume_arguments(parser)
+    add_connection_arguments(parser)
+    args = parser.parse_args()
+    listener = setup_logging()
+
+    db = ConnectionPool(config_from_args(args))
+    db.open()
+    try:
+        if args.generate:
+            generator_from_args(args).load(db)
+        schema = SchemaCatalog(db)
+        schema.load()
+        reports = ReportService(db)
+
+        _, rows = db.execute("SHOW server_version")
+        result = {
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'revision': current_revision(),
+            'python': platform.python_version(),
+            'server_version': rows[0][0],
+            'repeat': args.repeat,
+            'table_rows': {table: db.execute(f"SELECT COUNT(*) FROM {table}")[1][0][0]
+                           for table in TABLES},
+            'scenarios': {},
+        }
+
+        for name, func in scenarios.items():
+            if args.only and name not in args.only:
+                continue
+            try:
+                measured = measure(func, args.repeat, db, schema, reports)
+                print(f"{name}: median {measured['median']:.4f} с, строк {measured['rows']}")
+            except Exception as e:
+                measured = {'error': str(e)}
+                print(f"{name}: ошибка {e}")
+            result['scenarios'][name] = measured
+
+        #разбивка времени по формам запросов за все сценарии
+        result['query_profile'] = PROFILER.summary()
+        result['prepared_statements'] = db.statements.stats()
+
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"Результаты записаны в {args.output}")
+    finally:
+        db.close()
+        listener.stop()
+
+
+if __name__ == '__main__':
+    main()
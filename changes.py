@@ -0,0 +1,131 @@
+import json
+import logging
+import select
+import threading
+import time
+
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+
+#изменения таблиц с других рабочих мест: уведомления триггеров (migrations/0006_change_notify.sql)
+
+log = logging.getLogger(__name__)
+
+CHANNEL = 'kennel_changes'
+#уведомления, пришедшие в течение этого времени после первого, применяются одной пачкой
+BATCH_INTERVAL = 0.3
+RECONNECT_DELAY = 5
+
+CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+
+#накопленные изменения одной таблицы
+class TableChanges:
+    def __init__(self):
+        self.inserted = set()
+        self.updated = set()
+        self.deleted = set()
+        #изменено слишком много строк или таблица очищена - перечитать целиком
+        self.reload = False
+
+    def add(self, op, keys):
+        if keys is None:
+            self.reload = True
+            return
+        keys = set(keys)
+        if op == 'INSERT':
+            self.inserted |= keys
+        elif op == 'UPDATE':
+            self.updated |= keys - self.inserted
+        elif op == 'DELETE':
+            #строки, вставленные и удаленные в пределах пачки, не показываются вовсе
+            self.deleted |= keys - self.inserted
+            self.inserted -= keys
+            self.updated -= keys
+
+    #ключи строк, которые нужно перечитать
+    def changed_keys(self):
+        return self.inserted | self.updated
+
+
+#разбор уведомления: (таблица, операция, ключи или None)
+def parse_notification(payload):
+    data = json.loads(payload)
+    return data['table'], data['op'], data.get('keys')
+
+
+#слушатель уведомлений на отдельном соединении (LISTEN не работает через пул:
+#соединение должно быть в autocommit и постоянно ждать сообщений от сервера)
+class ChangeListener:
+    def __init__(self, connect_params, on_changes, ignored_pids=None,
+                 batch_interval=BATCH_INTERVAL):
+        self.connect_params = connect_params
+        #on_changes({таблица: TableChanges}) вызывается в потоке слушателя;
+        #None - связь восстановлена после обрыва и часть уведомлений потеряна
+        self.on_changes = on_changes
+        #процессы сервера, изменения которых уже учтены (соединения своего пула)
+        self.ignored_pids = ignored_pids or (lambda: ())
+        self.batch_interval = batch_interval
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='change-listener', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+
+    def run(self):
+        connected_before = False
+        while not self.stopping.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**self.connect_params)
+                conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+                log.info("Подписка на изменения таблиц (%s)", CHANNEL)
+                if connected_before:
+                    self.on_changes(None)
+                connected_before = True
+                self.listen(conn)
+            except CONNECTION_ERRORS as e:
+                log.warning("Слушатель изменений: нет связи с БД (%s), повтор через %d с",
+                            e, RECONNECT_DELAY)
+                self.stopping.wait(RECONNECT_DELAY)
+            except Exception as e:
+                log.exception("Ошибка слушателя изменений: %s", e)
+                self.stopping.wait(RECONNECT_DELAY)
+            finally:
+                if conn is not None and not conn.closed:
+                    conn.close()
+
+    #ожидание уведомлений и отправка накопленных пачками
+    def listen(self, conn):
+        pending = {}
+        deadline = None
+        while not self.stopping.is_set():
+            timeout = 1.0 if deadline is None else max(deadline - time.monotonic(), 0)
+            if select.select([conn], [], [], timeout) != ([], [], []):
+                conn.poll()
+                ignored = set(self.ignored_pids())
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    if notify.pid in ignored:
+                        continue
+                    try:
+                        table, op, keys = parse_notification(notify.payload)
+                    except (ValueError, KeyError) as e:
+                        log.warning("Некорректное уведомление %r: %s", notify.payload, e)
+                        continue
+                    pending.setdefault(table, TableChanges()).add(op, keys)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.batch_interval
+
+            if deadline is not None and time.monotonic() >= deadline:
+                log.debug("Изменения с других рабочих мест: %s", sorted(pending))
+                self.on_changes(pending)
+                pending = {}
+                deadline = None
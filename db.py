@@ -0,0 +1,305 @@
+import hashlib
+import logging
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import errors, pool
+from psycopg2.extensions import QueryCanceledError
+
+from diagnostics import ProfilingCursor
+
+log = logging.getLogger(__name__)
+
+
+#подключение к бд по умолчанию (приложение и утилиты командной строки),
+#параметры пула берутся из POOL_OPTIONS
+DEFAULT_DB_CONFIG = {
+    'host': 'localhost',
+    'database': 'Pantuhina',
+    'user': 'postgres',
+    'password': 'postgres',
+    'port': '5432'
+}
+
+#параметры подключения для утилит командной строки (по умолчанию - DEFAULT_DB_CONFIG)
+def add_connection_arguments(parser):
+    for key in ('host', 'port', 'database', 'user', 'password'):
+        parser.add_argument(f'--{key}', default=DEFAULT_DB_CONFIG[key])
+
+
+#db_config из аргументов командной строки, один рабочий поток - одно соединение
+def config_from_args(args):
+    config = {key: getattr(args, key) for key in ('host', 'port', 'database', 'user', 'password')}
+    config['maxconn'] = 1
+    return config
+
+
+#параметры пула в db_config (в psycopg2.connect не передаются)
+POOL_OPTIONS = {
+    'minconn': 1,
+    'maxconn': 4,
+    'reconnect_attempts': 5,
+    'reconnect_delay': 0.5,
+    'health_check_interval': 30,
+}
+
+#ошибки, после которых соединение считается потерянным
+CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+#подготовленный оператор пропал на сервере или устарел после изменения таблицы
+#("cached plan must not change result type"): соединение закрывается, запрос повторяется;
+#остальные ошибки этих классов (is_stale_statement) пробрасываются как есть
+STALE_STATEMENT_ERRORS = (errors.InvalidSqlStatementName, errors.FeatureNotSupported)
+STALE_PLAN_MESSAGE = "cached plan must not change result type"
+
+#подготовленных операторов на одно соединение, самые давние освобождаются
+MAX_PREPARED_PER_CONNECTION = 100
+
+PLACEHOLDER_PATTERN = re.compile(r'%%|%s')
+
+
+#оператор не найден или его план устарел; прочие "feature not supported" - настоящие ошибки
+def is_stale_statement(error):
+    if isinstance(error, errors.InvalidSqlStatementName):
+        return True
+    return STALE_PLAN_MESSAGE in (error.pgerror or str(error))
+
+
+#запрос с %s в текст для PREPARE ($1, $2, ...) и число параметров
+def to_positional(query):
+    count = 0
+
+    def replace(match):
+        nonlocal count
+        if match.group() == '%%':
+            return '%'
+        count += 1
+        return f'${count}'
+
+    return PLACEHOLDER_PATTERN.sub(replace, query), count
+
+
+#реестр подготовленных операторов: каждый известный запрос проходит разбор и планирование
+#один раз на соединение (PREPARE), дальше выполняется через EXECUTE с параметрами
+class StatementRegistry:
+    def __init__(self, max_per_connection=MAX_PREPARED_PER_CONNECTION):
+        self.max_per_connection = max_per_connection
+        self.lock = threading.Lock()
+        #соединение -> подготовленные на нем имена (по давности использования);
+        #новое соединение после переподключения начинает с пустого списка
+        self.prepared = weakref.WeakKeyDictionary()
+        self.hits = 0
+        self.misses = 0
+
+    #имя оператора по тексту запроса
+    @staticmethod
+    def statement_name(query):
+        return 'stmt_' + hashlib.sha1(query.encode('utf-8')).hexdigest()[:16]
+
+    def execute(self, cursor, query, params=None):
+        conn = cursor.connection
+        name = self.statement_name(query)
+        with self.lock:
+            prepared = self.prepared.setdefault(conn, OrderedDict())
+            hit = name in prepared
+            if hit:
+                prepared.move_to_end(name)
+                self.hits += 1
+            else:
+                self.misses += 1
+                overflow = len(prepared) + 1 - self.max_per_connection
+                expired = list(prepared)[:overflow] if overflow > 0 else []
+
+        try:
+            if not hit:
+                for old in expired:
+                    cursor.execute(f"DEALLOCATE {old}")
+                    prepared.pop(old, None)
+                text, count = to_positional(query)
+                cursor.execute(f"PREPARE {name} AS {text}")
+                prepared[name] = True
+            else:
+                count = to_positional(query)[1]
+
+            #текст исходного запроса - для профиля (diagnostics.ProfilingCursor)
+            if hasattr(cursor, 'prepared_query'):
+                cursor.prepared_query = query
+            if count:
+                cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * count)})", params)
+            else:
+                cursor.execute(f"EXECUTE {name}")
+        except STALE_STATEMENT_ERRORS as e:
+            if not is_stale_statement(e):
+                raise
+            #транзакция прервана, операторы соединения в неизвестном состоянии
+            with self.lock:
+                self.prepared.pop(conn, None)
+            conn.close()
+            raise
+
+    #статистика для окна диагностики
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'connections': len(self.prepared),
+                'statements': sum(len(names) for names in self.prepared.values()),
+            }
+
+
+#пул соединений с проверкой состояния и переподключением
+class ConnectionPool:
+    def __init__(self, db_config):
+        self.options = {key: db_config.get(key, default)
+                        for key, default in POOL_OPTIONS.items()}
+        self.connect_params = {key: value for key, value in db_config.items()
+                               if key not in POOL_OPTIONS}
+        #замер каждого запроса для профиля (diagnostics.PROFILER)
+        self.connect_params.setdefault('cursor_factory', ProfilingCursor)
+        self.pool = None
+        self.lock = threading.Lock()
+        #соединения, занятые потоками: id потока -> соединение
+        self.active = {}
+        #время последней проверки соединения
+        self.last_used = {}
+        #процессы сервера, обслуживающие соединения пула
+        self.pids = set()
+        self.statements = StatementRegistry()
+
+    #создание пула
+    def open(self):
+        with self.lock:
+            if self.pool is not None and not self.pool.closed:
+                return
+            self.pool = pool.ThreadedConnectionPool(
+                self.options['minconn'], self.options['maxconn'],
+                **self.connect_params
+            )
+
+    #закрытие всех соединений
+    def close(self):
+        with self.lock:
+            if self.pool is not None and not self.pool.closed:
+                self.pool.closeall()
+            self.pool = None
+            self.last_used.clear()
+            self.pids.clear()
+
+    #пересоздание пула после потери связи с сервером
+    def reset(self):
+        self.close()
+        self.open()
+
+    #соединение живо: закрытые отбрасываем, давно не использованные проверяем запросом
+    def is_healthy(self, conn):
+        if conn.closed:
+            return False
+        now = time.monotonic()
+        last_used = self.last_used.get(id(conn), 0)
+        if now - last_used > self.options['health_check_interval']:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                conn.rollback()
+            except CONNECTION_ERRORS:
+                return False
+        self.last_used[id(conn)] = now
+        return True
+
+    #получить соединение, при сбое переподключиться с нарастающей задержкой
+    def acquire(self):
+        delay = self.options['reconnect_delay']
+        last_error = None
+        for attempt in range(self.options['reconnect_attempts']):
+            try:
+                if self.pool is None or self.pool.closed:
+                    self.open()
+                conn = self.pool.getconn()
+                if self.is_healthy(conn):
+                    with self.lock:
+                        self.pids.add(conn.get_backend_pid())
+                    return conn
+                #соединение потеряно - вероятно, перезапуск сервера, пересоздаем пул
+                log.warning("Соединение с БД потеряно, переподключение...")
+                self.last_used.pop(id(conn), None)
+                self.pool.putconn(conn, close=True)
+                self.reset()
+                continue
+            except CONNECTION_ERRORS as e:
+                last_error = e
+                log.warning("Ошибка подключения (попытка %d): %s", attempt + 1, e)
+            time.sleep(delay)
+            delay *= 2
+        raise last_error or psycopg2.OperationalError("Не удалось получить соединение с БД")
+
+    #вернуть соединение в пул, сломанные закрываются
+    def release(self, conn):
+        broken = conn.closed != 0
+        if broken:
+            self.last_used.pop(id(conn), None)
+        try:
+            self.pool.putconn(conn, close=broken)
+        except (pool.PoolError, AttributeError):
+            #пул уже пересоздан - соединение ему не принадлежит
+            if not conn.closed:
+                conn.close()
+
+    #соединение на одну операцию: commit при успехе, rollback при ошибке
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        thread_id = threading.get_ident()
+        self.active[thread_id] = conn
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self.active.pop(thread_id, None)
+            self.release(conn)
+
+    #выполнение запроса с повтором при потере соединения;
+    #prepared - повторяющийся запрос (текст без подстановок), выполняется через StatementRegistry
+    def execute(self, query, params=None, fetch=True, prepared=False):
+        for attempt in range(2):
+            try:
+                with self.connection() as conn:
+                    with conn.cursor() as cursor:
+                        if prepared:
+                            self.statements.execute(cursor, query, params)
+                        else:
+                            cursor.execute(query, params)
+                        columns = [desc[0] for desc in cursor.description or []]
+                        rows = cursor.fetchall() if fetch else None
+                return columns, rows
+            except STALE_STATEMENT_ERRORS as e:
+                #EXECUTE не выполнился - повтор безопасен и для изменяющих запросов
+                if attempt or not prepared or not is_stale_statement(e):
+                    raise
+                log.warning("Подготовленный оператор устарел, повтор на новом соединении")
+            except CONNECTION_ERRORS as e:
+                #изменяющий запрос и отмененный пользователем запрос не повторяем
+                if attempt or not fetch or isinstance(e, QueryCanceledError):
+                    raise
+                log.warning("Повтор запроса после переподключения")
+
+    #pid процессов сервера своих соединений (их изменения не нужно получать уведомлениями)
+    def backend_pids(self):
+        with self.lock:
+            return set(self.pids)
+
+    #отмена запросов, выполняющихся на сервере в указанных потоках
+    def cancel_threads(self, thread_ids):
+        for thread_id in thread_ids:
+            conn = self.active.get(thread_id)
+            if conn is not None and not conn.closed:
+                conn.cancel()
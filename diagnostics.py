@@ -0,0 +1,258 @@
+import bisect
+import json
+import logging
+import logging.handlers
+import queue
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from psycopg2.extensions import cursor as base_cursor
+
+
+#журнал приложения и профиль SQL-запросов
+
+log = logging.getLogger(__name__)
+
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(threadName)s %(name)s: %(message)s"
+
+#запросы дольше порога (мс) попадают в список медленных с планом EXPLAIN ANALYZE
+SLOW_QUERY_MS = 500
+#план одной формы запроса снимается не чаще раза за столько секунд
+EXPLAIN_INTERVAL = 60
+
+#верхние границы корзин гистограммы задержек, мс (последняя - все остальное)
+HISTOGRAM_BOUNDS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+RECENT_LIMIT = 500
+SLOW_LIMIT = 50
+
+#параметры в форме запроса не видны, но константы в тексте (LIMIT 200, IN (1, 2)) схлопываются
+NUMBER_PATTERN = re.compile(r"\b\d+(\.\d+)?\b")
+STRING_PATTERN = re.compile(r"'(?:[^']|'')*'")
+SPACE_PATTERN = re.compile(r"\s+")
+#изменение данных внутри WITH (INSERT ... RETURNING в CTE и т.п.)
+MODIFYING_PATTERN = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE)\b", re.IGNORECASE)
+
+
+#запись журнала через очередь: вызывающий поток не ждет вывода
+def setup_logging(level=logging.INFO, filename=None):
+    handlers = [logging.StreamHandler()]
+    if filename:
+        handlers.append(logging.FileHandler(filename, encoding='utf-8'))
+    formatter = logging.Formatter(LOG_FORMAT)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.handlers = [logging.handlers.QueueHandler(log_queue)]
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+#форма запроса: без лишних пробелов, числа и строки заменены на ?
+def query_shape(query):
+    if not isinstance(query, str):
+        query = str(query)
+    shape = STRING_PATTERN.sub('?', query)
+    shape = NUMBER_PATTERN.sub('?', shape)
+    return SPACE_PATTERN.sub(' ', shape).strip()
+
+
+#только чтение: такие запросы можно повторить под EXPLAIN ANALYZE
+def is_read_only(query):
+    head = query.lstrip().split(None, 1)[0].upper() if query.strip() else ''
+    if head == 'WITH' and MODIFYING_PATTERN.search(STRING_PATTERN.sub('?', query)):
+        return False
+    return head in ('SELECT', 'WITH') and 'FOR UPDATE' not in query.upper()
+
+
+#статистика одной формы запроса
+class ShapeStats:
+    def __init__(self, shape):
+        self.shape = shape
+        self.features = set()
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+        self.last_explain = 0.0
+
+    def add(self, elapsed_ms, rows, feature, failed):
+        self.count += 1
+        self.errors += failed
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.rows += max(rows, 0)
+        self.buckets[bisect.bisect_left(HISTOGRAM_BOUNDS, elapsed_ms)] += 1
+        if feature:
+            self.features.add(feature)
+
+    #перцентиль по гистограмме (верхняя граница корзины)
+    def percentile(self, fraction):
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(HISTOGRAM_BOUNDS, self.buckets):
+            seen += count
+            if seen >= target:
+                return min(float(bound), round(self.max_ms, 3))
+        return self.max_ms
+
+    def as_dict(self):
+        return {
+            'shape': self.shape,
+            'features': sorted(self.features),
+            'count': self.count,
+            'errors': self.errors,
+            'total_ms': round(self.total_ms, 3),
+            'avg_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'max_ms': round(self.max_ms, 3),
+            'rows': self.rows,
+            'histogram': dict(zip([str(b) for b in HISTOGRAM_BOUNDS] + ['inf'], self.buckets)),
+        }
+
+
+#профиль запросов всего процесса
+class QueryProfiler:
+    def __init__(self, slow_query_ms=SLOW_QUERY_MS):
+        self.slow_query_ms = slow_query_ms
+        self.enabled = True
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.shapes = {}
+            self.recent = deque(maxlen=RECENT_LIMIT)
+            self.slow = deque(maxlen=SLOW_LIMIT)
+
+    #функция приложения, от имени которой идут запросы текущего потока
+    @contextmanager
+    def feature(self, name):
+        previous = getattr(self.local, 'feature', None)
+        self.local.feature = name
+        try:
+            yield
+        finally:
+            self.local.feature = previous
+
+    def current_feature(self):
+        return getattr(self.local, 'feature', None)
+
+    #учет выполненного запроса: (медленный ли, нужен ли план)
+    def record(self, query, elapsed_ms, rows, failed=False):
+        shape = query_shape(query)
+        feature = self.current_feature()
+        with self.lock:
+            stats = self.shapes.get(shape)
+            if stats is None:
+                stats = self.shapes[shape] = ShapeStats(shape)
+            stats.add(elapsed_ms, rows, feature, failed)
+            self.recent.append((datetime.now(), round(elapsed_ms, 3), rows, feature, shape))
+
+            slow = not failed and elapsed_ms >= self.slow_query_ms
+            now = time.monotonic()
+            need_plan = slow and is_read_only(query) and now - stats.last_explain >= EXPLAIN_INTERVAL
+            if need_plan:
+                stats.last_explain = now
+        if slow:
+            log.warning("Медленный запрос %.0f мс (%s): %s", elapsed_ms, feature, shape[:200])
+        return slow, need_plan
+
+    def add_slow(self, query, elapsed_ms, feature, plan):
+        with self.lock:
+            self.slow.append({
+                'at': datetime.now().isoformat(timespec='seconds'),
+                'elapsed_ms': round(elapsed_ms, 3),
+                'feature': feature,
+                'query': query,
+                'plan': plan,
+            })
+
+    #статистика форм по убыванию суммарного времени
+    def summary(self):
+        with self.lock:
+            stats = [s.as_dict() for s in self.shapes.values()]
+        return sorted(stats, key=lambda s: s['total_ms'], reverse=True)
+
+    def slow_queries(self):
+        with self.lock:
+            return list(self.slow)
+
+    def export(self, path):
+        with self.lock:
+            recent = [{'at': at.isoformat(timespec='milliseconds'), 'elapsed_ms': ms,
+                       'rows': rows, 'feature': feature, 'shape': shape}
+                      for at, ms, rows, feature, shape in self.recent]
+        data = {
+            'exported_at': datetime.now().isoformat(timespec='seconds'),
+            'slow_query_ms': self.slow_query_ms,
+            'shapes': self.summary(),
+            'slow': self.slow_queries(),
+            'recent': recent,
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+
+
+PROFILER = QueryProfiler()
+
+
+#курсор с замером каждого execute (подключается через cursor_factory)
+class ProfilingCursor(base_cursor):
+    #исходный запрос следующего EXECUTE подготовленного оператора (db.StatementRegistry)
+    prepared_query = None
+
+    def execute(self, query, vars=None):
+        shown_query, self.prepared_query = self.prepared_query, None
+        if not PROFILER.enabled:
+            return super().execute(query, vars)
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = super().execute(query, vars)
+            failed = False
+            return result
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            text = query if isinstance(query, str) else query.as_string(self.connection)
+            #в профиле подготовленный оператор виден по исходному запросу, а не по EXECUTE
+            slow, need_plan = PROFILER.record(shown_query or text, elapsed_ms, self.rowcount,
+                                              failed)
+            if slow:
+                plan = self.explain(text, vars) if need_plan else None
+                PROFILER.add_slow(self.mogrify(text, vars).decode('utf-8', 'replace'),
+                                  elapsed_ms, PROFILER.current_feature(), plan)
+
+    #план с фактическим временем; выполняется отдельным курсором без замера,
+    #внутри точки сохранения: ошибка не прерывает транзакцию вызывающего кода,
+    #а все, что сделал повторный запуск, всегда откатывается
+    def explain(self, query, vars):
+        in_transaction = not self.connection.autocommit
+        with base_cursor(self.connection) as cursor:
+            cursor.execute("SAVEPOINT profiler_explain" if in_transaction else "BEGIN")
+            try:
+                cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + query, vars)
+                return "\n".join(row[0] for row in cursor.fetchall())
+            except Exception as e:
+                log.warning("Не удалось получить план запроса: %s", e)
+                return None
+            finally:
+                if in_transaction:
+                    cursor.execute("ROLLBACK TO SAVEPOINT profiler_explain")
+                    cursor.execute("RELEASE SAVEPOINT profiler_explain")
+                else:
+                    cursor.execute("ROLLBACK")
@@ -0,0 +1,284 @@
+import io
+import logging
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+
+#аналитика выставок: Exhibitions загружается один раз через COPY в DataFrame,
+#статистика считается над колонками целиком (без циклов по собакам и строкам)
+#
+#форма собаки - скользящее среднее оценок за последние ROLLING_WINDOW выставок,
+#тренд - наклон прямой оценок по времени (баллов в год), перцентиль - место формы среди
+#собак той же породы; кэш сбрасывается при изменении Exhibitions, Dogs или Breeds
+
+log = logging.getLogger(__name__)
+
+#выставки с собакой и породой; COPY в CSV быстрее построчной выборки на миллионах строк
+LOAD_QUERY = """
+    COPY (
+        SELECT e.id_dog, d.id_breed, b.name AS breed, d.owner,
+               e.date_exhibition, e.mark, e.medal
+        FROM Exhibitions e
+        JOIN Dogs d ON d.id_dog = e.id_dog
+        JOIN Breeds b ON b.id_breed = d.id_breed
+    ) TO STDOUT WITH (FORMAT csv, HEADER)
+"""
+
+LOAD_DTYPES = {
+    'id_dog': 'int64',
+    'id_breed': 'int64',
+    'breed': 'category',
+    'owner': 'object',
+    'mark': 'float64',
+    'medal': 'category',
+}
+
+#таблицы, от которых зависит загруженный набор
+ANALYTICS_TABLES = ('exhibitions', 'dogs', 'breeds')
+
+ROLLING_WINDOW = 3
+#в рейтинг попадают собаки минимум с таким числом выставок
+MIN_EXHIBITIONS = 3
+#рейтинг: перцентиль формы в породе и доля медалей (в процентах)
+RANKING_WEIGHTS = (0.6, 0.4)
+BREED_QUANTILES = (0.25, 0.5, 0.75, 0.9)
+
+SEASONS = np.array(['зима', 'весна', 'лето', 'осень'])
+#месяц (1-12, нулевой элемент не используется) -> индекс сезона;
+#декабрь относится к зиме следующего года
+SEASON_OF_MONTH = np.array([0, 0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 0])
+
+
+#загрузка выставок; строки упорядочены по собаке и дате (нужно для скользящих окон)
+def load_frame(db):
+    buffer = io.StringIO()
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.copy_expert(LOAD_QUERY, buffer)
+    buffer.seek(0)
+    frame = pd.read_csv(buffer, dtype=LOAD_DTYPES, parse_dates=['date_exhibition'])
+    frame.sort_values(['id_dog', 'date_exhibition'], kind='mergesort', inplace=True,
+                      ignore_index=True)
+    return frame
+
+
+#индекс первой строки группы для каждой строки (группы идут подряд)
+def group_starts(groups):
+    groups = np.asarray(groups)
+    if len(groups) == 0:
+        return np.zeros(0, dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    return np.repeat(starts, np.diff(np.r_[starts, len(groups)]))
+
+
+#скользящее среднее по window последним строкам своей группы; пропуски (NaN) не учитываются,
+#окно без оценок дает NaN; считается по накопленным суммам за один проход
+def rolling_mean(values, starts, window=ROLLING_WINDOW):
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    sums = np.r_[0.0, np.cumsum(np.where(valid, values, 0.0))]
+    counts = np.r_[0, np.cumsum(valid)]
+    end = np.arange(1, len(values) + 1)
+    start = np.maximum(end - window, starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (sums[end] - sums[start]) / (counts[end] - counts[start])
+
+
+#наклон прямой y(x) по группам методом наименьших квадратов; NaN, если x в группе не меняется
+def group_slope(groups, x, y):
+    data = pd.DataFrame({'group': groups, 'x': x, 'y': y}).dropna()
+    data['xy'] = data['x'] * data['y']
+    data['xx'] = data['x'] * data['x']
+    means = data.groupby('group', sort=False)[['x', 'y', 'xy', 'xx']].mean()
+    variance = means['xx'] - means['x'] ** 2
+    covariance = means['xy'] - means['x'] * means['y']
+    #погрешность округления при одной дате дает крошечную, но не нулевую дисперсию
+    return (covariance / variance).where(variance > 1e-9)
+
+
+#статистика по собакам: выставки, средняя оценка, форма, тренд, медали
+def dog_stats(frame, window=ROLLING_WINDOW):
+    ids = frame['id_dog'].to_numpy()
+    form = rolling_mean(frame['mark'].to_numpy(), group_starts(ids), window)
+    years = (frame['date_exhibition'] - frame['date_exhibition'].min()).dt.days / 365.25
+    medals = frame['medal'].notna()
+
+    data = frame.assign(form=form, has_medal=medals, gold=frame['medal'] == 'Gold')
+    stats = data.groupby('id_dog', sort=False).agg(
+        id_breed=('id_breed', 'first'),
+        breed=('breed', 'first'),
+        owner=('owner', 'first'),
+        exhibitions=('mark', 'size'),
+        mean_mark=('mark', 'mean'),
+        #строки отсортированы по дате: последнее окно - текущая форма
+        form=('form', 'last'),
+        medals=('has_medal', 'sum'),
+        gold=('gold', 'sum'),
+        last_date=('date_exhibition', 'max'),
+    )
+    stats['medal_rate'] = stats['medals'] / stats['exhibitions']
+    stats['trend'] = group_slope(ids, years, frame['mark'])
+    return stats
+
+
+#место собаки по форме среди собак породы (0-100)
+def breed_percentiles(stats):
+    return stats.groupby('id_breed', sort=False)['form'].rank(pct=True) * 100
+
+
+#рейтинг собак: места всего и в породе
+def ranking(stats, min_exhibitions=MIN_EXHIBITIONS):
+    ranked = stats[stats['exhibitions'] >= min_exhibitions].copy()
+    ranked['percentile'] = breed_percentiles(ranked)
+    form_weight, medal_weight = RANKING_WEIGHTS
+    ranked['score'] = (form_weight * ranked['percentile'].fillna(0)
+                       + medal_weight * ranked['medal_rate'] * 100)
+    ranked['place'] = ranked['score'].rank(ascending=False, method='min').astype('int64')
+    ranked['breed_place'] = ranked.groupby('id_breed', sort=False)['score'].rank(
+        ascending=False, method='min').astype('int64')
+    return ranked.sort_values('place', kind='mergesort')
+
+
+#оценки и медали пород по сезонам и изменение к тому же сезону прошлого года
+def season_stats(frame):
+    data = frame.dropna(subset=['date_exhibition'])
+    month = data['date_exhibition'].dt.month.to_numpy()
+    data = data.assign(
+        season=SEASON_OF_MONTH[month],
+        year=data['date_exhibition'].dt.year.to_numpy() + (month == 12),
+        has_medal=data['medal'].notna(),
+    )
+    stats = data.groupby(['id_breed', 'year', 'season'], sort=True).agg(
+        breed=('breed', 'first'),
+        exhibitions=('id_dog', 'size'),
+        dogs=('id_dog', 'nunique'),
+        mean_mark=('mark', 'mean'),
+        medal_rate=('has_medal', 'mean'),
+    )
+    #тот же сезон годом раньше: поиск по индексу, а не сдвиг (годы могут идти с пропусками)
+    breeds, years, seasons = (stats.index.get_level_values(level) for level in range(3))
+    previous = pd.MultiIndex.from_arrays([breeds, years - 1, seasons])
+    stats['change'] = stats['mean_mark'].to_numpy() - \
+        stats['mean_mark'].reindex(previous).to_numpy()
+    return stats.reset_index()
+
+
+#распределение оценок по породам: квантили, доля медалей
+def breed_marks(frame, quantiles=BREED_QUANTILES):
+    grouped = frame.groupby('id_breed', sort=False)
+    stats = grouped.agg(
+        breed=('breed', 'first'),
+        exhibitions=('id_dog', 'size'),
+        dogs=('id_dog', 'nunique'),
+        mean_mark=('mark', 'mean'),
+    )
+    stats['medal_rate'] = frame['medal'].notna().groupby(frame['id_breed']).mean()
+    marks = grouped['mark'].quantile(list(quantiles)).unstack()
+    for quantile in quantiles:
+        stats[f'p{int(quantile * 100)}'] = marks[quantile]
+    return stats
+
+
+#DataFrame -> (колонки, строки) в виде результата запроса: Python-значения, NULL как None
+def to_rows(frame, columns, decimals=2):
+    frame = frame[list(columns)].copy()
+    for name in frame.columns:
+        if pd.api.types.is_datetime64_any_dtype(frame[name]):
+            frame[name] = frame[name].dt.date
+        elif pd.api.types.is_float_dtype(frame[name]):
+            frame[name] = frame[name].round(decimals)
+    frame = frame.astype(object).where(frame.notna(), None)
+    return list(columns.values()), list(frame.itertuples(index=False, name=None))
+
+
+#отчеты: тип -> (расчет по загруженному набору, {колонка DataFrame: колонка отчета})
+def ranking_report(frame):
+    ranked = ranking(dog_stats(frame)).reset_index()
+    ranked['medal_rate'] *= 100
+    return to_rows(ranked, {
+        'place': 'место', 'breed_place': 'место_в_породе', 'id_dog': 'id_собаки',
+        'owner': 'владелец', 'breed': 'порода', 'exhibitions': 'выставок',
+        'mean_mark': 'средняя_оценка', 'form': 'форма', 'trend': 'тренд_в_год',
+        'medal_rate': 'доля_медалей', 'gold': 'золото', 'percentile': 'перцентиль_в_породе',
+        'score': 'рейтинг', 'last_date': 'последняя_выставка',
+    })
+
+
+def seasons_report(frame):
+    stats = season_stats(frame)
+    stats['season'] = SEASONS[stats['season'].to_numpy()]
+    stats['medal_rate'] *= 100
+    return to_rows(stats, {
+        'breed': 'порода', 'year': 'год', 'season': 'сезон', 'exhibitions': 'выставок',
+        'dogs': 'собак', 'mean_mark': 'средняя_оценка', 'medal_rate': 'доля_медалей',
+        'change': 'изменение_за_год',
+    })
+
+
+def breed_marks_report(frame):
+    stats = breed_marks(frame)
+    stats['medal_rate'] *= 100
+    columns = {'breed': 'порода', 'exhibitions': 'выставок', 'dogs': 'собак',
+               'mean_mark': 'средняя_оценка', 'medal_rate': 'доля_медалей'}
+    columns.update({f'p{int(q * 100)}': f'перцентиль_{int(q * 100)}' for q in BREED_QUANTILES})
+    return to_rows(stats, columns)
+
+
+ANALYTICS_REPORTS = {
+    'exhibition_ranking': ranking_report,
+    'exhibition_seasons': seasons_report,
+    'breed_marks': breed_marks_report,
+}
+
+
+#загруженный набор и посчитанные по нему отчеты; общий для всех отчетов по выставкам
+class ExhibitionAnalytics:
+    def __init__(self, db):
+        self.db = db
+        self.frame = None
+        #версии таблиц, при которых загружен набор (None - проверка по версиям не нужна)
+        self.versions = None
+        #тип отчета -> (колонки, строки)
+        self.results = {}
+        self.lock = threading.Lock()
+
+    def clear(self):
+        with self.lock:
+            self.frame = None
+            self.versions = None
+            self.results.clear()
+
+    def table_changed(self, table):
+        if table.lower() in ANALYTICS_TABLES:
+            self.clear()
+
+    #набор выставок: загружается заново, если изменились версии таблиц
+    def get_frame(self, versions=None):
+        with self.lock:
+            if self.frame is not None and (versions is None or versions == self.versions):
+                return self.frame
+            started = time.perf_counter()
+            self.frame = load_frame(self.db)
+            self.versions = versions
+            self.results.clear()
+            log.info("Загружено выставок: %d за %.2f с", len(self.frame),
+                     time.perf_counter() - started)
+            return self.frame
+
+    #отчет: (колонки, строки); строки - новая копия, их можно сортировать
+    def report(self, report_type, versions=None):
+        frame = self.get_frame(versions)
+        with self.lock:
+            cached = self.results.get(report_type)
+        if cached is None or self.frame is not frame:
+            started = time.perf_counter()
+            cached = ANALYTICS_REPORTS[report_type](frame)
+            log.debug("Отчет %s: %d строк за %.2f с", report_type, len(cached[1]),
+                      time.perf_counter() - started)
+            with self.lock:
+                if self.frame is frame:
+                    self.results[report_type] = cached
+        columns, rows = cached
+        return list(columns), list(rows)
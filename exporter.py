@@ -0,0 +1,69 @@
+import csv
+import gzip
+
+from psycopg2.extensions import encodings
+
+
+#потоковая выгрузка в CSV (или сжатый .csv.gz) без накопления результата в памяти
+
+#метка порядка байтов, чтобы Excel открывал файл в UTF-8
+UTF8_BOM = b'\xef\xbb\xbf'
+
+#как часто сообщать о ходе выгрузки
+PROGRESS_BYTES = 256 * 1024
+
+EXPORT_FILETYPES = [("CSV", "*.csv"), ("CSV, сжатый gzip", "*.csv.gz")]
+
+
+#файл для записи: .gz сжимается на лету
+def open_output(path):
+    if path.lower().endswith('.gz'):
+        return gzip.open(path, 'wb')
+    return open(path, 'wb')
+
+
+#обертка файла: считает строки и байты, периодически вызывает on_progress(строки, байты)
+class ProgressWriter:
+    def __init__(self, file, on_progress=None):
+        self.file = file
+        self.on_progress = on_progress
+        self.rows = 0
+        self.bytes = 0
+        self.reported = 0
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.file.write(data)
+        #строки с переводом строки внутри значения считаются с запасом
+        self.rows += data.count(b'\n')
+        self.bytes += len(data)
+        if self.on_progress and self.bytes - self.reported >= PROGRESS_BYTES:
+            self.reported = self.bytes
+            self.on_progress(self.rows, self.bytes)
+        return len(data)
+
+
+#выгрузка запроса через COPY (...) TO STDOUT; возвращает число строк
+def export_query(db, query, params, path, on_progress=None):
+    with open_output(path) as file, db.connection() as conn, conn.cursor() as cursor:
+        #COPY не принимает параметры - подставляем их на клиенте
+        statement = cursor.mogrify(query, params).decode(encodings[conn.encoding])
+        file.write(UTF8_BOM)
+        writer = ProgressWriter(file, on_progress)
+        cursor.copy_expert(f"COPY ({statement}) TO STDOUT WITH (FORMAT csv, HEADER)", writer)
+    #первая строка - заголовок
+    return max(writer.rows - 1, 0)
+
+
+#выгрузка уже полученных строк (отчеты, досчитанные в приложении)
+def export_rows(columns, rows, path, on_progress=None):
+    with open_output(path) as file:
+        file.write(UTF8_BOM)
+        csv_writer = csv.writer(ProgressWriter(file, on_progress))
+        csv_writer.writerow(columns)
+        count = 0
+        for row in rows:
+            csv_writer.writerow(row)
+            count += 1
+    return count
@@ -0,0 +1,186 @@
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from lookups import escape_like
+
+
+#фильтры по колонкам: выражение из поля фильтра -> условие WHERE по типу колонки
+#
+#числа и даты:  5 | 3..7 | 3.. | ..7 | >=4 | <10 | != 2 | 1,2,3
+#текст:         слово (подстрока) | нач* (префикс) | =точно | a|b|c (список)
+#любой тип:     пусто (IS NULL)
+#
+#выражение разбирается в условия (parse_filter), которые переводятся в SQL
+#или проверяются над загруженным результатом (resultset.py)
+#
+#условия не приводят колонку к тексту и сравнивают ее со значением того же типа,
+#поэтому их обслуживают B-tree индексы (равенство, диапазоны, ANY) и триграммные (LIKE/ILIKE)
+
+NUMBER_PARSERS = {
+    'smallint': int,
+    'integer': int,
+    'bigint': int,
+    'numeric': Decimal,
+    'real': float,
+    'double precision': float,
+}
+#char(n) - коды вроде пола: только точное совпадение или список
+CODE_TYPES = ('character',)
+DATE_FORMATS = ('%Y-%m-%d', '%d.%m.%Y')
+TRUE_VALUES = ('true', 't', 'да', '1')
+FALSE_VALUES = ('false', 'f', 'нет', '0')
+NULL_VALUES = ('пусто', 'null')
+
+#операторы сравнения в порядке проверки (двухсимвольные раньше)
+COMPARISONS = ['>=', '<=', '!=', '<>', '>', '<', '=']
+
+FILTER_HINTS = {
+    'number': "5, 3..7, >=4, 1,2,3",
+    'date': "2020-01-01..2020-12-31, >=01.05.2021",
+    'text': "подстрока, нач*, =точно, a|b",
+    'code': "M, M|F",
+}
+
+
+class FilterError(ValueError):
+    pass
+
+
+#вид колонки для выбора синтаксиса фильтра
+def column_kind(column):
+    if column.data_type in NUMBER_PARSERS:
+        return 'number'
+    if column.data_type == 'date':
+        return 'date'
+    if column.data_type == 'boolean':
+        return 'boolean'
+    if column.data_type in CODE_TYPES:
+        return 'code'
+    return 'text'
+
+
+def filter_hint(column):
+    return FILTER_HINTS.get(column_kind(column), "")
+
+
+#значение из текста в тип колонки
+def parse_value(column, text):
+    text = text.strip()
+    kind = column_kind(column)
+    try:
+        if kind == 'number':
+            parser = NUMBER_PARSERS[column.data_type]
+            if parser is int and not text.lstrip('+-').isdigit():
+                raise ValueError(text)
+            return parser(text)
+        if kind == 'date':
+            for date_format in DATE_FORMATS:
+                try:
+                    return datetime.strptime(text, date_format).date()
+                except ValueError:
+                    pass
+            raise ValueError(text)
+        if kind == 'boolean':
+            if text.lower() in TRUE_VALUES:
+                return True
+            if text.lower() in FALSE_VALUES:
+                return False
+            raise ValueError(text)
+    except (ValueError, InvalidOperation):
+        raise FilterError(f"{column.name}: некорректное значение «{text}»")
+    return text
+
+
+#разбор выражения в список условий (операция, значение), объединяемых через AND;
+#операции: null, =, <>, <, <=, >, >=, any (список), prefix (LIKE), contains (ILIKE)
+def parse_filter(column, expression):
+    expression = expression.strip()
+    kind = column_kind(column)
+
+    if expression.lower() in NULL_VALUES:
+        return [('null', None)]
+    if kind == 'boolean':
+        return [('=', parse_value(column, expression))]
+    if kind in ('text', 'code'):
+        return parse_text(column, expression)
+    return parse_ordered(column, expression)
+
+
+#текст: подстрока, префикс, точное совпадение или список
+def parse_text(column, expression):
+    name = column.name
+    if '|' in expression:
+        values = [value.strip() for value in expression.split('|') if value.strip()]
+        if not values:
+            raise FilterError(f"{name}: пустой список")
+        return [('any', values)]
+    if expression.startswith('='):
+        return [('=', expression[1:].strip())]
+    if column_kind(column) == 'code':
+        return [('=', expression)]
+    if expression.endswith('*'):
+        return [('prefix', expression[:-1])]
+    return [('contains', expression)]
+
+
+#числа и даты: диапазон, сравнение, список или равенство
+def parse_ordered(column, expression):
+    name = column.name
+    if '..' in expression:
+        low, high = expression.split('..', 1)
+        conditions = []
+        if low.strip():
+            conditions.append(('>=', parse_value(column, low)))
+        if high.strip():
+            conditions.append(('<=', parse_value(column, high)))
+        if not conditions:
+            raise FilterError(f"{name}: пустой диапазон")
+        return conditions
+
+    for operator in COMPARISONS:
+        if expression.startswith(operator):
+            sql_operator = '<>' if operator == '!=' else operator
+            return [(sql_operator, parse_value(column, expression[len(operator):]))]
+
+    if ',' in expression:
+        values = [parse_value(column, value) for value in expression.split(',') if value.strip()]
+        if not values:
+            raise FilterError(f"{name}: пустой список")
+        return [('any', values)]
+    return [('=', parse_value(column, expression))]
+
+
+#условие для одной колонки: (SQL, параметры)
+def compile_filter(column, expression):
+    name = column.name
+    conditions, params = [], []
+    for operation, value in parse_filter(column, expression):
+        if operation == 'null':
+            conditions.append(f"{name} IS NULL")
+            continue
+        if operation == 'any':
+            conditions.append(f"{name} = ANY(%s)")
+        elif operation == 'prefix':
+            conditions.append(f"{name} LIKE %s")
+            value = escape_like(value) + '%'
+        elif operation == 'contains':
+            conditions.append(f"{name} ILIKE %s")
+            value = '%' + escape_like(value) + '%'
+        else:
+            conditions.append(f"{name} {operation} %s")
+        params.append(value)
+    return " AND ".join(conditions), params
+
+
+#условия для словаря фильтров {колонка: выражение}; пустые выражения
+#и колонки, которых нет в таблице (фильтр от другой таблицы), пропускаются
+def compile_filters(schema, table, filters):
+    conditions, params = [], []
+    for name, expression in filters.items():
+        column = schema.column(table, name)
+        if column is None or not expression or not expression.strip():
+            continue
+        condition, condition_params = compile_filter(column, expression)
+        conditions.append(condition)
+        params.extend(condition_params)
+    return conditions, params
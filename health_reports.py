@@ -0,0 +1,142 @@
+#медицинская аналитика по Medicine_history: запросы отчетов (описания - в reports.REPORTS)
+#
+#эпизод болезни - период illness_period(start_date, end_date) (миграция 0008):
+#пересечения ищутся по GiST-индексу (id_dog, период), повторы и динамика - оконными функциями;
+#эпизоды без даты начала не учитываются
+
+#частота болезней по породам: доля заболевших собак породы и место болезни в породе
+ILLNESS_BY_BREED_QUERY = """
+    WITH breed_dogs AS (
+        SELECT id_breed, COUNT(*) AS dogs
+        FROM Dogs
+        GROUP BY id_breed
+    )
+    SELECT
+        b.name as порода,
+        mb.name as болезнь,
+        COUNT(*) as эпизодов,
+        COUNT(DISTINCT h.id_dog) as собак,
+        bd.dogs as собак_породы,
+        ROUND(100.0 * COUNT(DISTINCT h.id_dog) / bd.dogs, 2) as доля_процентов,
+        RANK() OVER (PARTITION BY b.id_breed ORDER BY COUNT(*) DESC) as место_в_породе
+    FROM Medicine_history h
+    JOIN Dogs d ON d.id_dog = h.id_dog
+    JOIN Breeds b ON b.id_breed = d.id_breed
+    JOIN Medicine_book mb ON mb.id_illness = h.id_illness
+    JOIN breed_dogs bd ON bd.id_breed = d.id_breed
+    WHERE h.start_date IS NOT NULL
+    GROUP BY b.id_breed, b.name, mb.id_illness, mb.name, bd.dogs
+"""
+
+#длительность лечения по болезням (дни включительно, незавершенные эпизоды отдельно)
+TREATMENT_DURATION_QUERY = """
+    WITH episodes AS (
+        SELECT id_illness, illness_period(start_date, end_date) AS period
+        FROM Medicine_history
+        WHERE start_date IS NOT NULL
+    )
+    SELECT
+        mb.name as болезнь,
+        mb.method as лечение,
+        COUNT(*) as эпизодов,
+        COUNT(*) FILTER (WHERE upper_inf(e.period)) as не_завершено,
+        ROUND(AVG(upper(e.period) - lower(e.period))
+              FILTER (WHERE NOT upper_inf(e.period)), 1) as средняя_длительность,
+        percentile_cont(0.5) WITHIN GROUP (ORDER BY upper(e.period) - lower(e.period))
+            FILTER (WHERE NOT upper_inf(e.period)) as медиана_длительности,
+        MAX(upper(e.period) - lower(e.period)) as максимум_дней
+    FROM episodes e
+    JOIN Medicine_book mb ON mb.id_illness = e.id_illness
+    GROUP BY mb.id_illness, mb.name, mb.method
+"""
+
+#пересекающиеся эпизоды разных записей одной собаки (дней - длина пересечения)
+#и повторы той же болезни (дней - перерыв после окончания предыдущего эпизода)
+EPISODES_QUERY = """
+    WITH overlaps AS (
+        SELECT
+            a.id_dog,
+            'пересечение' AS kind,
+            a.id_illness AS first_illness,
+            b.id_illness AS second_illness,
+            a.start_date AS first_start,
+            b.start_date AS second_start,
+            upper(illness_period(a.start_date, a.end_date) * illness_period(b.start_date, b.end_date))
+              - lower(illness_period(a.start_date, a.end_date)
+                      * illness_period(b.start_date, b.end_date)) AS days
+        FROM Medicine_history a
+        JOIN Medicine_history b ON b.id_dog = a.id_dog
+            AND b.id_record > a.id_record
+            AND b.start_date IS NOT NULL
+            AND illness_period(b.start_date, b.end_date) && illness_period(a.start_date, a.end_date)
+        WHERE a.start_date IS NOT NULL
+    ),
+    ordered AS (
+        SELECT
+            id_dog, id_illness, start_date,
+            LAG(start_date) OVER w AS prev_start,
+            LAG(end_date) OVER w AS prev_end
+        FROM Medicine_history
+        WHERE start_date IS NOT NULL
+        WINDOW w AS (PARTITION BY id_dog, id_illness ORDER BY start_date)
+    ),
+    recurrences AS (
+        SELECT id_dog, 'повтор' AS kind, id_illness, id_illness, prev_start, start_date,
+            start_date - prev_end
+        FROM ordered
+        WHERE prev_start IS NOT NULL
+    )
+    SELECT
+        x.id_dog as id_собаки,
+        d.owner as владелец,
+        b.name as порода,
+        x.kind as вид,
+        i1.name as болезнь,
+        i2.name as вторая_болезнь,
+        x.first_start as начало_первого,
+        x.second_start as начало_второго,
+        x.days as дней
+    FROM (SELECT * FROM overlaps UNION ALL SELECT * FROM recurrences) x
+    JOIN Dogs d ON d.id_dog = x.id_dog
+    JOIN Breeds b ON b.id_breed = d.id_breed
+    JOIN Medicine_book i1 ON i1.id_illness = x.first_illness
+    JOIN Medicine_book i2 ON i2.id_illness = x.second_illness
+"""
+
+#заболеваемость пород по годам: на 1000 собак породы, изменение к прошлому году,
+#нарастающий итог и скользящее среднее за три года
+INCIDENCE_QUERY = """
+    WITH yearly AS (
+        SELECT
+            d.id_breed,
+            EXTRACT(YEAR FROM h.start_date)::int AS year,
+            COUNT(*) AS episodes,
+            COUNT(DISTINCT h.id_dog) AS ill_dogs
+        FROM Medicine_history h
+        JOIN Dogs d ON d.id_dog = h.id_dog
+        WHERE h.start_date IS NOT NULL
+        GROUP BY d.id_breed, EXTRACT(YEAR FROM h.start_date)
+    ),
+    breed_dogs AS (
+        SELECT id_breed, COUNT(*) AS dogs
+        FROM Dogs
+        GROUP BY id_breed
+    )
+    SELECT
+        b.name as порода,
+        y.year as год,
+        y.episodes as эпизодов,
+        y.ill_dogs as болевших,
+        ROUND(1000.0 * y.ill_dogs / bd.dogs, 1) as на_1000_собак,
+        y.episodes - LAG(y.episodes) OVER w as изменение_за_год,
+        SUM(y.episodes) OVER (w ROWS UNBOUNDED PRECEDING) as нарастающий_итог,
+        ROUND(AVG(y.episodes) OVER (w ROWS BETWEEN 2 PRECEDING AND CURRENT ROW), 1)
+            as среднее_за_3_года
+    FROM yearly y
+    JOIN Breeds b ON b.id_breed = y.id_breed
+    JOIN breed_dogs bd ON bd.id_breed = y.id_breed
+    WINDOW w AS (PARTITION BY y.id_breed ORDER BY y.year)
+"""
+
+#таблицы, от которых зависят отчеты (для кэша результатов)
+HEALTH_TABLES = ('medicine_history', 'medicine_book', 'dogs', 'breeds')
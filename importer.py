@@ -0,0 +1,222 @@
+import io
+import os
+
+import pandas as pd
+
+
+#массовая загрузка записей из CSV/Excel: проверка строк в pandas и COPY в одной транзакции
+
+#таблицы, доступные для импорта
+IMPORT_TABLES = ['Breeds', 'Dogs', 'Exhibitions', 'Medicine_history']
+
+#колонки с названиями вместо id: колонка файла -> (колонка таблицы, запрос название -> id)
+NAME_COLUMNS = {
+    'breed': ('id_breed', "SELECT lower(name), id_breed FROM Breeds"),
+    'illness': ('id_illness', "SELECT lower(name), id_illness FROM Medicine_book"),
+}
+
+#сообщения для ссылок на несуществующие записи (колонка внешнего ключа -> текст)
+REFERENCE_MESSAGES = {
+    'id_dog': "собака не найдена",
+    'id_breed': "порода не найдена",
+    'id_illness': "болезнь не найдена",
+}
+
+#CHECK-ограничения из BD1.sql: (колонки, сообщение, проверка по DataFrame)
+CHECK_RULES = {
+    'Breeds': [
+        (['height_max'], "height_max должен быть меньше 120",
+         lambda df: df['height_max'] < 120),
+        (['height_min'], "height_min должен быть больше 10",
+         lambda df: df['height_min'] > 10),
+        (['height_min', 'height_max'], "height_min должен быть меньше height_max",
+         lambda df: df['height_min'] < df['height_max']),
+    ],
+    'Dogs': [
+        (['assesment'], "оценка должна быть в диапазоне (0, 10]",
+         lambda df: (df['assesment'] > 0) & (df['assesment'] <= 10)),
+        (['gender'], "пол должен быть M или F",
+         lambda df: df['gender'].isin(['M', 'F'])),
+    ],
+    'Exhibitions': [
+        (['medal'], "медаль должна быть Gold, Silver или Bronze",
+         lambda df: df['medal'].isin(['Gold', 'Silver', 'Bronze'])),
+        (['mark'], "оценка должна быть от 1 до 12",
+         lambda df: (df['mark'] > 0) & (df['mark'] <= 12)),
+    ],
+    'Medicine_history': [],
+}
+
+ERROR_COLUMN = 'ошибка'
+ROW_COLUMN = 'строка_файла'
+
+NUMERIC_TYPES = ('integer', 'smallint', 'bigint', 'numeric', 'real', 'double precision')
+TRUE_VALUES = {'true', 't', '1', 'yes', 'y', 'да'}
+FALSE_VALUES = {'false', 'f', '0', 'no', 'n', 'нет'}
+DAY_FIRST_FORMAT = '%d.%m.%Y'
+
+
+#чтение CSV или Excel в DataFrame (все значения как строки, пустые - NaN)
+def read_file(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.xlsx', '.xls'):
+        df = pd.read_excel(path, dtype=str)
+    else:
+        df = pd.read_csv(path, dtype=str, sep=None, engine='python', encoding='utf-8-sig')
+    df.columns = [str(col).strip().lower() for col in df.columns]
+    for col in df.columns:
+        df[col] = df[col].str.strip()
+        df[col] = df[col].where(df[col] != '')
+    #номер строки в файле с учетом заголовка
+    df[ROW_COLUMN] = range(2, len(df) + 2)
+    return df
+
+
+#проверка и загрузка файла в таблицу
+class BulkImporter:
+    def __init__(self, db, schema):
+        self.db = db
+        self.schema = schema
+
+    #колонки таблицы, которые можно загружать (без ключа из последовательности)
+    def target_columns(self, table):
+        primary_key = self.schema.primary_key(table)
+        return [col for col in self.schema.columns(table)
+                if not (col.name == primary_key and self.schema.is_generated(table, col.name))]
+
+    #значение подставит сервер; nextval у не ключевой колонки (id_dog serial в Exhibitions)
+    #не считается: пропуск привязал бы строки к собакам 1, 2, 3...
+    def has_default(self, table, col):
+        return col.default is not None and not self.schema.is_generated(table, col.name)
+
+    #словарь название (в нижнем регистре) -> id
+    def name_map(self, query):
+        _, rows = self.db.execute(query)
+        return dict(rows)
+
+    #проверка строк; возвращает (принятые строки, отклоненные строки с причиной)
+    def validate(self, table, source):
+        df = source.copy()
+        errors = pd.Series('', index=df.index)
+
+        def reject(mask, message):
+            mask = mask.fillna(False).astype(bool)
+            errors[mask] = errors[mask] + message + '; '
+
+        #названия пород и болезней -> id
+        for name_column, (id_column, query) in NAME_COLUMNS.items():
+            if name_column not in df.columns:
+                continue
+            ids = df[name_column].str.lower().map(self.name_map(query))
+            given = df[name_column].notna()
+            reject(given & ids.isna(), f"неизвестное значение {name_column}")
+            if id_column in df.columns:
+                df[id_column] = df[id_column].fillna(ids)
+            else:
+                df[id_column] = ids
+
+        columns = self.target_columns(table)
+        missing = [col.name for col in columns
+                   if col.name not in df.columns and not col.is_nullable
+                   and not self.has_default(table, col)]
+        if missing:
+            raise ValueError(f"В файле нет обязательных колонок: {', '.join(missing)}")
+
+        #приведение типов, пустые значения в NOT NULL колонках
+        for col in columns:
+            if col.name not in df.columns:
+                continue
+            raw = df[col.name]
+            if col.data_type in NUMERIC_TYPES:
+                values = pd.to_numeric(raw, errors='coerce')
+                if col.data_type in ('integer', 'smallint', 'bigint'):
+                    reject(values.notna() & (values % 1 != 0), f"{col.name}: ожидается целое")
+            elif col.data_type == 'date':
+                #ISO (так пишет экспорт), затем дд.мм.гггг только для нераспознанных значений
+                values = pd.to_datetime(raw, errors='coerce', format='ISO8601')
+                values = values.fillna(pd.to_datetime(raw.where(values.isna()), errors='coerce',
+                                                      format=DAY_FIRST_FORMAT))
+            elif col.data_type == 'boolean':
+                lowered = raw.str.lower()
+                values = lowered.map(lambda v: True if v in TRUE_VALUES else
+                                     (False if v in FALSE_VALUES else None))
+            else:
+                values = raw
+            reject(raw.notna() & values.isna(), f"{col.name}: неверное значение")
+            if not col.is_nullable and not self.has_default(table, col):
+                reject(raw.isna(), f"{col.name}: пустое значение")
+            df[col.name] = values
+
+        #CHECK-ограничения проверяются для заполненных значений
+        for rule_columns, message, check in CHECK_RULES.get(table, []):
+            if all(col in df.columns for col in rule_columns):
+                filled = df[rule_columns].notna().all(axis=1)
+                reject(filled & ~check(df).fillna(False).astype(bool), message)
+
+        #ссылки на собак, породы и болезни, которых нет в базе: отклоняется строка,
+        #а не вся загрузка на ошибке внешнего ключа в COPY
+        for fk in self.schema.foreign_keys(table).values():
+            if fk.column not in df.columns:
+                continue
+            values = pd.to_numeric(df[fk.column], errors='coerce')
+            ids = [int(value) for value in values.dropna().unique() if value % 1 == 0]
+            _, rows = self.db.execute(
+                f"SELECT {fk.ref_column} FROM {fk.ref_table} WHERE {fk.ref_column} = ANY(%s)",
+                (ids,)
+            )
+            known = {float(row[0]) for row in rows}
+            message = REFERENCE_MESSAGES.get(fk.column, f"{fk.column}: нет в {fk.ref_table}")
+            reject(values.notna() & ~values.isin(known), message)
+
+        rejected_mask = errors != ''
+        rejected = source.loc[rejected_mask].copy()
+        rejected[ERROR_COLUMN] = errors[rejected_mask].str.rstrip('; ')
+
+        accepted = df.loc[~rejected_mask, [col.name for col in columns if col.name in df.columns]]
+        return accepted, rejected
+
+    #загрузка принятых строк через COPY FROM STDIN (одна транзакция)
+    #пустые значения колонок со значением по умолчанию (alive DEFAULT TRUE) COPY записал бы
+    #как NULL, поэтому строки группируются по заполненности таких колонок и каждая группа
+    #загружается без своих пустых колонок - сервер подставит значение по умолчанию
+    def copy_rows(self, table, accepted):
+        out = accepted.copy()
+        for col in out.columns:
+            if pd.api.types.is_datetime64_any_dtype(out[col]):
+                out[col] = out[col].dt.strftime('%Y-%m-%d')
+            elif pd.api.types.is_float_dtype(out[col]) and \
+                    self.schema.column(table, col).data_type in ('integer', 'smallint', 'bigint'):
+                out[col] = out[col].astype('Int64')
+
+        defaulted = [col for col in out.columns
+                     if self.has_default(table, self.schema.column(table, col))]
+        if defaulted:
+            groups = out.groupby([out[col].notna() for col in defaulted], sort=False)
+        else:
+            groups = [((), out)]
+
+        with self.db.connection() as conn, conn.cursor() as cursor:
+            for filled, rows in groups:
+                filled = filled if isinstance(filled, tuple) else (filled,)
+                skipped = {col for col, present in zip(defaulted, filled) if not present}
+                rows = rows[[col for col in out.columns if col not in skipped]]
+                if rows.columns.empty:
+                    for _ in range(len(rows)):
+                        cursor.execute(f"INSERT INTO {table} DEFAULT VALUES")
+                    continue
+                buffer = io.StringIO()
+                rows.to_csv(buffer, index=False, header=False)
+                buffer.seek(0)
+                column_list = ", ".join(rows.columns)
+                cursor.copy_expert(f"COPY {table} ({column_list}) FROM STDIN WITH (FORMAT csv)",
+                                   buffer)
+
+    #импорт файла: (число загруженных строк, отклоненные строки)
+    def import_file(self, table, path):
+        if table not in IMPORT_TABLES:
+            raise ValueError(f"Импорт в таблицу {table} не поддерживается")
+        df = read_file(path)
+        accepted, rejected = self.validate(table, df)
+        if not accepted.empty:
+            self.copy_rows(table, accepted)
+        return len(accepted), rejected
@@ -0,0 +1,176 @@
+#родство и коэффициент инбридинга по таблице Parents
+
+#сколько поколений предков учитывается
+DEFAULT_MAX_DEPTH = 10
+
+
+#индекс родословной: родители каждой собаки и кэш множеств предков
+#
+#множество предков хранится битовой маской (int) внутри семьи - связной части родословной:
+#собаки семьи пронумерованы по поколениям, поэтому маска не длиннее размера семьи,
+#а объединение множеств - одна операция над числами
+class PedigreeIndex:
+    def __init__(self, rows, max_depth=DEFAULT_MAX_DEPTH):
+        self.max_depth = max_depth
+        #id собаки -> (мать, отец)
+        self.parents = {}
+        for id_dog, id_mother, id_father in rows:
+            self.parents[id_dog] = (id_mother, id_father)
+        #(id собаки, глубина) -> маска предков
+        self.ancestor_cache = {}
+        self.generations = {}
+        #id собаки -> (семья, номер бита); семья -> собаки по номерам бит
+        self.positions = None
+        self.families = {}
+
+    @classmethod
+    def load(cls, db, max_depth=DEFAULT_MAX_DEPTH):
+        _, rows = db.execute("SELECT id_dog, id_mother, id_father FROM Parents")
+        return cls(rows, max_depth)
+
+    #нумерация собак: семьи (объединение по связям родитель-потомок), внутри семьи -
+    #по поколениям, так что у предка номер меньше, чем у потомка
+    def build_positions(self):
+        roots = {}
+
+        def find(dog):
+            root = dog
+            while roots.setdefault(root, root) != root:
+                root = roots[root]
+            while roots[dog] != root:
+                roots[dog], dog = root, roots[dog]
+            return root
+
+        for dog, pair in self.parents.items():
+            for parent in pair:
+                if parent is not None:
+                    roots[find(parent)] = find(dog)
+            find(dog)
+
+        self.positions = {}
+        for dog in sorted(roots, key=lambda d: (find(d), self.generation(d), d)):
+            members = self.families.setdefault(find(dog), [])
+            self.positions[dog] = (find(dog), len(members))
+            members.append(dog)
+
+    #бит собаки в маске ее семьи (0 для собак вне родословной)
+    def bit(self, dog):
+        if self.positions is None:
+            self.build_positions()
+        position = self.positions.get(dog)
+        return 1 << position[1] if position else 0
+
+    #маска предков не дальше depth поколений (по умолчанию max_depth): собирается из масок
+    #родителей на поколение короче, а не обходом родословной
+    def ancestor_mask(self, dog, depth=None):
+        key = (dog, self.max_depth if depth is None else depth)
+        cached = self.ancestor_cache.get(key)
+        if cached is not None:
+            return cached
+
+        #глубина убывает на каждом шаге, поэтому обход конечен и при циклах в данных
+        stack = [key]
+        while stack:
+            current, budget = stack[-1]
+            if (current, budget) in self.ancestor_cache:
+                stack.pop()
+                continue
+            parents = [p for p in self.parents.get(current, ()) if p is not None] \
+                if budget > 0 else []
+            pending = [(p, budget - 1) for p in parents
+                       if budget > 1 and (p, budget - 1) not in self.ancestor_cache]
+            if pending:
+                stack.extend(pending)
+                continue
+            mask = 0
+            for parent in parents:
+                mask |= self.bit(parent) | self.ancestor_cache.get((parent, budget - 1), 0)
+            self.ancestor_cache[(current, budget)] = mask
+            stack.pop()
+        return self.ancestor_cache[key]
+
+    #предки собаки не дальше max_depth поколений
+    def ancestors(self, dog):
+        mask = self.ancestor_mask(dog)
+        if not mask:
+            return frozenset()
+        members = self.families[self.positions[dog][0]]
+        #двоичная запись с младшего бита: позиция символа '1' - номер собаки в семье
+        return frozenset(members[i] for i, digit in enumerate(bin(mask)[:1:-1]) if digit == '1')
+
+    #номер поколения: 0 у собак без известных родителей, предок всегда старше потомка
+    def generation(self, dog):
+        if dog in self.generations:
+            return self.generations[dog]
+
+        stack = [dog]
+        visiting = set()
+        while stack:
+            current = stack[-1]
+            if current in self.generations:
+                stack.pop()
+                continue
+            parents = [p for p in self.parents.get(current, ()) if p is not None]
+            pending = [p for p in parents if p not in self.generations and p not in visiting]
+            if pending and current not in visiting:
+                visiting.add(current)
+                stack.extend(pending)
+                continue
+            #при ошибочных циклах в данных недостающие поколения считаются нулевыми
+            self.generations[current] = 1 + max(
+                (self.generations.get(p, 0) for p in parents), default=-1
+            )
+            stack.pop()
+        return self.generations[dog]
+
+    #есть ли общий предок (или один - предок другого) в пределах max_depth
+    def related(self, sire, dam):
+        if sire == dam:
+            return True
+        if self.positions is None:
+            self.build_positions()
+        sire_position = self.positions.get(sire)
+        dam_position = self.positions.get(dam)
+        #у собак из разных семей общих предков нет
+        if not sire_position or not dam_position or sire_position[0] != dam_position[0]:
+            return False
+        sire_line = self.ancestor_mask(sire) | self.bit(sire)
+        dam_line = self.ancestor_mask(dam) | self.bit(dam)
+        return bool(sire_line & dam_line)
+
+    #коэффициент инбридинга Райта для потомка пары;
+    #memo - общий словарь на весь отчет: пары одной породы делят почти всех предков
+    def inbreeding(self, sire, dam, memo=None):
+        if sire == dam or not self.related(sire, dam):
+            return 0.0
+        #родословная усечена до max_depth поколений: более старые предки считаются неизвестными
+        floor = max(self.generation(sire), self.generation(dam)) - self.max_depth
+        return self.coancestry(sire, dam, floor, {} if memo is None else memo)
+
+    #родители собаки внутри усеченной родословной
+    def parents_within(self, dog, floor):
+        return tuple(parent if parent is not None and self.generation(parent) >= floor else None
+                     for parent in self.parents.get(dog, (None, None)))
+
+    #коэффициент родства (коанцестрии) двух собак
+    def coancestry(self, a, b, floor, memo):
+        if a is None or b is None:
+            return 0.0
+        key = (floor, a, b) if a <= b else (floor, b, a)
+        if key in memo:
+            return memo[key]
+        #защита от циклов в данных
+        memo[key] = 0.0
+
+        if a == b:
+            mother, father = self.parents_within(a, floor)
+            value = 0.5 * (1 + self.coancestry(mother, father, floor, memo))
+        else:
+            #раскрываем младшую собаку: она не может быть предком другой
+            if self.generation(a) < self.generation(b):
+                a, b = b, a
+            mother, father = self.parents_within(a, floor)
+            value = 0.5 * (self.coancestry(mother, b, floor, memo) +
+                           self.coancestry(father, b, floor, memo))
+        memo[key] = value
+        return value
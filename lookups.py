@@ -0,0 +1,136 @@
+import threading
+from collections import OrderedDict
+
+
+#справочники для выпадающих списков: запрос (id, название) и таблицы, от которых зависят
+LOOKUPS = {
+    'breeds': ("SELECT id_breed, name FROM Breeds ORDER BY name", ['breeds']),
+    'illnesses': ("SELECT id_illness, name FROM Medicine_book ORDER BY name", ['medicine_book']),
+}
+
+#колонки внешних ключей и их справочники
+COLUMN_LOOKUPS = {
+    'id_breed': 'breeds',
+    'id_illness': 'illnesses',
+}
+
+#собак слишком много для полного справочника - ищем по началу имени владельца или id
+DOG_SEARCH_TABLES = ['dogs', 'breeds']
+DOG_SEARCH_LIMIT = 50
+#сохраненных результатов поиска собак, давно не использованные вытесняются
+DOG_SEARCH_CACHE_SIZE = 500
+
+
+#экранирование спецсимволов LIKE
+def escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+#подпись элемента справочника в выпадающем списке
+def lookup_label(id_, name):
+    return f"{name} (ID: {id_})"
+
+
+#справочник с прямым (подпись -> id) и обратным (id -> подпись) словарями
+class Lookup:
+    def __init__(self, rows):
+        self.labels = [lookup_label(id_, name) for id_, name in rows]
+        self.by_label = dict(zip(self.labels, (id_ for id_, _ in rows)))
+        self.by_id = {id_: label for label, id_ in self.by_label.items()}
+
+
+#кэш справочников, сбрасывается при изменении исходных таблиц через приложение
+class LookupCache:
+    def __init__(self, db):
+        self.db = db
+        self.lock = threading.Lock()
+        self.cache = {}
+        #результаты поиска собак: (пол, префикс) -> строки (id, владелец), в порядке использования
+        self.dog_search = OrderedDict()
+        #растет при сбросе: результат запроса, начатого до сброса, не сохраняется
+        self.dog_search_version = 0
+
+    #справочник по имени (загружается при первом обращении)
+    def get(self, name):
+        lookup = self.cache.get(name)
+        if lookup is None:
+            with self.lock:
+                lookup = self.cache.get(name)
+                if lookup is None:
+                    query, _ = LOOKUPS[name]
+                    _, rows = self.db.execute(query, prepared=True)
+                    lookup = Lookup(rows)
+                    self.cache[name] = lookup
+        return lookup
+
+    #справочник для колонки внешнего ключа
+    def for_column(self, column):
+        return self.get(COLUMN_LOOKUPS[column])
+
+    #поиск живых собак по префиксу владельца или по id, с кэшем по префиксам
+    def search_dogs(self, term, gender=None, limit=DOG_SEARCH_LIMIT):
+        term = term.strip().lower()
+        key = (gender, term)
+        with self.lock:
+            version = self.dog_search_version
+            rows = self.cached_search(key)
+            if rows is not None:
+                return rows
+
+            #более короткий префикс с неполным результатом уже содержит все совпадения
+            #(кроме поиска по id: он не префиксный)
+            for length in range(len(term) - 1, -1, -1):
+                if term.isdigit():
+                    break
+                rows = self.cached_search((gender, term[:length]))
+                if rows is not None and len(rows) < limit:
+                    rows = [row for row in rows if (row[1] or '').lower().startswith(term)]
+                    self.store_search(key, rows)
+                    return rows
+
+        conditions = ["alive = TRUE"]
+        params = []
+        if gender:
+            conditions.append("gender = %s")
+            params.append(gender)
+        if term:
+            #префиксный LIKE по lower(owner) обслуживается индексом text_pattern_ops
+            if term.isdigit():
+                conditions.append("(lower(owner) LIKE %s OR id_dog = %s)")
+                params.extend([escape_like(term) + '%', int(term)])
+            else:
+                conditions.append("lower(owner) LIKE %s")
+                params.append(escape_like(term) + '%')
+        params.append(limit)
+
+        query = (f"SELECT id_dog, owner FROM Dogs WHERE {' AND '.join(conditions)} "
+                 f"ORDER BY owner, id_dog LIMIT %s")
+        _, rows = self.db.execute(query, params, prepared=True)
+        with self.lock:
+            if version == self.dog_search_version:
+                self.store_search(key, rows)
+        return rows
+
+    #результат поиска из кэша (вызывается под self.lock)
+    def cached_search(self, key):
+        rows = self.dog_search.get(key)
+        if rows is not None:
+            self.dog_search.move_to_end(key)
+        return rows
+
+    def store_search(self, key, rows):
+        self.dog_search[key] = rows
+        self.dog_search.move_to_end(key)
+        while len(self.dog_search) > DOG_SEARCH_CACHE_SIZE:
+            self.dog_search.popitem(last=False)
+
+    #сброс справочников, построенных по изменившейся таблице
+    def invalidate_table(self, table):
+        table = table.lower()
+        with self.lock:
+            for name, (_, tables) in LOOKUPS.items():
+                if table in tables:
+                    self.cache.pop(name, None)
+            if table in DOG_SEARCH_TABLES:
+                self.dog_search.clear()
+                self.dog_search_version += 1
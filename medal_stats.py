@@ -0,0 +1,46 @@
+#сводка медалей по собакам для отчета "Пары для элитной вязки"
+#(материализованное представление создается миграцией 0001)
+
+MEDAL_STATS_VIEW = 'dog_medal_stats'
+
+#счетчик изменений таблицы из статистики сервера (вставки + обновления + удаления)
+TABLE_CHANGES_QUERY = """
+    SELECT COALESCE(SUM(n_tup_ins + n_tup_upd + n_tup_del), 0)
+    FROM pg_stat_user_tables
+    WHERE schemaname = current_schema() AND relname = %s
+"""
+
+LOG_REFRESH_QUERY = """
+    INSERT INTO report_refresh_log (name, refreshed_at, source_changes)
+    VALUES (%s, now(), %s)
+    ON CONFLICT (name) DO UPDATE
+    SET refreshed_at = EXCLUDED.refreshed_at, source_changes = EXCLUDED.source_changes
+"""
+
+
+def table_changes(cursor, table):
+    cursor.execute(TABLE_CHANGES_QUERY, (table.lower(),))
+    return cursor.fetchone()[0]
+
+
+#пересчет сводки без блокировки чтения
+def refresh(db):
+    with db.connection() as conn, conn.cursor() as cursor:
+        #счетчик берется до пересчета: изменения во время пересчета оставят сводку устаревшей
+        changes = table_changes(cursor, 'Exhibitions')
+        cursor.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {MEDAL_STATS_VIEW}")
+        cursor.execute(LOG_REFRESH_QUERY, (MEDAL_STATS_VIEW, changes))
+
+
+#время последнего пересчета и признак устаревания (Exhibitions менялась после него)
+def status(db):
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT refreshed_at, source_changes FROM report_refresh_log WHERE name = %s",
+            (MEDAL_STATS_VIEW,)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return None, True
+        refreshed_at, source_changes = row
+        return refreshed_at, table_changes(cursor, 'Exhibitions') != source_changes
@@ -0,0 +1,114 @@
+import argparse
+import logging
+import os
+import re
+from collections import namedtuple
+
+from db import ConnectionPool, add_connection_arguments, config_from_args
+from diagnostics import setup_logging
+
+log = logging.getLogger(__name__)
+
+
+#нумерованные миграции схемы: migrations/NNNN_описание.sql, применяются по порядку номеров
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+MIGRATION_FILE = re.compile(r'^(\d+)_(\w+)\.sql$')
+
+#ключ блокировки, чтобы две копии приложения не применяли миграции одновременно
+MIGRATION_LOCK_ID = 20240101
+
+Migration = namedtuple('Migration', ['version', 'name', 'path'])
+
+VERSIONS_DDL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version integer PRIMARY KEY,
+        name text NOT NULL,
+        applied_at timestamptz NOT NULL DEFAULT now()
+    )
+"""
+
+
+#список миграций из каталога по возрастанию номера
+def available_migrations(directory=MIGRATIONS_DIR):
+    migrations = []
+    for file_name in os.listdir(directory):
+        match = MIGRATION_FILE.match(file_name)
+        if match:
+            migrations.append(Migration(int(match.group(1)), match.group(2),
+                                        os.path.join(directory, file_name)))
+    migrations.sort()
+
+    versions = [migration.version for migration in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Повторяющиеся номера миграций в {directory}")
+    return migrations
+
+
+#номера уже примененных миграций
+def applied_versions(cursor):
+    cursor.execute(VERSIONS_DDL)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+#применение недостающих миграций (до target включительно), каждая - в своей транзакции
+def migrate(db, target=None, directory=MIGRATIONS_DIR):
+    applied = []
+    for migration in available_migrations(directory):
+        if target is not None and migration.version > target:
+            break
+        with open(migration.path, encoding='utf-8') as f:
+            script = f.read()
+
+        with db.connection() as conn, conn.cursor() as cursor:
+            #блокировка снимается вместе с концом транзакции
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+            if migration.version in applied_versions(cursor):
+                continue
+            log.info("Миграция %04d_%s", migration.version, migration.name)
+            cursor.execute(script)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                (migration.version, migration.name)
+            )
+        applied.append(migration)
+    return applied
+
+
+#состояние миграций: (миграция, применена ли)
+def migration_status(db, directory=MIGRATIONS_DIR):
+    with db.connection() as conn, conn.cursor() as cursor:
+        versions = applied_versions(cursor)
+    return [(migration, migration.version in versions)
+            for migration in available_migrations(directory)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Миграции схемы базы данных питомника")
+    add_connection_arguments(parser)
+    parser.add_argument('--target', type=int, help="применить миграции до указанного номера")
+    parser.add_argument('--status', action='store_true', help="только показать состояние")
+    args = parser.parse_args()
+    listener = setup_logging()
+
+    db = ConnectionPool(config_from_args(args))
+    db.open()
+    try:
+        if args.status:
+            for migration, is_applied in migration_status(db):
+                mark = 'x' if is_applied else ' '
+                print(f"[{mark}] {migration.version:04d}_{migration.name}")
+            return
+
+        applied = migrate(db, args.target)
+        if applied:
+            print(f"Применено миграций: {len(applied)}")
+        else:
+            print("Схема в актуальном состоянии")
+    finally:
+        db.close()
+        listener.stop()
+
+
+if __name__ == '__main__':
+    main()
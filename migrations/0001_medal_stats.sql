@@ -0,0 +1,21 @@
+-- сводка медалей по собакам для отчета "Пары для элитной вязки"
+CREATE MATERIALIZED VIEW IF NOT EXISTS dog_medal_stats AS
+SELECT id_dog,
+    COUNT(*) AS medals,
+    COUNT(*) FILTER (WHERE medal = 'Gold') AS gold,
+    COUNT(*) FILTER (WHERE medal = 'Silver') AS silver,
+    COUNT(*) FILTER (WHERE medal = 'Bronze') AS bronze,
+    MAX(date_exhibition) AS last_medal
+FROM Exhibitions
+WHERE medal IS NOT NULL
+GROUP BY id_dog;
+
+-- уникальный индекс нужен для REFRESH ... CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS dog_medal_stats_id_dog ON dog_medal_stats (id_dog);
+
+-- время пересчета сводок и счетчик изменений исходной таблицы на тот момент
+CREATE TABLE IF NOT EXISTS report_refresh_log (
+    name text PRIMARY KEY,
+    refreshed_at timestamptz NOT NULL,
+    source_changes bigint NOT NULL
+);
@@ -0,0 +1,8 @@
+-- индексы внешних ключей: соединения по id_dog и id_breed без последовательного чтения
+CREATE INDEX IF NOT EXISTS dogs_id_breed ON Dogs (id_breed);
+CREATE INDEX IF NOT EXISTS parents_id_dog ON Parents (id_dog);
+CREATE INDEX IF NOT EXISTS parents_id_mother ON Parents (id_mother);
+CREATE INDEX IF NOT EXISTS parents_id_father ON Parents (id_father);
+CREATE INDEX IF NOT EXISTS exhibitions_id_dog ON Exhibitions (id_dog);
+CREATE INDEX IF NOT EXISTS medicine_history_id_dog ON Medicine_history (id_dog);
+CREATE INDEX IF NOT EXISTS medicine_history_id_illness ON Medicine_history (id_illness);
@@ -0,0 +1,7 @@
+-- отчеты по вязке: живые собаки породы и пола с оценкой не ниже порога
+CREATE INDEX IF NOT EXISTS dogs_breed_gender_alive_assesment
+    ON Dogs (id_breed, gender, alive, assesment);
+
+-- выбор собаки в формах: префиксный поиск по lower(owner)
+CREATE INDEX IF NOT EXISTS dogs_lower_owner ON Dogs (lower(owner) text_pattern_ops);
+
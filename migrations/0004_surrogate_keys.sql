@@ -0,0 +1,5 @@
+-- суррогатные ключи для таблиц без первичного ключа
+-- (постраничный просмотр и удаление идут по ключу, а не по ctid)
+ALTER TABLE Parents ADD COLUMN IF NOT EXISTS id_record serial PRIMARY KEY;
+ALTER TABLE Medicine_history ADD COLUMN IF NOT EXISTS id_record serial PRIMARY KEY;
+ALTER TABLE Exhibitions ADD COLUMN IF NOT EXISTS id_exhibition serial PRIMARY KEY;
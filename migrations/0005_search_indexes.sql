@@ -0,0 +1,12 @@
+-- поиск по подстроке (ILIKE '%...%') и нечеткий поиск через триграммы
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS breeds_name_trgm ON Breeds USING gin (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS breeds_characteristic_trgm ON Breeds USING gin (characteristic gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS breeds_color_trgm ON Breeds USING gin (color gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS dogs_owner_trgm ON Dogs USING gin (owner gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS dogs_adress_trgm ON Dogs USING gin (adress gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS exhibitions_name_trgm ON Exhibitions USING gin (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS exhibitions_medal_trgm ON Exhibitions USING gin (medal gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS medicine_book_name_trgm ON Medicine_book USING gin (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS medicine_book_method_trgm ON Medicine_book USING gin (method gin_trgm_ops);
@@ -0,0 +1,69 @@
+-- уведомления об изменениях для других рабочих мест (канал kennel_changes)
+-- полезная нагрузка: {"table": ..., "op": INSERT|UPDATE|DELETE, "keys": [...]};
+-- при изменении больше 100 строк одним оператором и при TRUNCATE keys = null
+-- (таблицу нужно перечитать)
+CREATE OR REPLACE FUNCTION notify_table_change() RETURNS trigger AS $$
+DECLARE
+    changed bigint;
+    keys jsonb;
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        changed := NULL;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT count(*), jsonb_agg(key) INTO changed, keys
+        FROM (SELECT to_jsonb(r) -> TG_ARGV[0] AS key FROM old_rows r LIMIT 101) k;
+    ELSE
+        SELECT count(*), jsonb_agg(key) INTO changed, keys
+        FROM (SELECT to_jsonb(r) -> TG_ARGV[0] AS key FROM new_rows r LIMIT 101) k;
+    END IF;
+
+    IF changed = 0 THEN
+        RETURN NULL;
+    END IF;
+    IF changed IS NULL OR changed > 100 THEN
+        keys := NULL;
+    END IF;
+
+    PERFORM pg_notify('kennel_changes', jsonb_build_object(
+        'table', lower(TG_TABLE_NAME), 'op', TG_OP, 'keys', keys)::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- триггеры уровня оператора: одно уведомление на оператор, а не на строку
+DO $$
+DECLARE
+    target record;
+BEGIN
+    FOR target IN
+        SELECT * FROM (VALUES
+            ('breeds', 'id_breed'),
+            ('dogs', 'id_dog'),
+            ('parents', 'id_record'),
+            ('exhibitions', 'id_exhibition'),
+            ('medicine_book', 'id_illness'),
+            ('medicine_history', 'id_record')
+        ) AS t (table_name, key_column)
+    LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS %1$s_notify_insert ON %1$I', target.table_name);
+        EXECUTE format('DROP TRIGGER IF EXISTS %1$s_notify_update ON %1$I', target.table_name);
+        EXECUTE format('DROP TRIGGER IF EXISTS %1$s_notify_delete ON %1$I', target.table_name);
+        EXECUTE format('DROP TRIGGER IF EXISTS %1$s_notify_truncate ON %1$I', target.table_name);
+        EXECUTE format('CREATE TRIGGER %1$s_notify_insert AFTER INSERT ON %1$I '
+                       'REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT '
+                       'EXECUTE PROCEDURE notify_table_change(%2$L)',
+                       target.table_name, target.key_column);
+        EXECUTE format('CREATE TRIGGER %1$s_notify_update AFTER UPDATE ON %1$I '
+                       'REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT '
+                       'EXECUTE PROCEDURE notify_table_change(%2$L)',
+                       target.table_name, target.key_column);
+        EXECUTE format('CREATE TRIGGER %1$s_notify_delete AFTER DELETE ON %1$I '
+                       'REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT '
+                       'EXECUTE PROCEDURE notify_table_change(%2$L)',
+                       target.table_name, target.key_column);
+        EXECUTE format('CREATE TRIGGER %1$s_notify_truncate AFTER TRUNCATE ON %1$I '
+                       'FOR EACH STATEMENT EXECUTE PROCEDURE notify_table_change(%2$L)',
+                       target.table_name, target.key_column);
+    END LOOP;
+END;
+$$;
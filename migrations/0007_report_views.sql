@@ -0,0 +1,68 @@
+-- сохраненные результаты отчетов: пересчитываются по расписанию (report_views.py),
+-- уникальные индексы нужны для REFRESH MATERIALIZED VIEW CONCURRENTLY
+
+-- кандидаты для отчета "Пары для вязки" (пары подбираются в приложении)
+CREATE MATERIALIZED VIEW IF NOT EXISTS report_breeding_candidates AS
+SELECT d.id_breed, b.name, d.gender, d.id_dog, d.owner, d.assesment
+FROM Dogs d
+JOIN Breeds b ON b.id_breed = d.id_breed
+WHERE d.alive = TRUE;
+
+CREATE UNIQUE INDEX IF NOT EXISTS report_breeding_candidates_id_dog
+    ON report_breeding_candidates (id_dog);
+CREATE INDEX IF NOT EXISTS report_breeding_candidates_order
+    ON report_breeding_candidates (id_breed, assesment DESC, id_dog);
+
+-- пары для элитной вязки (родство проверяется в приложении)
+CREATE MATERIALIZED VIEW IF NOT EXISTS report_elite_pairs AS
+SELECT
+    m.id_dog as id_кобеля,
+    f.id_dog as id_суки,
+    m.owner as владелец_кобеля,
+    f.owner as владелец_суки,
+    bm.name as порода_кобеля,
+    bf.name as порода_суки,
+    m.assesment as оценка_кобеля,
+    f.assesment as оценка_суки,
+    ms_m.medals as медали_кобеля,
+    ms_f.medals as медали_суки,
+    (m.assesment + f.assesment) as сумма_оценок
+FROM Dogs m
+JOIN dog_medal_stats ms_m ON ms_m.id_dog = m.id_dog
+JOIN Dogs f ON m.id_breed = f.id_breed
+    AND m.gender = 'M'
+    AND f.gender = 'F'
+    AND m.id_dog != f.id_dog
+JOIN dog_medal_stats ms_f ON ms_f.id_dog = f.id_dog
+JOIN Breeds bm ON m.id_breed = bm.id_breed
+JOIN Breeds bf ON f.id_breed = bf.id_breed
+WHERE m.alive = TRUE AND f.alive = TRUE
+    AND m.assesment >= 4 AND f.assesment >= 4;
+
+CREATE UNIQUE INDEX IF NOT EXISTS report_elite_pairs_pair
+    ON report_elite_pairs (id_кобеля, id_суки);
+
+-- служебные собаки: только если в Dogs есть тест психики
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM information_schema.columns
+               WHERE table_schema = current_schema() AND table_name = 'dogs'
+                   AND column_name = 'psyche_test') THEN
+        EXECUTE '
+            CREATE MATERIALIZED VIEW IF NOT EXISTS report_service_dogs AS
+            SELECT
+                d.id_dog as id_собаки,
+                d.owner as владелец,
+                d.assesment as оценка,
+                d.psyche_test as тест_психики,
+                b.name as порода,
+                b.characteristic as характеристика
+            FROM Dogs d
+            JOIN Breeds b ON d.id_breed = b.id_breed
+            WHERE d.alive = TRUE
+                AND d.psyche_test = 5';
+        EXECUTE 'CREATE UNIQUE INDEX IF NOT EXISTS report_service_dogs_id_dog
+                     ON report_service_dogs (id_собаки)';
+    END IF;
+END;
+$$;
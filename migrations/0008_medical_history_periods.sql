@@ -0,0 +1,22 @@
+-- эпизоды болезней как интервалы дат для медицинской аналитики (health_reports.py)
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+-- период эпизода включительно; без даты окончания - эпизод продолжается,
+-- окончание раньше начала считается ошибкой ввода и дает однодневный эпизод
+CREATE OR REPLACE FUNCTION illness_period(start_date date, end_date date)
+RETURNS daterange
+LANGUAGE sql IMMUTABLE PARALLEL SAFE
+AS $$
+    SELECT daterange(start_date, CASE WHEN end_date < start_date THEN start_date ELSE end_date END,
+                     '[]')
+$$;
+
+-- пересекающиеся эпизоды одной собаки: (id_dog =, период &&)
+CREATE INDEX IF NOT EXISTS medicine_history_dog_period
+    ON Medicine_history USING gist (id_dog, illness_period(start_date, end_date))
+    WHERE start_date IS NOT NULL;
+
+-- повторные эпизоды: оконные функции по (собака, болезнь) в порядке начала без сортировки
+CREATE INDEX IF NOT EXISTS medicine_history_dog_illness_start
+    ON Medicine_history (id_dog, id_illness, start_date)
+    WHERE start_date IS NOT NULL;
@@ -0,0 +1,129 @@
+import heapq
+import logging
+from collections import namedtuple
+from itertools import islice
+
+
+log = logging.getLogger(__name__)
+
+#колонки отчета "Пары для вязки"
+PAIR_COLUMNS = [
+    'id_кобеля', 'id_суки', 'владелец_кобеля', 'владелец_суки',
+    'порода_кобеля', 'порода_суки', 'оценка_кобеля', 'оценка_суки',
+    'сумма_оценок', 'коэф_инбридинга',
+]
+SUM_INDEX = PAIR_COLUMNS.index('сумма_оценок')
+
+#сколько пар породы проверяется, прежде чем подбор по ней прекращается: в породе,
+#где почти все пары родственные, иначе перебиралось бы все произведение кобели x суки
+MAX_EXAMINED_PAIRS = 50000
+
+Candidate = namedtuple('Candidate', ['id_dog', 'owner', 'assesment'])
+
+#живые собаки с оценкой не ниже порога, по породам и убыванию оценки
+CANDIDATES_QUERY = """
+    SELECT d.id_breed, b.name, d.gender, d.id_dog, d.owner, d.assesment
+    FROM Dogs d
+    JOIN Breeds b ON b.id_breed = d.id_breed
+    WHERE d.alive = TRUE AND d.assesment >= %s
+    ORDER BY d.id_breed, d.assesment DESC, d.id_dog
+"""
+
+#те же кандидаты из сохраненного представления (report_views.py)
+VIEW_CANDIDATES_QUERY = """
+    SELECT id_breed, name, gender, id_dog, owner, assesment
+    FROM report_breeding_candidates
+    WHERE assesment >= %s
+    ORDER BY id_breed, assesment DESC, id_dog
+"""
+
+
+#пары с наибольшей суммой оценок по убыванию суммы, без декартова произведения:
+#кандидаты отсортированы, из кучи извлекается лучшая пара (i, j), в кучу идут (i+1, j) и (i, j+1);
+#проверяется не больше max_examined пар (куча и seen растут не дальше этого числа)
+def best_pairs(males, females, accept=None, max_examined=MAX_EXAMINED_PAIRS):
+    if not males or not females:
+        return
+    heap = [(-(males[0].assesment + females[0].assesment), 0, 0)]
+    seen = {(0, 0)}
+    examined = 0
+    while heap:
+        if max_examined is not None and examined >= max_examined:
+            log.info("Подбор пар остановлен: проверено %d пар из %d", examined,
+                     len(males) * len(females))
+            return
+        examined += 1
+        _, i, j = heapq.heappop(heap)
+        male, female = males[i], females[j]
+        verdict = accept(male, female) if accept else 0.0
+        if verdict is not None:
+            yield male, female, verdict
+        for ni, nj in ((i + 1, j), (i, j + 1)):
+            if ni < len(males) and nj < len(females) and (ni, nj) not in seen:
+                seen.add((ni, nj))
+                heapq.heappush(heap, (-(males[ni].assesment + females[nj].assesment), ni, nj))
+
+
+#подбор пар для вязки по породам
+class BreedingPairEngine:
+    def __init__(self, db, pedigree=None, min_assesment=4, kinship_threshold=0.0,
+                 candidates_query=CANDIDATES_QUERY, max_examined=MAX_EXAMINED_PAIRS):
+        self.db = db
+        self.pedigree = pedigree
+        self.min_assesment = min_assesment
+        self.kinship_threshold = kinship_threshold
+        self.candidates_query = candidates_query
+        self.max_examined = max_examined
+        #коэффициенты родства предков, общие для всех пар отчета
+        self.kinship_memo = {}
+
+    #кандидаты по породам: id породы -> (название, кобели, суки)
+    def candidates(self):
+        _, rows = self.db.execute(self.candidates_query, (self.min_assesment,), prepared=True)
+        breeds = {}
+        for id_breed, breed_name, gender, id_dog, owner, assesment in rows:
+            _, males, females = breeds.setdefault(id_breed, (breed_name, [], []))
+            candidate = Candidate(id_dog, owner, assesment)
+            (males if gender == 'M' else females).append(candidate)
+        return breeds
+
+    #коэффициент инбридинга пары или None, если пара родственная
+    def check_pair(self, male, female):
+        if male.id_dog == female.id_dog:
+            return None
+        if self.pedigree is None:
+            return 0.0
+        #при нулевом пороге любая родственная пара отбрасывается, коэффициент не нужен
+        if self.kinship_threshold <= 0:
+            return None if self.pedigree.related(male.id_dog, female.id_dog) else 0.0
+        coefficient = self.pedigree.inbreeding(male.id_dog, female.id_dog, self.kinship_memo)
+        return coefficient if coefficient <= self.kinship_threshold else None
+
+    #строки отчета для породы по убыванию суммы оценок
+    def breed_rows(self, breed_name, males, females):
+        for male, female, coefficient in best_pairs(males, females, self.check_pair,
+                                                        self.max_examined):
+            yield (male.id_dog, female.id_dog, male.owner, female.owner,
+                   breed_name, breed_name, male.assesment, female.assesment,
+                   male.assesment + female.assesment, round(coefficient, 4))
+
+    #k лучших пар на каждую породу или всего; результат отдается порциями
+    def generate(self, k, per_breed=True, chunk_size=100):
+        breeds = self.candidates()
+        if per_breed:
+            for breed_name, males, females in breeds.values():
+                rows = list(islice(self.breed_rows(breed_name, males, females), k))
+                if rows:
+                    yield rows
+            return
+
+        #общий топ: слияние отсортированных потоков пород
+        streams = [self.breed_rows(name, males, females)
+                   for name, males, females in breeds.values()]
+        merged = heapq.merge(*streams, key=lambda row: row[SUM_INDEX], reverse=True)
+        top = islice(merged, k)
+        while True:
+            chunk = list(islice(top, chunk_size))
+            if not chunk:
+                break
+            yield chunk
@@ -0,0 +1,152 @@
+import argparse
+import logging
+import threading
+import time
+from collections import namedtuple
+
+from db import ConnectionPool, add_connection_arguments, config_from_args
+from diagnostics import setup_logging
+from medal_stats import MEDAL_STATS_VIEW, LOG_REFRESH_QUERY, table_changes
+
+log = logging.getLogger(__name__)
+
+
+#сохраненные результаты отчетов (материализованные представления из миграции 0007)
+#и их пересчет по расписанию: из приложения (ViewRefresher) или отдельным процессом
+#(python report_views.py --interval 600)
+
+#sources - таблицы, по счетчикам изменений которых видно, что представление устарело
+ReportView = namedtuple('ReportView', ['name', 'sources'])
+
+#в порядке пересчета: сводка медалей нужна отчету по элитной вязке
+REPORT_VIEWS = {
+    'breeding': ReportView('report_breeding_candidates', ('Dogs', 'Breeds')),
+    'elite': ReportView('report_elite_pairs', ('Dogs', 'Breeds', MEDAL_STATS_VIEW)),
+    'service': ReportView('report_service_dogs', ('Dogs', 'Breeds')),
+}
+MEDAL_VIEW = ReportView(MEDAL_STATS_VIEW, ('Exhibitions',))
+
+#ключ блокировки: представления пересчитывает одно рабочее место за раз
+REFRESH_LOCK_ID = 20240102
+
+DEFAULT_INTERVAL = 600
+
+
+#представления, созданные в базе (служебного отчета нет без колонки psyche_test)
+def existing_views(cursor):
+    names = [view.name for view in REPORT_VIEWS.values()]
+    cursor.execute(
+        "SELECT matviewname FROM pg_matviews "
+        "WHERE schemaname = current_schema() AND matviewname = ANY(%s)",
+        (names,)
+    )
+    found = {row[0] for row in cursor.fetchall()}
+    return [view for view in REPORT_VIEWS.values() if view.name in found]
+
+
+def source_changes(cursor, view):
+    return sum(table_changes(cursor, table) for table in view.sources)
+
+
+#исходные таблицы менялись после последнего пересчета
+def is_stale(cursor, view):
+    cursor.execute("SELECT source_changes FROM report_refresh_log WHERE name = %s", (view.name,))
+    row = cursor.fetchone()
+    return row is None or row[0] != source_changes(cursor, view)
+
+
+#пересчет без блокировки чтения; счетчик берется до пересчета
+def refresh_view(cursor, view):
+    changes = source_changes(cursor, view)
+    cursor.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view.name}")
+    cursor.execute(LOG_REFRESH_QUERY, (view.name, changes))
+
+
+#пересчет устаревших представлений (force - всех); возвращает имена пересчитанных
+def refresh(db, force=False):
+    refreshed = []
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", (REFRESH_LOCK_ID,))
+        if not cursor.fetchone()[0]:
+            log.info("Отчеты уже пересчитываются на другом рабочем месте")
+            return refreshed
+        try:
+            #каждое представление в своей транзакции: готовые сразу видны читателям
+            for view in [MEDAL_VIEW] + existing_views(cursor):
+                if force or is_stale(cursor, view):
+                    started = time.perf_counter()
+                    refresh_view(cursor, view)
+                    conn.commit()
+                    refreshed.append(view.name)
+                    log.info("Пересчитано %s за %.1f с", view.name, time.perf_counter() - started)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (REFRESH_LOCK_ID,))
+    return refreshed
+
+
+#время последнего пересчета представления отчета (None - не пересчитывалось)
+def refreshed_at(db, report_type):
+    _, rows = db.execute("SELECT refreshed_at FROM report_refresh_log WHERE name = %s",
+                         (REPORT_VIEWS[report_type].name,), prepared=True)
+    return rows[0][0] if rows else None
+
+
+#пересчет по расписанию в фоновом потоке приложения
+class ViewRefresher:
+    def __init__(self, db, interval=DEFAULT_INTERVAL, on_refreshed=None):
+        self.db = db
+        self.interval = interval
+        #on_refreshed(имена) вызывается в потоке пересчета
+        self.on_refreshed = on_refreshed
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='view-refresher', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+
+    def run(self):
+        while not self.stopping.wait(self.interval):
+            try:
+                refreshed = refresh(self.db)
+            except Exception as e:
+                log.error("Ошибка пересчета отчетов: %s", e)
+                continue
+            if refreshed and self.on_refreshed:
+                self.on_refreshed(refreshed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пересчет сохраненных отчетов")
+    parser.add_argument('--interval', type=int, default=0,
+                        help="пересчитывать каждые N секунд (0 - один раз)")
+    parser.add_argument('--force', action='store_true',
+                        help="пересчитать, даже если исходные таблицы не менялись")
+    add_connection_arguments(parser)
+    args = parser.parse_args()
+    listener = setup_logging()
+
+    db = ConnectionPool(config_from_args(args))
+    db.open()
+    try:
+        while True:
+            refreshed = refresh(db, args.force)
+            print(f"Пересчитано: {', '.join(refreshed) or 'нечего пересчитывать'}")
+            if not args.interval:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db.close()
+        listener.stop()
+
+
+if __name__ == '__main__':
+    main()
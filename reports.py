@@ -0,0 +1,433 @@
+import argparse
+import threading
+from collections import namedtuple
+
+from db import ConnectionPool, add_connection_arguments, config_from_args
+from kinship import PedigreeIndex, DEFAULT_MAX_DEPTH
+from pairing import BreedingPairEngine, PAIR_COLUMNS, CANDIDATES_QUERY, VIEW_CANDIDATES_QUERY
+import exporter
+import report_views
+from health_reports import (ILLNESS_BY_BREED_QUERY, TREATMENT_DURATION_QUERY, EPISODES_QUERY,
+                            INCIDENCE_QUERY, HEALTH_TABLES)
+from exhibition_stats import ExhibitionAnalytics, ANALYTICS_REPORTS, ANALYTICS_TABLES
+from diagnostics import setup_logging
+
+
+#отчеты без интерфейса: используются окном приложения и командной строкой
+
+#query = None - отчет строится в приложении (BreedingPairEngine, ExhibitionAnalytics)
+Report = namedtuple('Report', ['title', 'description', 'query', 'sort_options'])
+
+ELITE_QUERY = """
+    SELECT
+        m.id_dog as id_кобеля,
+        f.id_dog as id_суки,
+        m.owner as владелец_кобеля,
+        f.owner as владелец_суки,
+        bm.name as порода_кобеля,
+        bf.name as порода_суки,
+        m.assesment as оценка_кобеля,
+        f.assesment as оценка_суки,
+        ms_m.medals as медали_кобеля,
+        ms_f.medals as медали_суки,
+        (m.assesment + f.assesment) as сумма_оценок
+    FROM Dogs m
+    JOIN dog_medal_stats ms_m ON ms_m.id_dog = m.id_dog
+    JOIN Dogs f ON m.id_breed = f.id_breed
+        AND m.gender = 'M'
+        AND f.gender = 'F'
+        AND m.id_dog != f.id_dog
+    JOIN dog_medal_stats ms_f ON ms_f.id_dog = f.id_dog
+    JOIN Breeds bm ON m.id_breed = bm.id_breed
+    JOIN Breeds bf ON f.id_breed = bf.id_breed
+    WHERE m.alive = TRUE AND f.alive = TRUE
+        AND m.assesment >= 4 AND f.assesment >= 4
+"""
+
+SERVICE_QUERY = """
+    SELECT
+        d.id_dog as id_собаки,
+        d.owner as владелец,
+        d.assesment as оценка,
+        d.psyche_test as тест_психики,
+        b.name as порода,
+        b.characteristic as характеристика
+    FROM Dogs d
+    JOIN Breeds b ON d.id_breed = b.id_breed
+    WHERE d.alive = TRUE
+        AND d.psyche_test = 5
+"""
+
+#{max_depth} подставляется из настроек проверки родства
+REPORTS = {
+    'breeding': Report(
+        title="Пары для вязки",
+        description="Критерии отбора:\n• Оценка родителей ≥ 4\n"
+                    "• Отсутствие родственных связей (в пределах {max_depth} поколений)\n"
+                    "• Все оценки на выставках ≥ 4",
+        query=None,
+        sort_options=[
+            ("По сумме оценок", "сумма_оценок"),
+            ("По оценке кобеля", "оценка_кобеля"),
+            ("По оценке суки", "оценка_суки"),
+            ("По породе кобеля", "порода_кобеля"),
+            ("По породе суки", "порода_суки")
+        ]
+    ),
+    'elite': Report(
+        title="Пары для элитной вязки",
+        description="Критерии отбора:\n• Оценка родителей ≥ 4\n• Наличие минимум 1 медали у каждого родителя\n"
+                    "• Отсутствие родственных связей (в пределах {max_depth} поколений)\n"
+                    "• Обязательно наличие щенков",
+        query=ELITE_QUERY,
+        sort_options=[
+            ("По сумме оценок", "сумма_оценок"),
+            ("По оценке кобеля", "оценка_кобеля"),
+            ("По оценке суки", "оценка_суки"),
+            ("По медалям кобеля", "медали_кобеля"),
+            ("По медалям суки", "медали_суки")
+        ]
+    ),
+    'service': Report(
+        title="Собаки для служебного использования",
+        description="Критерии отбора:\n• Тест психики = 5\n• Живые собаки",
+        query=SERVICE_QUERY,
+        sort_options=[
+            ("По оценке собаки", "оценка"),
+            ("По тесту психики", "тест_психики"),
+            ("По породе", "порода"),
+            ("По владельцу", "владелец")
+        ]
+    ),
+    'illness_by_breed': Report(
+        title="Болезни по породам",
+        description="Эпизоды и доля заболевших собак породы по каждой болезни,\n"
+                    "место болезни в породе по числу эпизодов",
+        query=ILLNESS_BY_BREED_QUERY,
+        sort_options=[
+            ("По доле заболевших", "доля_процентов"),
+            ("По числу эпизодов", "эпизодов"),
+            ("По породе", "порода"),
+            ("По болезни", "болезнь")
+        ]
+    ),
+    'treatment_duration': Report(
+        title="Длительность лечения",
+        description="Средняя и медианная длительность завершенных эпизодов (дни),\n"
+                    "число незавершенных эпизодов по каждой болезни",
+        query=TREATMENT_DURATION_QUERY,
+        sort_options=[
+            ("По средней длительности", "средняя_длительность"),
+            ("По медиане", "медиана_длительности"),
+            ("По числу эпизодов", "эпизодов"),
+            ("По болезни", "болезнь")
+        ]
+    ),
+    'health_episodes': Report(
+        title="Пересекающиеся и повторные эпизоды",
+        description="Пересечение: два эпизода одной собаки в одно время (дней - длина пересечения)\n"
+                    "Повтор: та же болезнь снова (дней - перерыв после прошлого эпизода)",
+        query=EPISODES_QUERY,
+        sort_options=[
+            ("По дате начала", "начало_второго"),
+            ("По числу дней", "дней"),
+            ("По собаке", "id_собаки"),
+            ("По породе", "порода")
+        ]
+    ),
+    'breed_incidence': Report(
+        title="Заболеваемость пород по годам",
+        description="Эпизоды и заболевшие собаки по годам, на 1000 собак породы,\n"
+                    "изменение к прошлому году и среднее за три года",
+        query=INCIDENCE_QUERY,
+        sort_options=[
+            ("По году", "год"),
+            ("По заболеваемости", "на_1000_собак"),
+            ("По изменению за год", "изменение_за_год"),
+            ("По породе", "порода")
+        ]
+    ),
+    'exhibition_ranking': Report(
+        title="Рейтинг собак по выставкам",
+        description="Форма - средняя оценка за 3 последние выставки, тренд - баллов в год\n"
+                    "Рейтинг: перцентиль формы в породе и доля медалей\n"
+                    "• Не менее 3 выставок",
+        query=None,
+        sort_options=[
+            ("По рейтингу", "рейтинг"),
+            ("По форме", "форма"),
+            ("По тренду", "тренд_в_год"),
+            ("По доле медалей", "доля_медалей"),
+            ("По породе", "порода")
+        ]
+    ),
+    'exhibition_seasons': Report(
+        title="Выставки пород по сезонам",
+        description="Средняя оценка и доля медалей породы в каждом сезоне,\n"
+                    "изменение оценки к тому же сезону прошлого года",
+        query=None,
+        sort_options=[
+            ("По году", "год"),
+            ("По средней оценке", "средняя_оценка"),
+            ("По изменению за год", "изменение_за_год"),
+            ("По доле медалей", "доля_медалей"),
+            ("По породе", "порода")
+        ]
+    ),
+    'breed_marks': Report(
+        title="Оценки пород на выставках",
+        description="Перцентили оценок (25, 50, 75, 90), средняя оценка\n"
+                    "и доля медалей по каждой породе",
+        query=None,
+        sort_options=[
+            ("По медиане", "перцентиль_50"),
+            ("По средней оценке", "средняя_оценка"),
+            ("По доле медалей", "доля_медалей"),
+            ("По числу выставок", "выставок"),
+            ("По породе", "порода")
+        ]
+    ),
+}
+
+#отчеты медицинской аналитики (health_reports.py)
+HEALTH_REPORTS = ('illness_by_breed', 'treatment_duration', 'health_episodes', 'breed_incidence')
+
+#аналитика выставок по загруженному в DataFrame набору (exhibition_stats.py)
+EXHIBITION_REPORTS = tuple(ANALYTICS_REPORTS)
+
+#отчеты, в которых родство пар проверяется в приложении
+KINSHIP_REPORTS = ('breeding', 'elite')
+
+#источник данных отчета: live - расчет по таблицам, view - сохраненный результат,
+#пересчитываемый по расписанию (report_views.py)
+SOURCES = ('live', 'view')
+
+#таблицы, от которых зависит результат отчета (для кэша результатов)
+REPORT_TABLES = {
+    'breeding': ('dogs', 'breeds', 'parents'),
+    'elite': ('dogs', 'breeds', 'parents', 'dog_medal_stats'),
+    'service': ('dogs', 'breeds'),
+}
+REPORT_TABLES.update({report_type: HEALTH_TABLES for report_type in HEALTH_REPORTS})
+REPORT_TABLES.update({report_type: ANALYTICS_TABLES for report_type in EXHIBITION_REPORTS})
+#то же для сохраненных результатов: представление и Parents для проверки родства
+VIEW_TABLES = {
+    report_type: (view.name,) + (('parents',) if report_type in KINSHIP_REPORTS else ())
+    for report_type, view in report_views.REPORT_VIEWS.items()
+}
+
+#счетчики изменений таблиц из статистики сервера: не совпали с запомненными - кэш устарел
+#(учитывает и изменения, сделанные не из приложения; сама статистика обновляется с задержкой
+#до секунды, изменения из приложения сбрасывают кэш сразу через table_changed)
+TABLE_VERSIONS_QUERY = """
+    SELECT relname, n_tup_ins + n_tup_upd + n_tup_del
+    FROM pg_stat_user_tables
+    WHERE schemaname = current_schema() AND relname = ANY(%s)
+"""
+
+
+#ключ сортировки как в ORDER BY: NULL в конце по возрастанию и в начале по убыванию
+def sort_key(value):
+    return value is None, 0 if value is None else value
+
+
+def sort_rows(rows, index, descending=True):
+    rows.sort(key=lambda row: sort_key(row[index]), reverse=descending)
+    return rows
+
+
+#формирование отчетов по подключению к бд
+class ReportService:
+    def __init__(self, db, kinship_max_depth=DEFAULT_MAX_DEPTH, kinship_threshold=0.0):
+        self.db = db
+        self.kinship_max_depth = kinship_max_depth
+        #пары с коэффициентом инбридинга выше порога исключаются из отчетов
+        self.kinship_threshold = kinship_threshold
+        self.pedigree = None
+        self.pedigree_lock = threading.Lock()
+        #результаты отчетов: тип -> (параметры, версии таблиц, колонки, строки);
+        #смена сортировки сортирует сохраненные строки без повторного запроса
+        self.results = {}
+        self.results_lock = threading.Lock()
+        #выставки в DataFrame: загружаются один раз на все отчеты по выставкам
+        self.analytics = ExhibitionAnalytics(db)
+
+    #индекс родословной (загружается при первом отчете)
+    def get_pedigree(self):
+        with self.pedigree_lock:
+            if self.pedigree is None:
+                self.pedigree = PedigreeIndex.load(self.db, self.kinship_max_depth)
+            return self.pedigree
+
+    #сброс родословной после изменения Parents, Dogs или Breeds
+    def reset_pedigree(self):
+        self.pedigree = None
+
+    #сброс всего, что зависит от изменившейся таблицы
+    def table_changed(self, table):
+        table = table.lower()
+        #удаление собаки каскадно удаляет ее записи в Parents
+        if table in ('parents', 'dogs', 'breeds'):
+            self.reset_pedigree()
+        self.analytics.table_changed(table)
+        with self.results_lock:
+            for report_type in REPORT_TABLES:
+                if table in REPORT_TABLES[report_type] + VIEW_TABLES.get(report_type, ()):
+                    self.results.pop(report_type, None)
+
+    def clear_results(self):
+        with self.results_lock:
+            self.results.clear()
+        self.analytics.clear()
+
+    #счетчики изменений таблиц отчета
+    def table_versions(self, report_type, source='live'):
+        tables = REPORT_TABLES[report_type] if source == 'live' else VIEW_TABLES[report_type]
+        _, rows = self.db.execute(TABLE_VERSIONS_QUERY, (list(tables),), prepared=True)
+        return dict(rows)
+
+    #сохраненный результат, если параметры те же и таблицы не менялись; (версии, результат)
+    def cached_result(self, report_type, options, source='live'):
+        versions = self.table_versions(report_type, source)
+        with self.results_lock:
+            cached = self.results.get(report_type)
+        if cached and cached[0] == options and cached[1] == versions:
+            return versions, (cached[2], list(cached[3]))
+        return versions, None
+
+    def description(self, report_type):
+        return REPORTS[report_type].description.format(max_depth=self.kinship_max_depth)
+
+    #поле сортировки из списка отчета (по умолчанию - первое)
+    def sort_field(self, report_type, sort_field=None):
+        fields = [field for _, field in REPORTS[report_type].sort_options]
+        if sort_field is None:
+            return fields[0]
+        if sort_field not in fields:
+            raise ValueError(f"Недопустимое поле сортировки: {sort_field}")
+        return sort_field
+
+    #запрос отчета с сортировкой (None для отчетов, которые строятся в приложении)
+    def report_query(self, report_type, sort_field=None, descending=True, source='live'):
+        query = REPORTS[report_type].query
+        if query is None:
+            return None
+        if source == 'view':
+            if report_type not in report_views.REPORT_VIEWS:
+                raise ValueError(f"Для отчета {report_type} нет сохраненного результата")
+            query = f"SELECT * FROM {report_views.REPORT_VIEWS[report_type].name}"
+        order = "DESC" if descending else "ASC"
+        return query + f" ORDER BY {self.sort_field(report_type, sort_field)} {order}"
+
+    #коэффициент инбридинга потомка каждой пары, родственные пары отбрасываются
+    def apply_kinship(self, columns, rows):
+        pedigree = self.get_pedigree()
+        sire_index = columns.index('id_кобеля')
+        dam_index = columns.index('id_суки')
+        result = []
+        memo = {}
+        for row in rows:
+            sire, dam = row[sire_index], row[dam_index]
+            #при нулевом пороге достаточно проверки общих предков
+            if self.kinship_threshold <= 0:
+                if not pedigree.related(sire, dam):
+                    result.append(tuple(row) + (0.0,))
+                continue
+            coefficient = pedigree.inbreeding(sire, dam, memo)
+            if coefficient <= self.kinship_threshold:
+                result.append(tuple(row) + (round(coefficient, 4),))
+        return columns + ['коэф_инбридинга'], result
+
+    #пары для вязки порциями по мере подбора (k лучших на породу или всего)
+    def breeding_chunks(self, top_k, per_breed=True, source='live'):
+        engine = BreedingPairEngine(
+            self.db, self.get_pedigree(), kinship_threshold=self.kinship_threshold,
+            candidates_query=VIEW_CANDIDATES_QUERY if source == 'view' else CANDIDATES_QUERY
+        )
+        return engine.generate(top_k, per_breed)
+
+    #строки отчета по вязке, отсортированные по выбранному полю
+    def sort_pairs(self, rows, sort_field=None, descending=True):
+        sort_index = PAIR_COLUMNS.index(self.sort_field('breeding', sort_field))
+        return sort_rows(rows, sort_index, descending)
+
+    #время пересчета сохраненного результата (для source='view')
+    def as_of(self, report_type):
+        return report_views.refreshed_at(self.db, report_type)
+
+    #отчет целиком: (колонки, строки); on_chunk получает порции отчета по вязке;
+    #повторный запуск с другой сортировкой берет строки из кэша, если таблицы не менялись
+    def run(self, report_type, sort_field=None, descending=True, top_k=50, per_breed=True,
+            on_chunk=None, source='live'):
+        sort_field = self.sort_field(report_type, sort_field)
+        if source == 'view' and report_type not in report_views.REPORT_VIEWS:
+            raise ValueError(f"Для отчета {report_type} нет сохраненного результата")
+        options = (top_k, per_breed) if report_type == 'breeding' else None
+        options = (options, source, self.kinship_max_depth, self.kinship_threshold)
+        versions, cached = self.cached_result(report_type, options, source)
+        if cached:
+            columns, rows = cached
+            return columns, sort_rows(rows, columns.index(sort_field), descending)
+
+        if report_type == 'breeding':
+            rows = []
+            for chunk in self.breeding_chunks(top_k, per_breed, source):
+                rows.extend(chunk)
+                if on_chunk:
+                    on_chunk(chunk)
+            columns, rows = PAIR_COLUMNS, self.sort_pairs(rows, sort_field, descending)
+        elif report_type in EXHIBITION_REPORTS:
+            #набор выставок перезагружается, только если таблицы изменились
+            columns, rows = self.analytics.report(report_type, versions)
+            rows = sort_rows(rows, columns.index(sort_field), descending)
+        else:
+            columns, rows = self.db.execute(
+                self.report_query(report_type, sort_field, descending, source), prepared=True
+            )
+            if report_type in KINSHIP_REPORTS:
+                columns, rows = self.apply_kinship(columns, rows)
+
+        with self.results_lock:
+            self.results[report_type] = (options, versions, columns, list(rows))
+        return columns, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Отчеты питомника без графического интерфейса")
+    parser.add_argument('report', choices=sorted(REPORTS))
+    parser.add_argument('-o', '--output', required=True,
+                        help="файл результата (.csv или .csv.gz)")
+    parser.add_argument('--sort', help="поле сортировки (по умолчанию - первое поле отчета)")
+    parser.add_argument('--asc', action='store_true', help="сортировка по возрастанию")
+    parser.add_argument('--top-k', type=int, default=50, help="лучших пар в отчете по вязке")
+    parser.add_argument('--overall', action='store_true',
+                        help="K лучших пар всего, а не на каждую породу")
+    parser.add_argument('--max-depth', type=int, default=DEFAULT_MAX_DEPTH,
+                        help="поколений в проверке родства")
+    parser.add_argument('--source', choices=SOURCES, default='live',
+                        help="live - расчет по таблицам, view - сохраненный результат")
+    add_connection_arguments(parser)
+    args = parser.parse_args()
+    listener = setup_logging()
+
+    db = ConnectionPool(config_from_args(args))
+    db.open()
+    try:
+        service = ReportService(db, kinship_max_depth=args.max_depth)
+        descending = not args.asc
+        #отчет без досчета в приложении выгружается прямо запросом
+        if REPORTS[args.report].query is not None and args.report not in KINSHIP_REPORTS:
+            query = service.report_query(args.report, args.sort, descending, args.source)
+            count = exporter.export_query(db, query, None, args.output)
+        else:
+            columns, rows = service.run(args.report, args.sort, descending,
+                                        args.top_k, not args.overall, source=args.source)
+            count = exporter.export_rows(columns, rows, args.output)
+        print(f"{REPORTS[args.report].title}: {count} строк -> {args.output}")
+    finally:
+        db.close()
+        listener.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+import numpy as np
+
+from filters import column_kind, parse_filter
+
+
+#загруженный целиком результат запроса таблицы в виде колонок:
+#сортировка, смена направления и фильтры выполняются без обращения к серверу
+
+#порядок совпадает с ORDER BY колонка NULLS LAST, ключ; текст сравнивается по кодам символов,
+#а не по правилам сортировки (collation) сервера
+
+
+#колонка в массив, пригодный для сравнения и сортировки, и маска NULL
+def typed_column(kind, values):
+    nulls = np.fromiter((value is None for value in values), dtype=bool, count=len(values))
+    if kind in ('number', 'boolean'):
+        typed = np.array([np.nan if value is None else float(value) for value in values],
+                         dtype=float)
+    elif kind == 'date':
+        typed = np.array([np.datetime64('NaT') if value is None else np.datetime64(value, 'D')
+                          for value in values], dtype='datetime64[D]')
+    else:
+        typed = np.array(['' if value is None else str(value) for value in values], dtype=str)
+    return typed, nulls
+
+
+#значение фильтра в тип колонки из typed_column
+def typed_value(kind, value):
+    if kind in ('number', 'boolean'):
+        return float(value)
+    if kind == 'date':
+        return np.datetime64(value, 'D')
+    return str(value)
+
+
+class ColumnarResult:
+    #rows - строки страниц (ключ, колонки таблицы); columns - колонки каталога (schema.Column)
+    def __init__(self, table, key_column, columns, rows, filters=None, search=None):
+        self.table = table
+        self.key_column = key_column
+        self.names = [column.name for column in columns]
+        self.columns = {column.name: column for column in columns}
+        self.kinds = {column.name: column_kind(column) for column in columns}
+        #фильтры и поиск, с которыми загружен результат
+        self.filters = {name: value for name, value in (filters or {}).items()
+                        if value and value.strip()}
+        self.search = search
+
+        self.keys = np.empty(len(rows), dtype=object)
+        self.keys[:] = [row[0] for row in rows]
+        self.values = {}
+        for i, name in enumerate(self.names, start=1):
+            column = np.empty(len(rows), dtype=object)
+            column[:] = [row[i] for row in rows]
+            self.values[name] = column
+        #типизированные колонки строятся при первой сортировке или фильтре
+        self.typed = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def typed_column(self, name):
+        if name not in self.typed:
+            self.typed[name] = typed_column(self.kinds[name], self.values[name])
+        return self.typed[name]
+
+    #подходит ли результат для других фильтров и поиска: они могут только сужать выборку
+    def covers(self, table, filters, search):
+        if table != self.table:
+            return False
+        if self.search is not None and self.search != search:
+            return False
+        return all(filters.get(name) == value for name, value in self.filters.items())
+
+    #маска строк по фильтрам {колонка: выражение} и поиску (текстовые колонки, подстрока)
+    def select(self, filters, search=None):
+        mask = np.ones(len(self), dtype=bool)
+        for name, expression in filters.items():
+            if name not in self.kinds or not expression or not expression.strip():
+                continue
+            mask &= self.filter_mask(name, expression)
+        if search:
+            text_columns, term = search
+            found = np.zeros(len(self), dtype=bool)
+            for name in text_columns:
+                found |= self.condition_mask(name, 'contains', term)
+            mask &= found
+        return mask
+
+    def filter_mask(self, name, expression):
+        mask = np.ones(len(self), dtype=bool)
+        for operation, value in parse_filter(self.columns[name], expression):
+            mask &= self.condition_mask(name, operation, value)
+        return mask
+
+    #одно условие из parse_filter над колонкой
+    def condition_mask(self, name, operation, value):
+        typed, nulls = self.typed_column(name)
+        if operation == 'null':
+            return nulls.copy()
+        kind = self.kinds[name]
+        if operation == 'any':
+            result = np.isin(typed, [typed_value(kind, v) for v in value])
+        elif operation == 'prefix':
+            result = np.char.startswith(typed, value)
+        elif operation == 'contains':
+            result = np.char.find(np.char.lower(typed), value.lower()) >= 0
+        else:
+            value = typed_value(kind, value)
+            result = {
+                '=': typed == value, '<>': typed != value,
+                '<': typed < value, '<=': typed <= value,
+                '>': typed > value, '>=': typed >= value,
+            }[operation]
+        return result & ~nulls
+
+    #индексы строк по маске в порядке сортировки
+    def order(self, mask, sort_column=None, reverse=False):
+        indices = np.flatnonzero(mask)
+        key_typed, _ = self.typed_column(self.key_column)
+        sort_keys = [key_typed[indices]]
+        nulls = np.zeros(len(indices), dtype=bool)
+        if sort_column and sort_column != self.key_column and sort_column in self.kinds:
+            typed, column_nulls = self.typed_column(sort_column)
+            sort_keys.append(typed[indices])
+            nulls = column_nulls[indices]
+        #lexsort: последний ключ - главный; NULL-значения в конце
+        indices = indices[np.lexsort(tuple(sort_keys) + (nulls,))]
+        if reverse:
+            #по убыванию значения и ключа, NULL по-прежнему в конце
+            split = len(indices) - int(nulls.sum())
+            indices = np.concatenate([indices[:split][::-1], indices[split:][::-1]])
+        return indices
+
+    #строки страниц (ключ, колонки) по индексам
+    def rows(self, indices):
+        columns = [self.values[name][indices] for name in self.names]
+        return list(zip(self.keys[indices], *columns))
+
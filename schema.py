@@ -0,0 +1,169 @@
+import logging
+import threading
+from collections import namedtuple
+
+log = logging.getLogger(__name__)
+
+
+#таблицы приложения
+TABLES = ['Breeds', 'Dogs', 'Parents', 'Exhibitions', 'Medicine_book', 'Medicine_history']
+
+Column = namedtuple('Column', ['name', 'data_type', 'is_nullable', 'default'])
+#on_delete - действие при удалении строки, на которую ссылаются (confdeltype: c - CASCADE)
+ForeignKey = namedtuple('ForeignKey', ['column', 'ref_table', 'ref_column', 'on_delete'])
+Check = namedtuple('Check', ['name', 'definition'])
+
+#отпечаток структуры таблиц по pg_catalog, меняется при любом изменении колонок или ограничений
+VERSION_QUERY = """
+    SELECT md5(string_agg(item, ',' ORDER BY item))
+    FROM (
+        SELECT c.relname || '.' || a.attname || ':' || a.atttypid || ':' || a.attnotnull AS item
+        FROM pg_attribute a
+        JOIN pg_class c ON c.oid = a.attrelid
+        WHERE c.relnamespace = current_schema()::regnamespace
+            AND c.relname = ANY(%s)
+            AND a.attnum > 0 AND NOT a.attisdropped
+        UNION ALL
+        SELECT c.relname || '#' || con.conname || ':' || con.contype
+        FROM pg_constraint con
+        JOIN pg_class c ON c.oid = con.conrelid
+        WHERE c.relnamespace = current_schema()::regnamespace
+            AND c.relname = ANY(%s)
+    ) items
+"""
+
+COLUMNS_QUERY = """
+    SELECT table_name, column_name, data_type, is_nullable, column_default
+    FROM information_schema.columns
+    WHERE table_schema = current_schema()
+        AND table_name = ANY(%s)
+    ORDER BY table_name, ordinal_position
+"""
+
+CONSTRAINTS_QUERY = """
+    SELECT c.relname, con.conname, con.contype, pg_get_constraintdef(con.oid),
+        ARRAY(SELECT a.attname::text
+              FROM unnest(con.conkey) WITH ORDINALITY k(attnum, ord)
+              JOIN pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = k.attnum
+              ORDER BY k.ord),
+        fc.relname::text,
+        ARRAY(SELECT a.attname::text
+              FROM unnest(con.confkey) WITH ORDINALITY k(attnum, ord)
+              JOIN pg_attribute a ON a.attrelid = con.confrelid AND a.attnum = k.attnum
+              ORDER BY k.ord),
+        con.confdeltype
+    FROM pg_constraint con
+    JOIN pg_class c ON c.oid = con.conrelid
+    LEFT JOIN pg_class fc ON fc.oid = con.confrelid
+    WHERE c.relnamespace = current_schema()::regnamespace
+        AND c.relname = ANY(%s)
+        AND con.contype IN ('p', 'f', 'c')
+    ORDER BY c.relname, con.conname
+"""
+
+
+#кэш метаданных таблиц: колонки, ключи и CHECK-ограничения
+class SchemaCatalog:
+    def __init__(self, db, tables=TABLES):
+        self.db = db
+        self.table_names = [table.lower() for table in tables]
+        self.lock = threading.Lock()
+        self.version = None
+        self.tables = {}
+
+    #загрузка метаданных всех таблиц
+    def load(self):
+        with self.lock:
+            self.version = self.fetch_version()
+            tables = {name: {'columns': [], 'primary_key': [],
+                             'foreign_keys': [], 'checks': []}
+                      for name in self.table_names}
+
+            _, rows = self.db.execute(COLUMNS_QUERY, (self.table_names,), prepared=True)
+            for table, name, data_type, is_nullable, default in rows:
+                tables[table]['columns'].append(
+                    Column(name, data_type, is_nullable == 'YES', default)
+                )
+
+            _, rows = self.db.execute(CONSTRAINTS_QUERY, (self.table_names,), prepared=True)
+            for table, name, kind, definition, columns, ref_table, ref_columns, on_delete in rows:
+                if kind == 'p':
+                    tables[table]['primary_key'] = columns
+                elif kind == 'f':
+                    for column, ref_column in zip(columns, ref_columns):
+                        tables[table]['foreign_keys'].append(
+                            ForeignKey(column, ref_table, ref_column, on_delete)
+                        )
+                elif kind == 'c':
+                    tables[table]['checks'].append(Check(name, definition))
+
+            self.tables = tables
+            log.info("Схема БД загружена, версия %s", self.version)
+
+    #текущий отпечаток схемы на сервере
+    def fetch_version(self):
+        _, rows = self.db.execute(VERSION_QUERY, (self.table_names, self.table_names),
+                                  prepared=True)
+        return rows[0][0]
+
+    #перезагрузка, если схема изменилась; True - если метаданные обновлены
+    def refresh_if_changed(self):
+        if not self.tables or self.fetch_version() != self.version:
+            self.load()
+            return True
+        return False
+
+    #метаданные таблицы (ленивая загрузка при первом обращении)
+    def table(self, table):
+        if not self.tables:
+            self.load()
+        return self.tables[table.lower()]
+
+    def columns(self, table):
+        return self.table(table)['columns']
+
+    def column_names(self, table):
+        return [col.name for col in self.columns(table)]
+
+    def column(self, table, name):
+        for col in self.columns(table):
+            if col.name == name:
+                return col
+        return None
+
+    #текстовые колонки для поиска
+    def text_columns(self, table):
+        return [col.name for col in self.columns(table)
+                if col.data_type in ('text', 'character varying', 'character')]
+
+    #первичный ключ из одной колонки или None
+    def primary_key(self, table):
+        primary_key = self.table(table)['primary_key']
+        return primary_key[0] if len(primary_key) == 1 else None
+
+    def foreign_keys(self, table):
+        return {fk.column: fk for fk in self.table(table)['foreign_keys']}
+
+    #таблицы, строки которых удаляются каскадно вместе со строками table (без нее самой)
+    def cascade_tables(self, table):
+        if not self.tables:
+            self.load()
+        found = []
+        pending = [table.lower()]
+        while pending:
+            current = pending.pop()
+            for name, meta in self.tables.items():
+                for fk in meta['foreign_keys']:
+                    if fk.ref_table == current and fk.on_delete == 'c' \
+                            and name != table.lower() and name not in found:
+                        found.append(name)
+                        pending.append(name)
+        return found
+
+    def checks(self, table):
+        return self.table(table)['checks']
+
+    #колонка заполняется последовательностью (serial)
+    def is_generated(self, table, name):
+        col = self.column(table, name)
+        return bool(col and col.default and col.default.startswith('nextval('))
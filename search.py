@@ -0,0 +1,74 @@
+from lookups import escape_like
+
+
+#поиск по текстовым полям через триграммные индексы pg_trgm (миграция 0005)
+
+#типы колонок, по которым идет поиск (char(1) вроде пола ищется фильтром)
+SEARCH_TYPES = ('text', 'character varying')
+
+#источники поиска по всем таблицам: (таблица, ключ, колонка, подпись поля)
+SEARCH_SOURCES = [
+    ('Dogs', 'id_dog', 'owner', 'владелец'),
+    ('Dogs', 'id_dog', 'adress', 'адрес'),
+    ('Breeds', 'id_breed', 'name', 'порода'),
+    ('Exhibitions', 'id_exhibition', 'name', 'выставка'),
+    ('Medicine_book', 'id_illness', 'name', 'болезнь'),
+]
+
+SEARCH_COLUMNS = ['таблица', 'id', 'поле', 'значение', 'релевантность']
+
+#сколько совпадений выводить по каждой таблице
+SEARCH_LIMIT = 50
+
+#порог нечеткого совпадения для оператора <% (доля общих триграмм со словом)
+SIMILARITY_THRESHOLD = 0.4
+
+
+#колонки таблицы, по которым ищет поле "Поиск"
+def searchable_columns(schema, table):
+    return [col.name for col in schema.columns(table) if col.data_type in SEARCH_TYPES]
+
+
+#условие поиска подстроки в текущей таблице; ILIKE без приведения типа
+#обслуживается GIN-индексом gin_trgm_ops по каждой колонке
+def table_condition(columns, term):
+    pattern = '%' + escape_like(term) + '%'
+    condition = "(" + " OR ".join(f"{col} ILIKE %s" for col in columns) + ")"
+    return condition, [pattern] * len(columns)
+
+
+#один запрос по всем источникам: точные вхождения и нечеткие совпадения,
+#по убыванию релевантности внутри каждой таблицы
+def build_global_query(term, limit=SEARCH_LIMIT, threshold=SIMILARITY_THRESHOLD):
+    pattern = '%' + escape_like(term) + '%'
+    parts = []
+    params = []
+    for table, key, column, label in SEARCH_SOURCES:
+        parts.append(
+            f"SELECT '{table}' AS source, {key} AS id, '{label}' AS field, "
+            f"{column} AS value, word_similarity(%s, {column}) AS rank "
+            f"FROM {table} WHERE {column} ILIKE %s OR %s <%% {column}"
+        )
+        params.extend([term, pattern, term])
+
+    query = f"""
+        SELECT source, id, field, value, round(rank::numeric, 3)
+        FROM (
+            SELECT found.*,
+                row_number() OVER (PARTITION BY source ORDER BY rank DESC, id) AS place
+            FROM ({" UNION ALL ".join(parts)}) found
+        ) ranked
+        WHERE place <= %s
+        ORDER BY source, rank DESC, id
+    """
+    params.append(limit)
+    return f"SET LOCAL pg_trgm.word_similarity_threshold = {float(threshold)}", query, params
+
+
+#поиск по всем таблицам: строки (таблица, id, поле, значение, релевантность)
+def search_all(db, term, limit=SEARCH_LIMIT):
+    setting, query, params = build_global_query(term.strip(), limit)
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(setting)
+        cursor.execute(query, params)
+        return cursor.fetchall()